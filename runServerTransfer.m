@@ -6,7 +6,11 @@ function [status, cmdout, cmd] = runServerTransfer(sourcePath, targetRoot, varar
 % directly to the Python script.
 %
 % Required:
-%   sourcePath  - e.g. 'F:\BpodBehavior\427'
+%   sourcePath  - e.g. 'F:\BpodBehavior\427', or a cell array of source
+%                 folders, which are transferred as one batch by a single
+%                 serverTransfer.py process (>= 1.20.0; see --parallel-sources).
+%                 For very many folders, pass '--sources-file' instead, since
+%                 cmd.exe limits the command line to 8191 characters.
 %   targetRoot  - e.g. 'E:\' or '\\naskampa\lts\'
 %
 % Optional (forwarded to Python):
@@ -48,6 +52,7 @@ function [status, cmdout, cmd] = runServerTransfer(sourcePath, targetRoot, varar
 %   [st,out] = runServerTransfer('F:\BpodBehavior\427','E:\', '--dry-run','--maxSize','100000');
 %   [st,out] = runServerTransfer('F:\BpodBehavior\427','E:\', '--dry-run', 'PythonExe','C:\Anaconda3\python.exe');
 %   [st,out] = runServerTransfer('F:\BpodBehavior\427','\\naskampa\lts\', 'SafeMove', true);
+%   [st,out] = runServerTransfer({'F:\BpodBehavior\427','F:\BpodBehavior\428'},'E:\', '--parallel-sources 2');
 
 % -----------------------------
 % Parse MATLAB-only name-value options if present
@@ -95,7 +100,11 @@ if ~isempty(nvIdx)
     end
 end
 
-sourcePath = char(sourcePath);
+if iscell(sourcePath) || (isstring(sourcePath) && numel(sourcePath) > 1)
+    sourcePath = cellstr(sourcePath);
+else
+    sourcePath = {char(sourcePath)};
+end
 targetRoot = char(targetRoot);
 
 % -----------------------------
@@ -136,15 +145,17 @@ end
 % Helper: execTransfer
 % =======================================================================
 function [cmd, status, cmdout] = execTransfer(sourcePath, targetRoot, scriptPath, extra, pythonExe, printCmd, label)
-% Build and run one serverTransfer.py invocation, returning the command,
-% exit status, and captured stdout/stderr.
+% Build and run one serverTransfer.py invocation (one or more sources in
+% the cell array sourcePath), returning the command, exit status, and
+% captured stdout/stderr.
 %
 % Prefix with a cd so cmd.exe has a valid CWD even when MATLAB's working
 % directory is a UNC path (cmd.exe cannot use UNC paths as CWD).
-cmd = sprintf('cd /d "%%USERPROFILE%%" && %s "%s" "%s" --target-root %s %s', ...
+sourceArgs = strtrim(sprintf('"%s" ', sourcePath{:}));
+cmd = sprintf('cd /d "%%USERPROFILE%%" && %s "%s" %s --target-root %s %s', ...
     pythonExe, ...
     scriptPath, ...
-    sourcePath, ...
+    sourceArgs, ...
     targetRoot, ...
     extra);
 
@@ -45,6 +45,12 @@ Examples (PowerShell)
    copy-then-hash-verify-then-delete, so no separate "safe move" flag or two-pass dance is needed):
    python serverTransfer.py "D:\\UbuntuRecovery" --target-root "\\naskampa\lts\" --maxSize 0
 
+8) Many sessions in one run (one source folder per line, optionally <TAB>explicit target):
+   python serverTransfer.py --sources-file sessions.txt --target-root "\\naskampa\lts\" --parallel-sources 2 --workers 8
+
+9) Keep running on an acquisition PC, transferring each session folder 15 minutes after it stopped changing:
+   python serverTransfer.py "F:\BpodBehavior" --watch --watch-depth 2 --quiet-s 900 --target-root "\\naskampa\lts\"
+
 
 Version history
 ----------------
@@ -98,26 +104,267 @@ inline log lines that are easy to miss in a long transfer log. Added "Mismatched
 "Suspected-truncated" counters to the final summary line (both the in-log [INFO] line and the
 console "Done." line), plus an explicit "review recommended" call-to-action line whenever either
 count is nonzero - a bare number next to "Errors: 0" is too easy to skim past.
+1.2.0 (2026-10-18): Added --workers N. The per-file body of transfer_tree() (stat, existence checks,
+partial hash, copy_with_retry()/move_with_verify(), manifest append) moved into a process_file()
+closure that returns its counter increments instead of mutating the run totals, so the same code
+runs inline for --workers 1 (default, unchanged behavior) or on a bounded ThreadPoolExecutor for
+N > 1. With hundreds of thousands of small BpodBehavior/phy files the serial loop spent nearly all
+its time waiting on SMB round trips; N files in flight hide that latency. Totals are summed on the
+main thread only; logf(), ensure_dir() and manifest appends are serialized with locks so log lines
+never interleave mid-line, a new folder is logged as [MKDIR] once, and manifest records stay whole.
+Each file's decision logic is untouched, so its outcome is identical to the serial path.
+1.3.0 (2026-10-18): transfer_tree() now runs scan-then-execute. A scan phase (scan_tree()) lists each
+source directory once with os.scandir(), stats each file once via its DirEntry, and lists the matching
+destination directory once, producing an in-memory plan of PlanEntry(relpath, size, mtime, dst_size,
+dst_mtime, category). The execution phase (process_entry(), formerly process_file()) decides using
+only that plan: the 0-byte-destination check, the MOVE-category cleanup path, the manifest skip and
+the COPY-category size/mtime comparison no longer call lp_exists()/lp_stat() (previously up to four
+existence checks plus several stats per file - each a network round trip on a share).
+partial_hash_match(), partial_hash() and has_all_zero_tail() accept already-known sizes so they don't
+re-stat either. Filters and decisions are unchanged; a "[SCAN]" summary line is logged before execution,
+and an unreadable source directory is now logged as a [WARN] instead of being skipped silently.
+1.3.1 (2026-10-18): Added DestDirCache, a per-run cache of destination directory state: each target
+directory is listed once into a {name: (size, mtime)} map, and directories that were listed or created
+are remembered as existing. The scan phase's destination lookups and the lazy mkdir before each file
+(previously ensure_dir() -> lp_exists() per file) are now dictionary lookups; the execution phase keeps
+the cache current on its own deletes/copies instead of re-listing. In dry-run, a folder that would be
+created is logged as [MKDIR] once instead of once per file landing in it.
+1.4.0 (2026-10-18): New streaming copy engine (stream_copy()) replaces shutil.copy2() in copy_with_retry().
+The source is read once in 8 MiB blocks and hashed (blake2b-256) as it is written, and the full-content
+hash is stored in the COPY/MOVE manifest record ("content_hash"/"hash_algo") so tape restores or orphan
+deletions can later be checked without the original. move_with_verify()'s cross-volume path now verifies
+by a full read-back of the destination against the inline hash instead of the post-copy
+partial_hash_match(), which re-read ~1 MB of sampled blocks from both files - stronger than sampled
+verification without a second read of the source. COPY-category copies are verified by destination size
+plus a 1 MiB tail comparison. A verification mismatch is a failed attempt and goes through the normal
+retry/cleanup path. copy_with_retry()/move_with_verify() now return (exception, copy info).
+1.5.0 (2026-10-18): Resumable copies. stream_copy() writes to "<name>.part" and renames it onto the final
+name (os.replace) only after the copy is complete and verified. copy_with_retry() no longer deletes the
+partial destination after an I/O failure and restarts from byte 0 - transient USB-bridge/SMB timeouts
+150 GB into a 200 GB .bin used to re-send terabytes over ten retries. The next attempt resumes from the
+last fsync'ed checkpoint (every 256 MiB; its hash state is kept in memory, so nothing is re-hashed), or -
+on a later run - from the end of the leftover .part, rebuilding the inline hash from a local read of the
+source prefix. Either way the last 4 MiB of the existing prefix must match the source before anything is
+appended; otherwise the copy restarts from 0. A verification mismatch still discards the .part.
+1.6.0 (2026-10-18): Optional SQLite manifest (--manifest-db), using the stdlib sqlite3 module. Records go
+to .server_transfer/manifest.sqlite, indexed on (relpath, target_root), inserted in batched transactions
+in WAL mode (rollback journal on UNC sources, where WAL is unsupported). The database object stands in
+for the in-memory index, so manifest_has_entry() becomes one indexed query per file instead of a
+json.loads pass over the whole NDJSON history on every start (minutes, and memory growing with history,
+on long-lived source roots). The existing NDJSON is imported once (incrementally, by byte offset, so lines
+appended later by older versions are picked up too). Once manifest.sqlite exists it is used automatically,
+including by append_manifest_record() for one-off appends from companion tools.
+1.7.0 (2026-10-18): Group-commit manifest writes. append_manifest_record() opened, wrote and closed the
+manifest for every COPY/MOVE/DEL-SRC record - several network round trips per file on a UNC source root,
+and the dominant cost when moving many small files. transfer_tree() now keeps one ManifestWriter open
+that buffers records and writes them every --manifest-flush-records records or --manifest-flush-s
+seconds, with --manifest-fsync none/batch/every. The buffer is flushed on exit and on Ctrl-C; a crash
+loses at most one group, whose files are then re-verified rather than skipped on the next run.
+1.8.0 (2026-10-18): Background, batched transfer logging (TransferLogger replaces the logf closure).
+Previously every line was written and flushed to both log files on the calling thread - synchronous
+NAS writes for the target log on every logged file. Log files are now written by one writer thread
+through a bounded queue; per-file lines are flushed every few seconds, [INFO]/[WARN]/[ERROR] lines
+(header, summary, errors) right away. Lines get a level from their tag, and --console all/rate/quiet
+(with --console-rate) controls whether per-file lines reach the console; the log files keep every line.
+1.9.0 (2026-10-18): Multi-stream ranged copy for single huge files (--streams, --stream-min-gb). One
+sequential stream only reaches a fraction of a high-latency 10G link; files at or above the threshold
+are now split into 256 MB ranges, copied by several threads at their offsets into a preallocated
+"<name>.rpart", and each range is read back and compared right after it is written. A failed range is
+retried on its own instead of the whole file, and verified ranges are recorded next to the .rpart so an
+interrupted ranged copy resumes with the missing ranges only. Such copies record a tree hash
+(hash_algo "blake2b-256-tree/256M") in the manifest.
+1.10.0 (2026-10-18): Persistent partial-hash cache. partial_hash() used to be recomputed from scratch
+on every rerun for each source file whose dst exists (16 random seeks per file on both sides), and again
+by verifiedDeleteExisting.py. Results are now stored in a SQLite cache in the user's local cache folder
+(--hash-cache, --no-hash-cache), keyed by path, size, mtime and sampling parameters, with LRU eviction
+beyond --hash-cache-max-entries. partial_hash_match() consults it, so unchanged files are sampled once
+across runs and tools.
+1.11.0 (2026-10-18): Concurrent sampled-block reads. partial_hash() read its 16 x 64 KB blocks one after
+another, and partial_hash_match() finished the source before starting the destination - ~32 sequential,
+latency-bound reads per comparison on SMB. Blocks are now read concurrently from a small shared thread
+pool (os.pread on one descriptor where available, one handle per stripe of offsets on Windows), with the
+reads of both files in flight at the same time. Blocks are still fed to the hash in sorted offset order,
+so digests are identical to before (and to the partial-hash cache's entries).
+1.12.0 (2026-10-18): Selectable verification tiers, --verify {size,sample,full}, matching nvcompTIF.py's
+tiered model. One tier then applies to every check: existing MOVE-category destinations before the
+source is deleted, freshly copied/moved files (stream_copy() gained "size" and "sample" modes), and -
+new with sample/full - existing COPY-category destinations, which were only ever checked by size. The
+full tier hashes source and destination in parallel (full_hash_match()). Without --verify, behavior is
+unchanged: existing dst sampled, MOVE copies read back in full, COPY copies checked by size + tail.
+1.13.0 (2026-10-18): Size-adaptive stratified sampling, --sample-strategy stratified (with
+--sample-budget-mb). The random sampler reads the same ~1 MB from a 2 GB and a 200 GB file and may
+miss the head and tail, where header corruption and truncation show up. The stratified sampler always
+takes the first and last block plus one block at a random 4 KB-aligned offset in every 1 GB region
+(at least --sample-blocks blocks, at most the budget). It is deterministic per relpath and size, like
+the random one. The sampler is part of the partial-hash cache key (older cache tables are discarded
+once). The default stays random, so existing hashes remain comparable.
+1.14.0 (2026-10-18): Kernel copy paths on Linux (--copy-backend, default auto). A new copy is first tried
+as a FICLONE reflink (btrfs/XFS, no data copied and no extra space), then copy_file_range (also a
+server-side copy on NFS 4.2 / SMB3 mounts), then sendfile. Only when none of these is supported does it
+use the buffered streaming loop. Each [COPY]/[MOVE] line says which path was taken, and the summary
+counts them. Kernel copies have no inline hash: read-back verification hashes source and destination in
+parallel, and COPY-category files get no content hash in the manifest (use --copy-backend buffered to
+keep it). long_path() is now a no-op off Windows, where the \\?\ prefix only broke paths.
+1.15.0 (2026-10-18): Page-cache-friendly I/O for very large files (--large-file-io fadvise|direct,
+--large-file-min-gb). Streaming a 200 GB file and then reading it back used to evict the working set of
+everything else on the acquisition PC. Now, for files above the threshold, the destination is
+preallocated and the source is read with a sequential hint. Copied and hashed pages are dropped from the
+cache as the copy goes (POSIX_FADV_DONTNEED), or the cache is bypassed with O_DIRECT. Throughput and peak
+RSS of these files are logged, in every mode, so the effect can be measured.
+1.16.0 (2026-10-18): Incremental scan. Source directories whose files were all already covered by the
+manifest are recorded in .server_transfer/dir_snapshot.json, with their mtime, entry count, a digest of
+their files' sizes/mtimes and their subdirectories. On the next run, such a directory with an unchanged
+mtime is not listed at all; only its subdirectories are checked. So re-running on a source root that was
+mostly transferred months ago costs one stat per directory instead of a listing plus a stat per file.
+--full-rescan (also implied by --overwrite) lists everything, and flags directories whose files changed
+without a directory mtime change. Snapshots are kept per target root, --include-ext and move rules.
+1.17.0 (2026-10-18): Transfer plans. --plan out.json does the scan only, classifies every file from its
+stat data (COPY, MOVE, DEL-SRC, CHECK-EXISTING, SKIP-MANIFEST, SKIP-EXISTING) and writes JSON with
+per-action file/byte totals and a duration estimate. The estimate uses the copy throughput measured by the
+last live run to the same target root (kept next to the hash cache). The plan can be reviewed before a
+long transfer is started. --execute-plan out.json then runs its actions without rescanning the source,
+with the plan's --overwrite/--verify settings; files that changed since the plan are skipped and counted.
+1.18.0 (2026-10-18): Progress and run statistics. A [PROGRESS] line every --progress-s seconds (default
+60) gives files and GB done out of the scan's totals, rolling MB/s and files/s over the last 5 minutes,
+the bytes remaining and an ETA. Bytes are counted as the copy loops write them, so one 200 GB file shows
+progress too. Time spent in walk/stat/hash/copy/retry_wait/manifest/log is accumulated (summed over
+threads, nested phases not double counted). It is logged at the end and written, with the counts, to
+transferSummary_<ts>.json next to each transfer log - also after Ctrl-C ("status": "interrupted").
+1.19.0 (2026-10-18): --profile, to find out where a slow run spends its time from its artifacts alone.
+Everything after argument parsing runs under cProfile, on the main thread and on every thread started
+meanwhile (workers, hash readers, log/manifest writers). The lp_* helpers, partial_hash, copy_with_retry,
+move_with_verify and append_manifest_record are swapped for wrappers that count calls and wall-clock time,
+only while profiling. transferProfile_<ts>.txt (call timers, phase times, hot paths by cumulative and own
+time) and transferProfile_<ts>.pstats are written next to the source transfer log. main() now only parses
+arguments and wraps _run().
+1.20.0 (2026-10-18): Batch mode. Several positional sources and/or --sources-file (one source per line,
+optionally a tab and an explicit target) run in one process instead of one process per session folder,
+so interpreter startup, the hash cache and the file worker pool (--workers, shared by all sources) are
+paid for once. Up to --parallel-sources sources run at the same time; their console lines are prefixed
+with [i/n]. Every source keeps its own logs, run summary and manifest, all with the batch's timestamp. A
+source that can't run (missing, overlapping another source) is reported and the rest go on.
+transferBatch_<ts>.json lists every source's counts, logs and exit code; the batch exits with the worst
+of them (2 not run, 1 errors, 3 locked). With parallel sources, each source's phase times, MB/s and
+progress also include the sources running alongside it. --plan/--execute-plan stay single-source.
+1.21.0 (2026-10-18): --watch, a long-running mode for acquisition PCs instead of a manual or MATLAB
+trigger per session. The sources are roots, and the folders --watch-depth levels below them are
+sessions. Every --watch-interval-s the roots are listed. A session transferred before is only re-checked
+by directory mtimes; any other session is walked for file count, size and newest mtime, so a file still
+being written counts as a change. Sessions unchanged for --quiet-s run as one batch. Failed or locked
+sessions are retried after another quiet period. The state is kept in
+<root>/.server_transfer/watch_snapshot.json, so a restarted watcher does not re-walk finished sessions.
+1.22.0 (2026-10-18): --engine asyncio for high-latency shares. The execution phase hands each file's
+process_entry() to asyncio.to_thread. Up to --async-metadata files (default 64) are in flight, so their
+stat/exists/mkdir/rename round trips overlap. Of those, at most --async-hash compare an existing
+destination by hash and at most --async-bulk copy or move data at a time. The per-file logic, counters
+and manifest records are the same as with --engine threads (default, the --workers pool). Those two
+limits are threading semaphores, taken inside process_entry(), which still runs on executor threads.
+1.23.0 (2026-10-18): --order, the order in which planned files are processed: scan (as found, the
+default and previous behavior), path, largest-first, smallest-first or move-first. --order auto keeps the
+scan order, but while the source volume has less than --min-free-gb free (default 50), the largest
+remaining MOVE-category file goes next. So on a nearly full acquisition PC the big moves that free space
+are no longer queued behind thousands of small copies. Free space is checked at most every 5 s, and
+[ORDER] lines log each switch.
+1.24.0 (2026-10-18): Same-volume detection up front. move_with_verify() no longer tries os.rename() for
+every MOVE and waits for it to fail across volumes. A SameVolumeCache decides once per source/destination
+folder pair: same st_dev (the volume serial on Windows) and, for UNC paths, the same host\share after
+normalize_unc_root(). Known cross-volume pairs go straight to copy+verify+delete, and a rename that still
+fails with EXDEV (WinError 17) marks its pair. Pairs that can't be decided still try the rename first.
+The header logs the decision for the source and target roots. Under --engine asyncio, renames no longer
+take one of the --async-bulk slots.
+1.24.1 (2026-10-18): Fix: partial_hash_match() no longer leaks the source's file handle when starting the
+destination's read fails (destination vanished, access denied). The source reads are always collected
+first. Removed the unused cached_partial_hash().
+1.24.2 (2026-10-18): Fix: source, target and target-root strings are parsed as platform paths (PurePath)
+instead of always as Windows paths. On Linux '/data/x' no longer becomes a backslash path that fails with
+"Source does not exist", so the Linux kernel copy paths of 1.14.0 are reachable from the command line. The
+source/target nesting check only casefolds on Windows.
+1.24.3 (2026-10-18): Fix: kernel copies (--copy-backend auto) record a content hash again. A side read
+hashes the source while the kernel copies it, so COPY-category files keep their manifest content_hash
+(lost in 1.14.0), and a MOVE's read-back verify again only reads the destination, not the source a second
+time. full_hash() takes a byte limit so the side read covers exactly the bytes copied.
+1.24.4 (2026-10-18): Fix: KERNEL_COPY_FALLBACK_ERRNOS is limited to "not supported" errnos (EXDEV, EINVAL,
+ENOSYS, EOPNOTSUPP, ENOTTY). EPERM and EBADF are real errors, now raised to copy_with_retry() instead of
+being silently passed on to the next copy method.
+1.24.5 (2026-10-18): Fix: --large-file-io preallocation reserves the .part's space with
+fallocate(FALLOC_FL_KEEP_SIZE) instead of posix_fallocate(), which grew the .part to its full size. After
+a crash, the next run took the full size as bytes written and resumed at the end. When the source ended in
+zeros, the checks passed and a zero-filled file replaced dst. The .part size again equals the bytes
+written. Preallocation is skipped where fallocate is unavailable (non-Linux, SMB/NFS).
+1.24.6 (2026-10-18): Fix: the directory snapshot no longer skips an unchanged directory forever. Skipping
+is decided by directory mtime, which a file rewritten in place doesn't change, so such a COPY-category
+file was never transferred again and nothing warned. Each snapshot entry now records when the directory
+was last really listed. A directory is only skipped if that was within --snapshot-max-age-h hours (default
+24, 0 lists everything). Older entries are listed again, which also reports directories whose files
+changed in place.
+1.24.7 (2026-10-18): Fix: --profile call timers now include hash verification. Since 1.11.0
+partial_hash_match() starts its reads through _start_partial_hash(), so the partial_hash timer never
+fired. The timers now wrap verify_existing, partial_hash_match and full_hash.
+1.24.8 (2026-10-18): Fix: under --engine asyncio, files waiting to hash or copy no longer hold up the
+metadata-only files behind them. Since 1.22.0 the hash and bulk limits were threading semaphores taken
+inside process_entry() on executor threads. A file queued for a bulk slot therefore kept one of the
+--async-metadata threads and in-flight places. process_entry() now yields before and after each hash or
+bulk stage. Every stage is its own asyncio.to_thread() call, taken under an asyncio.Semaphore in the
+coroutine. A file gives its --async-metadata place back when it reaches its first hash or bulk stage, and
+waits as a coroutine without a thread. Admitted but unfinished files are capped at MAX_PENDING_PER_WORKER
+* --async-metadata. On Ctrl-C, files still waiting for a slot stop there. Files past their slot finish,
+including the manifest record.
+1.24.9 (2026-10-18): Fix: the kernel-copy side read of 1.24.3 started before a method was known and always
+read the whole source. Now a reflink reads nothing and records no content hash; verify="readback" hashes
+the source only then. copy_file_range/sendfile first copy one block-sized probe, and the side read
+(SideHash) starts only once that has copied data, so a file that falls back to the buffered copy reads its
+source once, not twice. A real copy error cancels the side read instead of waiting for it to read the rest
+of the source, so the retry is not held back. full_hash() lost its byte limit again.
+1.24.10 (2026-10-18): Fix: the ranged-copy .rpart of 1.9.0 was called preallocated, but truncate() only
+extends it, sparse on POSIX and without valid data on NTFS. Its blocks are now reserved with preallocate()
+where fallocate() works. The section comment states the sparse fallback elsewhere and that ranges start in
+ascending order. A file copied as ranges logs a [WARN] when --copy-backend auto or --large-file-io would
+otherwise have applied to it, since ranged copies use neither.
+1.24.11 (2026-10-18): Fix: the partial-hash cache is configured once per process in _run(), before the
+single, batch or watch dispatch. Before, _print_settings() reopened it for every batch, so a --watch
+daemon closed and reopened the SQLite cache on each poll that found ready sessions and registered another
+atexit hook each time. The atexit hook is now registered once, at import, and _print_settings() only
+prints.
 """
 
 from __future__ import annotations
 
-__version__ = "1.1.0"
+__version__ = "1.24.11"
 __author__  = "Simon Musall"
 __email__   = "s.musall@fz-juelich.de"
 
 import argparse
+import asyncio
+import atexit
+import cProfile
+import errno
+import functools
 import getpass
 import hashlib
+import io
 import json
+import mmap
 import os
+import pstats
+import queue
 import random
 import re
 import shutil
+import sqlite3
+import sys
+import threading
 import time
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime
-from pathlib import PureWindowsPath, Path
-from typing import Dict, Iterable, Optional, Tuple
+from pathlib import PurePath, PureWindowsPath, Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl  # POSIX only; used for FICLONE reflinks
+except ImportError:
+    fcntl = None
 
 
 # Default partial-hash sampling (~1 MB total)
@@ -128,6 +375,24 @@ DEFAULT_SAMPLE_BLOCK_KB = 64  # 16 * 64KB = 1024KB ~ 1MB
 DEFAULT_RETRIES = 10
 DEFAULT_RETRY_DELAY_S = 10
 
+# Per-file worker pool (--workers). 1 = the original serial loop.
+DEFAULT_WORKERS = 1
+# Bound on queued-but-not-started files per worker, so a 500k-file tree doesn't
+# materialize 500k pending Futures before the first one finishes.
+MAX_PENDING_PER_WORKER = 4
+
+# Execution engine (--engine). threads: inline or the --workers pool. asyncio: every
+# file's work runs in steps via asyncio.to_thread, with up to --async-metadata files
+# doing metadata calls at once (enough to hide share latency on stat/exists/mkdir/
+# rename). Separately, at most --async-hash may be reading for a partial/full-hash
+# comparison and at most --async-bulk may be copying data at the same time; files
+# waiting for those slots do not count against --async-metadata.
+ENGINES = ("threads", "asyncio")
+DEFAULT_ENGINE = "threads"
+DEFAULT_ASYNC_METADATA = 64
+DEFAULT_ASYNC_HASH = 4
+DEFAULT_ASYNC_BULK = 2
+
 LOCK_FILENAME = "TAPE_TRANSFER_IN_PROGRESS.lock"
 
 # Windows long-path ceiling when using the \\?\ prefix (see long_path() below) is ~32767
@@ -146,8 +411,11 @@ MAX_SAFE_PATH_CHARS = 32000
 # classic ~260-char MAX_PATH limit entirely, per-process, with no admin/registry change
 # needed. Applied only at the actual I/O call sites below (lp_* helpers / shutil calls) -
 # Path objects elsewhere keep their normal (unprefixed) string form for display/logging.
+# Off Windows there is no such limit (and no \\?\ syntax), so paths are passed through.
 def long_path(p) -> str:
     s = str(p)
+    if os.name != "nt":
+        return s
     if s.startswith("\\\\?\\"):
         return s
     if s.startswith("\\\\"):
@@ -182,12 +450,16 @@ def lp_open(p, mode, **kwargs):
 # ----------------------------
 # Target mapping for serverTransfer
 # ----------------------------
-def normalize_target_root(target_root: str) -> PureWindowsPath:
+# Source/target strings are parsed with PurePath, i.e. as Windows paths (drive letters,
+# UNC shares) on Windows and as POSIX paths elsewhere, so on Linux '/data/x' stays
+# '/data/x' and the Linux-only kernel copy paths are reachable from the command line.
+def normalize_target_root(target_root: str) -> PurePath:
     """
-    Normalize a user-provided target root into a PureWindowsPath.
-    Accepts drive roots like 'E:\\' or UNC share roots like '\\\\naskampa\\lts\\'.
+    Normalize a user-provided target root into a PurePath.
+    Accepts drive roots like 'E:\\' or UNC share roots like '\\\\naskampa\\lts\\'
+    (or a mount point such as '/mnt/lts' off Windows).
     """
-    p = PureWindowsPath(target_root)
+    p = PurePath(target_root)
     if not p.parts:
         raise ValueError("Empty target root.")
     return p
@@ -216,7 +488,7 @@ def normalize_unc_root(path_str: str) -> str:
     return f"{prefix}{host_canon}\\{share.lower()}{rest}"
 
 
-def compute_target_path_server(source: str, target_root: str) -> PureWindowsPath:
+def compute_target_path_server(source: str, target_root: str) -> PurePath:
     """
     Construct target path by replacing the *root* of the source with the user-provided target_root,
     while preserving the remaining relative path.
@@ -229,14 +501,14 @@ def compute_target_path_server(source: str, target_root: str) -> PureWindowsPath
 
     Otherwise, keep the same folder structure.
     """
-    src = PureWindowsPath(source)
+    src = PurePath(source)
     tgt_root = normalize_target_root(target_root)
 
     parts = list(src.parts)
     if not parts:
         raise ValueError("Empty source path.")
 
-    # parts[0] is the root ("G:\\") or UNC root ("\\\\server\\share\\")
+    # parts[0] is the root ("G:\\", "/" off Windows) or UNC root ("\\\\server\\share\\")
     rel_parts = parts[1:]
 
     # --- NEW: Bpod Local\Data -> BpodBehavior mapping ---
@@ -248,7 +520,7 @@ def compute_target_path_server(source: str, target_root: str) -> PureWindowsPath
     ):
         rel_parts = ["BpodBehavior", *rel_parts[2:]]
 
-    return PureWindowsPath(*tgt_root.parts, *rel_parts)
+    return PurePath(*tgt_root.parts, *rel_parts)
 
 
 
@@ -261,7 +533,7 @@ def _norm_for_prefix_check(p: Path) -> str:
       handles '.'/'..'/symlinks - so without this, comparing a source given via
       \\naskampa\... against a target given via \\naskampa.kampa-10g\... would
       miss that they're the same physical share)
-    - casefolded
+    - casefolded (on Windows only; POSIX paths are case-sensitive)
     - ensure trailing separator for prefix tests
 
     Note: this normalization is intentionally local to this comparison. The
@@ -273,11 +545,12 @@ def _norm_for_prefix_check(p: Path) -> str:
         rp = p.resolve()
     except Exception:
         rp = p.absolute()
-    s = normalize_unc_root(str(PureWindowsPath(str(rp))))
-    s = s.casefold()
-    # Ensure trailing backslash for proper prefix tests
-    if not s.endswith("\\"):
-        s += "\\"
+    s = normalize_unc_root(str(rp))
+    if os.name == "nt":
+        s = s.casefold()
+    # Ensure trailing separator for proper prefix tests
+    if not s.endswith(os.sep):
+        s += os.sep
     return s
 
 
@@ -358,6 +631,17 @@ def same_file_size_and_mtime(src: Path, dst: Path, mtime_tolerance_s: float = 2.
         return False
     ss, sm = safe_stat_size_mtime(src)
     ds, dm = safe_stat_size_mtime(dst)
+    return size_and_mtime_match(ss, sm, ds, dm, mtime_tolerance_s)
+
+
+def size_and_mtime_match(
+    ss: Optional[int],
+    sm: Optional[float],
+    ds: Optional[int],
+    dm: Optional[float],
+    mtime_tolerance_s: float = 2.0,
+) -> bool:
+    """Same comparison as same_file_size_and_mtime(), on already-known stat values."""
     if ss is None or ds is None or ss != ds:
         return False
     if sm is None or dm is None:
@@ -368,6 +652,19 @@ def same_file_size_and_mtime(src: Path, dst: Path, mtime_tolerance_s: float = 2.
 # ----------------------------
 # Move/copy decision
 # ----------------------------
+# Files this tool writes into the source folder itself; never transferred.
+CONTROL_FILES = (
+    ("transferLog_", ".log"),
+    ("transferSummary_", ".json"),
+    ("transferProfile_", ".txt"),
+    ("transferProfile_", ".pstats"),
+)
+
+
+def is_control_file(fname: str) -> bool:
+    return any(fname.startswith(prefix) and fname.endswith(suffix) for prefix, suffix in CONTROL_FILES)
+
+
 def should_process_by_include_ext(src_file: Path, include_exts: set[str]) -> bool:
     if not include_exts:
         return True
@@ -392,6 +689,513 @@ def should_move(
     return False
 
 
+# ----------------------------
+# Scan phase (transfer plan)
+# ----------------------------
+# transfer_tree() runs in two phases. The scan phase below lists every source
+# directory once with os.scandir() and stats each file exactly once, and lists
+# the matching destination directory once per source directory, instead of the
+# per-file lp_exists()/lp_stat() calls the decision logic used to make (up to
+# four existence checks and several stats per file, each a network round trip
+# on a share). The execution phase then acts only on the resulting plan.
+class PlanEntry(NamedTuple):
+    relpath: str                  # posix path relative to the source root
+    size: int
+    mtime: float
+    dst_size: Optional[int]       # None = destination file does not exist
+    dst_mtime: Optional[float]
+    category: str                 # "MOVE" or "COPY", under the current move rules
+
+
+def list_dir_file_stats(dir_path: Path) -> Optional[Dict[str, Tuple[int, float]]]:
+    """
+    One scandir() listing of dir_path: {file name: (size, mtime)} for the
+    regular files in it, or None if the directory does not exist.
+    """
+    out: Dict[str, Tuple[int, float]] = {}
+    try:
+        with PHASE_TIMES.timed("walk"), os.scandir(long_path(dir_path)) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        with PHASE_TIMES.timed("stat"):
+                            st = entry.stat()
+                        out[entry.name] = (st.st_size, st.st_mtime)
+                except OSError:
+                    continue
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return out
+
+
+class DestDirCache:
+    """
+    Per-run cache of destination directory state, so every destination lookup
+    and lazy mkdir is a dictionary lookup instead of a network metadata call.
+
+    Each destination directory is listed at most once (list_dir_file_stats())
+    into a {name: (size, mtime)} map; a directory whose listing succeeded, or
+    that this run created, is remembered as existing. The execution phase keeps
+    the cache in step with its own changes (note_file()/forget_file()), so it
+    never needs to re-list. For a 50k-file session this replaces roughly four
+    metadata calls per file with one listing per directory.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._listings: Dict[Path, Optional[Dict[str, Tuple[int, float]]]] = {}
+        self._known_dirs: set[Path] = set()
+
+    def _listing(self, dir_path: Path) -> Optional[Dict[str, Tuple[int, float]]]:
+        with self._lock:
+            if dir_path in self._listings:
+                return self._listings[dir_path]
+        listing = list_dir_file_stats(dir_path)
+        with self._lock:
+            # Another worker may have listed (or created) it meanwhile; keep the first result.
+            return self._listings.setdefault(dir_path, listing)
+
+    def files(self, dir_path: Path) -> Dict[str, Tuple[int, float]]:
+        """{name: (size, mtime)} of the files in dir_path ({} if it does not exist)."""
+        return self._listing(dir_path) or {}
+
+    def lookup(self, file_path: Path) -> Optional[Tuple[int, float]]:
+        """(size, mtime) of file_path, or None if it does not exist."""
+        return self.files(file_path.parent).get(file_path.name)
+
+    def dir_exists(self, dir_path: Path) -> bool:
+        with self._lock:
+            if dir_path in self._known_dirs:
+                return True
+        return self._listing(dir_path) is not None
+
+    def ensure_dir(self, dir_path: Path, dry_run: bool, logf) -> None:
+        """Cached equivalent of ensure_dir(): creates dir_path (and parents) on first use only."""
+        if self.dir_exists(dir_path):
+            return
+        with self._lock:
+            if dir_path in self._known_dirs:
+                return
+            if not dry_run:
+                lp_mkdir(dir_path)
+            # In dry-run the folder is only "created" in the cache, so [MKDIR] is logged once
+            # per folder rather than once per file that would land in it.
+            self._known_dirs.update((dir_path, *dir_path.parents))
+            self._listings[dir_path] = {}
+        logf(f"[MKDIR] {dir_path}")
+
+    def note_file(self, file_path: Path, size: int, mtime: float) -> None:
+        with self._lock:
+            listing = self._listings.get(file_path.parent)
+            if listing is not None:
+                listing[file_path.name] = (size, mtime)
+
+    def forget_file(self, file_path: Path) -> None:
+        with self._lock:
+            listing = self._listings.get(file_path.parent)
+            if listing is not None:
+                listing.pop(file_path.name, None)
+
+
+SKIPPED_BY_MANIFEST = Counter(skipped_manifest=1)   # process_entry() outcome of a covered file
+
+# Incremental scan (directory snapshot). Most of a long-lived source root was
+# transferred long ago, yet every run listed and stat'ed all of it. After a run,
+# each source directory whose files were all already covered by the manifest
+# (every one of them ended as [SKIP-MANIFEST]) is recorded in
+# .server_transfer/dir_snapshot.json: its mtime, entry count, a digest of its
+# files' (name, size, mtime) and its subdirectory names. On the next run such a
+# directory is not listed at all if its mtime is unchanged - only its
+# subdirectories are stat'ed and descended into - and its files count as
+# Skipped(manifest). A directory's mtime changes whenever an entry is added,
+# removed or renamed, but NOT when a file is rewritten in place. To bound how long
+# such a change can go unnoticed, a directory is only skipped if it was really listed
+# within the last --snapshot-max-age-h hours (default 24); older entries are listed
+# again, which also reports directories whose files changed in place. --full-rescan
+# lists everything as before.
+# Snapshots are kept per "settings fingerprint" (target root, --include-ext and the
+# move rules), since those decide which files a directory would have to transfer.
+DIR_SNAPSHOT_NAME = "dir_snapshot.json"
+DEFAULT_SNAPSHOT_MAX_AGE_H = 24.0
+
+
+def dir_snapshot_path(source_root: Path) -> Path:
+    return manifest_dir(source_root) / DIR_SNAPSHOT_NAME
+
+
+def snapshot_fingerprint(target_dir: Path, include_exts: set[str], max_bytes: int,
+                         move_exts: set[str], move_keywords: list[str]) -> str:
+    settings = [str(target_dir), sorted(include_exts), int(max_bytes), sorted(move_exts), list(move_keywords)]
+    return hashlib.blake2b(json.dumps(settings).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def files_digest(files: List[Tuple[str, Optional[Tuple[int, float]]]]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for name, stat in sorted(files, key=lambda f: f[0]):
+        h.update(f"{name}\0{stat}\n".encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+class DirSnapshot:
+    """
+    The dir_snapshot.json entries of one settings fingerprint: {relative dir:
+    {"mtime", "entries", "digest", "subdirs", "covered", "listed"}} from the last
+    run (`previous`), and the entries this run will save (see save()). With
+    use_for_skip=False (--full-rescan, --overwrite) nothing is skipped, but the
+    snapshot is still refreshed. Entries whose "listed" time is more than
+    max_age_s old are not skipped either.
+    """
+
+    def __init__(self, path: Path, fingerprint: str, previous: Dict[str, dict], *, use_for_skip: bool,
+                 max_age_s: float = DEFAULT_SNAPSHOT_MAX_AGE_H * 3600) -> None:
+        self.path = path
+        self.fingerprint = fingerprint
+        self.previous = previous
+        self.use_for_skip = use_for_skip
+        self.max_age_s = max_age_s
+        self.now = time.time()
+        self._current: Dict[str, dict] = {}
+        self._dirty: set[str] = set()
+        self.skipped_dirs = 0
+        self.skipped_files = 0
+        self.stale_dirs = 0
+        self.expired_dirs = 0
+
+    @classmethod
+    def load(cls, source_root: Path, fingerprint: str, *, use_for_skip: bool,
+             max_age_s: float = DEFAULT_SNAPSHOT_MAX_AGE_H * 3600, logf) -> "DirSnapshot":
+        path = dir_snapshot_path(source_root)
+        previous: Dict[str, dict] = {}
+        try:
+            with lp_open(path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("snapshots", {}).get(fingerprint, {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logf(f"[SNAPSHOT][WARN] Unreadable directory snapshot, doing a full scan: {path} ({e})")
+        return cls(path, fingerprint, previous, use_for_skip=use_for_skip, max_age_s=max_age_s)
+
+    def unchanged(self, rel_dir: str, dir_mtime: Optional[float]) -> Optional[dict]:
+        """The previous entry of rel_dir if it can be skipped (carried over into this run's snapshot)."""
+        prev = self.previous.get(rel_dir)
+        if not self.use_for_skip or prev is None or dir_mtime is None or prev["mtime"] != dir_mtime:
+            return None
+        if self.now - prev.get("listed", 0.0) >= self.max_age_s:
+            self.expired_dirs += 1
+            return None
+        self._current[rel_dir] = prev
+        self.skipped_dirs += 1
+        self.skipped_files += prev["covered"]
+        return prev
+
+    def observe(self, rel_dir: str, dir_mtime: Optional[float], files: list, subdirs: List[str],
+                covered: int, logf) -> None:
+        """Candidate entry for a listed directory; kept unless mark_dirty() is called for it."""
+        if dir_mtime is None:
+            return
+        digest = files_digest(files)
+        prev = self.previous.get(rel_dir)
+        if prev is not None and prev["mtime"] == dir_mtime and prev["digest"] != digest:
+            self.stale_dirs += 1
+            logf(f"[SNAPSHOT][WARN] Files changed without a directory mtime change: {rel_dir} "
+                 f"(missed by runs that skipped it as unchanged)")
+        self._current[rel_dir] = {"mtime": dir_mtime, "entries": len(files), "digest": digest,
+                                  "subdirs": subdirs, "covered": covered, "listed": self.now}
+
+    def mark_dirty(self, rel_dir: str) -> None:
+        """rel_dir had a file that was not (or not yet) covered by the manifest."""
+        self._dirty.add(rel_dir)
+
+    def save(self, logf) -> None:
+        entries = {d: e for d, e in self._current.items() if d not in self._dirty}
+        try:
+            try:
+                with lp_open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                data = {}
+            data["version"] = 1
+            data.setdefault("snapshots", {})[self.fingerprint] = entries
+            lp_mkdir(self.path.parent)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with lp_open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(long_path(tmp), long_path(self.path))
+        except Exception as e:
+            logf(f"[SNAPSHOT][WARN] Could not save directory snapshot: {self.path} ({e})")
+
+
+def _dir_mtime(path: Path, entry: Optional[os.DirEntry] = None) -> Optional[float]:
+    try:
+        return (entry.stat() if entry is not None else lp_stat(path)).st_mtime
+    except OSError:
+        return None
+
+
+def scan_tree(
+    source_dir: Path,
+    target_dir: Path,
+    *,
+    include_exts: set[str],
+    max_bytes: int,
+    move_exts: set[str],
+    move_keywords: list[str],
+    logf,
+    dest_cache: Optional[DestDirCache] = None,
+    snapshot: Optional[DirSnapshot] = None,
+) -> Tuple[List[PlanEntry], int]:
+    """
+    Walk source_dir (top-down, like os.walk) and build the transfer plan.
+
+    Applies the same filters the transfer loop always applied (transfer logs,
+    the .server_transfer manifest folder, --include-ext) and classifies each
+    file as MOVE/COPY with should_move(). Returns (plan, errors), where errors
+    counts source files that could not be stat'ed (logged as [ERROR]).
+    Destination listings go through dest_cache (a fresh DestDirCache if None),
+    so the execution phase can reuse them. With a `snapshot`, directories it
+    reports unchanged are not listed (see DirSnapshot).
+    """
+    if dest_cache is None:
+        dest_cache = DestDirCache()
+    plan: List[PlanEntry] = []
+    errors = 0
+    stack: List[Tuple[Path, Optional[float]]] = [(source_dir, _dir_mtime(source_dir) if snapshot else None)]
+    while stack:
+        root_path, dir_mtime = stack.pop()
+        rel_dir = root_path.relative_to(source_dir)
+        rel_dir_key = rel_dir.as_posix()
+        if snapshot is not None:
+            prev = snapshot.unchanged(rel_dir_key, dir_mtime)
+            if prev is not None:
+                logf(f"[SNAPSHOT] Unchanged, {prev['covered']} file(s) covered by manifest: {root_path}")
+                for name in reversed(prev["subdirs"]):
+                    sub = root_path / name
+                    stack.append((sub, _dir_mtime(sub)))
+                continue
+        subdirs: List[Tuple[Path, Optional[float]]] = []
+        files: List[Tuple[str, Optional[Tuple[int, float]]]] = []
+        try:
+            with PHASE_TIMES.timed("walk"), os.scandir(long_path(root_path)) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # The manifest folder is never transferred, so there is no need to list it.
+                        if not entry.is_symlink() and entry.name != ".server_transfer":
+                            subdirs.append((root_path / entry.name, _dir_mtime(None, entry) if snapshot else None))
+                        continue
+                    try:
+                        with PHASE_TIMES.timed("stat"):
+                            st = entry.stat()
+                        files.append((entry.name, (st.st_size, st.st_mtime)))
+                    except OSError:
+                        files.append((entry.name, None))
+        except OSError as e:
+            logf(f"[WARN] Cannot list directory, skipped: {root_path} ({e})")
+            continue
+
+        # os.walk order: this directory's files first, then its subdirectories in listing order.
+        stack.extend(reversed(subdirs))
+
+        # Never transfer the manifest directory itself
+        if ".server_transfer" in root_path.parts:
+            continue
+
+        out_root = target_dir / rel_dir
+        planned_before = len(plan)
+        for fname, stat in files:
+            # Skip logs, run summaries and profiles to avoid re-transferring control files
+            if is_control_file(fname):
+                continue
+
+            src_file = root_path / fname
+            if not should_process_by_include_ext(src_file, include_exts):
+                logf(f"[SKIP] Not in --include-ext: {src_file}")
+                continue
+
+            if stat is None:
+                logf(f"[ERROR] Cannot stat: {src_file}")
+                errors += 1
+                if snapshot is not None:
+                    snapshot.mark_dirty(rel_dir_key)
+                continue
+            src_size, src_mtime = stat
+
+            # Destination directory is listed lazily, once, and only if it has candidates.
+            dst_size, dst_mtime = dest_cache.files(out_root).get(fname, (None, None))
+
+            do_move = should_move(
+                src_file=src_file,
+                file_size_bytes=int(src_size),
+                max_bytes=max_bytes,
+                move_exts=move_exts,
+                move_keywords=move_keywords,
+            )
+            plan.append(PlanEntry(
+                relpath=str((rel_dir / fname).as_posix()),
+                size=int(src_size),
+                mtime=float(src_mtime),
+                dst_size=dst_size,
+                dst_mtime=dst_mtime,
+                category="MOVE" if do_move else "COPY",
+            ))
+
+        if snapshot is not None:
+            snapshot.observe(rel_dir_key, dir_mtime, files, [p.name for p, _ in subdirs],
+                             len(plan) - planned_before, logf)
+
+    return plan, errors
+
+
+# ----------------------------
+# Plan files (--plan / --execute-plan)
+# ----------------------------
+# --plan out.json stops after the scan phase: every planned file is classified from
+# its scan metadata alone (no hashing, no I/O beyond the listings) with the same
+# decisions process_entry() makes, and the result is written as JSON - per-action
+# totals (files, bytes), an estimated duration from the last measured throughput to
+# the same target root, and one entry per file. --execute-plan out.json later runs
+# exactly the entries that do something (PLAN_EXECUTED_ACTIONS), with the plan's own
+# --overwrite/--verify settings and without rescanning the source tree. An entry whose
+# source or destination no longer matches the plan's metadata is skipped as stale.
+# The hash checks that guard deletions still run at execution time.
+PLAN_FORMAT_VERSION = 1
+PLAN_ACTIONS = ("COPY", "MOVE", "DEL-SRC", "CHECK-EXISTING", "SKIP-MANIFEST", "SKIP-EXISTING")
+PLAN_EXECUTED_ACTIONS = ("COPY", "MOVE", "DEL-SRC", "CHECK-EXISTING")
+THROUGHPUT_MIN_BYTES = 64 * 1024 * 1024   # smaller runs are too short to be a useful measurement
+
+
+def classify_entry(
+    entry: PlanEntry,
+    *,
+    target_dir: Path,
+    manifest_index,
+    overwrite: bool,
+    verify: Optional[str],
+) -> str:
+    """The PLAN_ACTIONS action process_entry() would take for `entry`, from metadata only."""
+    do_move = entry.category == "MOVE"
+    dst_exists = entry.dst_size is not None
+    if dst_exists and do_move and entry.size > 0 and entry.dst_size == 0:
+        return "MOVE"   # empty destination is treated as corrupt and replaced
+    if dst_exists and not overwrite and do_move:
+        return "DEL-SRC"   # once the destination is verified
+    if not overwrite and manifest_has_entry(manifest_index, entry.relpath, str(target_dir), entry.size, entry.mtime):
+        return "SKIP-MANIFEST"
+    if dst_exists and not do_move:
+        if overwrite:
+            if size_and_mtime_match(entry.size, entry.mtime, entry.dst_size, entry.dst_mtime):
+                return "SKIP-EXISTING"
+            return "COPY"
+        if verify in ("sample", "full") and entry.dst_size == entry.size:
+            return "CHECK-EXISTING"
+        if entry.dst_size >= entry.size:
+            return "SKIP-EXISTING"
+    return "MOVE" if do_move else "COPY"
+
+
+def default_throughput_path() -> Path:
+    return default_hash_cache_path().with_name("throughput.json")
+
+
+def load_measured_throughput(target_root: Path) -> Optional[dict]:
+    """{"mb_s", "measured"} of the last live run to target_root, or None."""
+    try:
+        with open(default_throughput_path(), "r", encoding="utf-8") as f:
+            return json.load(f).get(str(target_root))
+    except (OSError, ValueError):
+        return None
+
+
+def save_measured_throughput(target_root: Path, mb_s: float, logf) -> None:
+    path = default_throughput_path()
+    try:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        data[str(target_root)] = {"mb_s": round(mb_s, 1), "measured": datetime.now().isoformat(timespec="seconds")}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+    except Exception as e:
+        logf(f"[WARN] Could not save measured throughput: {path} ({e})")
+
+
+def write_plan_file(
+    plan_path: Path,
+    actions: List[Tuple[str, PlanEntry]],
+    *,
+    source_dir: Path,
+    target_dir: Path,
+    target_root: Path,
+    settings: dict,
+    unlisted_covered: int = 0,
+) -> dict:
+    """Write the --plan JSON; returns its "totals" and "estimate" parts."""
+    totals: Dict[str, Dict[str, int]] = {a: {"files": 0, "bytes": 0} for a in PLAN_ACTIONS}
+    for action, entry in actions:
+        totals[action]["files"] += 1
+        totals[action]["bytes"] += entry.size
+    data_bytes = totals["COPY"]["bytes"] + totals["MOVE"]["bytes"]
+    measured = load_measured_throughput(target_root)
+    estimate = {"bytes": data_bytes, "mb_s": None, "measured": None, "seconds": None,
+                "note": "MOVEs within one volume are renames and take almost no time"}
+    if measured and measured.get("mb_s"):
+        estimate.update(mb_s=measured["mb_s"], measured=measured.get("measured"),
+                        seconds=round(data_bytes / 1024**2 / measured["mb_s"]))
+    doc = {
+        "version": PLAN_FORMAT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "tool": f"serverTransfer.py {__version__}",
+        "source": str(source_dir),
+        "target": str(target_dir),
+        "settings": settings,
+        "totals": totals,
+        # Files in unchanged directories the DirSnapshot didn't list (all SKIP-MANIFEST).
+        "unlisted_covered_files": unlisted_covered,
+        "estimate": estimate,
+        "entries": [
+            {"action": action, "relpath": e.relpath, "size": e.size, "mtime": e.mtime,
+             "dst_size": e.dst_size, "dst_mtime": e.dst_mtime, "category": e.category}
+            for action, e in actions
+        ],
+    }
+    lp_mkdir(plan_path.parent)
+    with lp_open(plan_path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=1)
+    return {"totals": totals, "estimate": estimate}
+
+
+def load_plan_file(plan_path: Path) -> dict:
+    """Read and sanity-check a --plan JSON. Raises ValueError if it isn't one."""
+    with lp_open(plan_path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    if not isinstance(doc, dict) or doc.get("version") != PLAN_FORMAT_VERSION or "entries" not in doc:
+        raise ValueError(f"Not a serverTransfer plan (format version {PLAN_FORMAT_VERSION}): {plan_path}")
+    return doc
+
+
+def plan_entries_to_execute(doc: dict) -> List[PlanEntry]:
+    return [
+        PlanEntry(relpath=e["relpath"], size=int(e["size"]), mtime=float(e["mtime"]),
+                  dst_size=e["dst_size"], dst_mtime=e["dst_mtime"], category=e["category"])
+        for e in doc["entries"] if e["action"] in PLAN_EXECUTED_ACTIONS
+    ]
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m{seconds % 60:02d}s"
+
+
 # ----------------------------
 # Partial hashing for safety
 # ----------------------------
@@ -403,26 +1207,26 @@ def deterministic_seed(rel_path_str: str, size_bytes: int) -> int:
     return int.from_bytes(h.digest(), byteorder="big", signed=False)
 
 
-def partial_hash(file_path: Path, rel_path_str: str, *, blocks: int, block_size: int) -> str:
-    size, _ = safe_stat_size_mtime(file_path)
-    if size is None:
-        raise OSError(f"Cannot stat {file_path}")
+# Sampled blocks are read concurrently (a small shared thread pool; os.pread on one
+# descriptor where available, otherwise one handle per stripe of offsets on Windows),
+# since on SMB each block is a full round trip. The blocks are still hashed in sorted
+# offset order, so digests are identical to the sequential version.
+SAMPLE_READ_THREADS = 16
 
-    total_sample = blocks * block_size
-    h = hashlib.blake2b(digest_size=32)
-    h.update(str(size).encode("ascii"))
-    h.update(b"|")
+_sample_pool: Optional[ThreadPoolExecutor] = None
+_sample_pool_lock = threading.Lock()
+
+
+def _sample_read_pool() -> ThreadPoolExecutor:
+    global _sample_pool
+    with _sample_pool_lock:
+        if _sample_pool is None:
+            _sample_pool = ThreadPoolExecutor(max_workers=SAMPLE_READ_THREADS, thread_name_prefix="sample-read")
+        return _sample_pool
 
-    # Small file: hash full content
-    if size <= total_sample or size <= block_size:
-        with lp_open(file_path, "rb") as f:
-            while True:
-                chunk = f.read(1024 * 1024)
-                if not chunk:
-                    break
-                h.update(chunk)
-        return h.hexdigest()
 
+def _sample_offsets(rel_path_str: str, size: int, blocks: int, block_size: int) -> List[int]:
+    """Sorted, deterministic (per relpath + size) block offsets for a file larger than the sample."""
     rng = random.Random(deterministic_seed(rel_path_str, size))
     max_start = size - block_size
 
@@ -442,18 +1246,161 @@ def partial_hash(file_path: Path, rel_path_str: str, *, blocks: int, block_size:
         for i in range(blocks):
             offsets.add(min(i * step, max_start))
 
-    with lp_open(file_path, "rb") as f:
-        for off in sorted(offsets):
-            f.seek(off)
-            h.update(f.read(block_size))
+    return sorted(offsets)
 
-    return h.hexdigest()
+
+# Sampling strategies ("sampler" strings, also part of the partial-hash cache key):
+#   random              - `blocks` random 4 KB-aligned blocks anywhere in the file (the
+#                         original scheme; the same ~1 MB for a 2 GB and a 200 GB file)
+#   stratified/<N>M     - always the first and the last block (where header corruption
+#                         and truncation show up), plus one block at a random 4 KB-aligned
+#                         offset in each STRATIFIED_REGION_BYTES region, so the count grows
+#                         with file size - at least `blocks`, at most N MB read per file.
+# Both are deterministic per (relpath, size), so stored/cached hashes stay comparable;
+# a hash is only ever compared with one made by the same sampler.
+SAMPLE_STRATEGIES = ("random", "stratified")
+DEFAULT_SAMPLE_STRATEGY = "random"
+SAMPLER_RANDOM = "random"
+STRATIFIED_REGION_BYTES = 1024**3        # one block per GiB
+DEFAULT_SAMPLE_BUDGET_MB = 32            # per-file read budget for the stratified sampler
+
+
+def make_sampler(strategy: str, budget_mb: int = DEFAULT_SAMPLE_BUDGET_MB) -> str:
+    if strategy == "random":
+        return SAMPLER_RANDOM
+    if strategy == "stratified":
+        return f"stratified/{int(budget_mb)}M"
+    raise ValueError(f"Unknown sampling strategy: {strategy}")
+
+
+def _stratified_offsets(rel_path_str: str, size: int, blocks: int, block_size: int, budget_bytes: int) -> List[int]:
+    max_start = size - block_size
+    n = max(blocks, -(-size // STRATIFIED_REGION_BYTES))
+    n = max(2, min(n, budget_bytes // block_size))
+    rng = random.Random(deterministic_seed(rel_path_str, size))
+
+    offsets = {0, max_start}
+    strata = n - 2
+    for i in range(strata):
+        lo = (max_start * i) // strata
+        hi = (max_start * (i + 1)) // strata
+        off = rng.randint(lo, max(lo, hi - 1))
+        offsets.add(min((off // 4096) * 4096, max_start))
+    return sorted(offsets)
+
+
+def _sampler_offsets(sampler: str, rel_path_str: str, size: int, blocks: int, block_size: int) -> List[int]:
+    if sampler == SAMPLER_RANDOM:
+        return _sample_offsets(rel_path_str, size, blocks, block_size)
+    if sampler.startswith("stratified/") and sampler.endswith("M"):
+        budget_bytes = int(sampler[len("stratified/"):-1]) * 1024 * 1024
+        return _stratified_offsets(rel_path_str, size, blocks, block_size, budget_bytes)
+    raise ValueError(f"Unknown sampler: {sampler}")
+
+
+def _start_block_reads(file_path: Path, offsets: List[int], block_size: int):
+    """Submit the reads of `offsets` to the sample pool; returns collect() -> blocks in offset order."""
+    pool = _sample_read_pool()
+    if hasattr(os, "pread"):
+        fd = os.open(long_path(file_path), os.O_RDONLY)
+        futs = [pool.submit(os.pread, fd, block_size, off) for off in offsets]
+
+        def collect() -> List[bytes]:
+            wait(futs)
+            os.close(fd)
+            return [f.result() for f in futs]
+
+        return collect
+
+    def read_stripe(stripe: List[int]) -> List[bytes]:
+        out = []
+        with lp_open(file_path, "rb") as f:
+            for off in stripe:
+                f.seek(off)
+                out.append(f.read(block_size))
+        return out
+
+    n = max(1, min(SAMPLE_READ_THREADS, len(offsets)))
+    futs = [pool.submit(read_stripe, offsets[i::n]) for i in range(n)]
+
+    def collect() -> List[bytes]:
+        wait(futs)
+        out: List[bytes] = [b""] * len(offsets)
+        for i, f in enumerate(futs):
+            out[i::n] = f.result()
+        return out
+
+    return collect
+
+
+def _start_partial_hash(
+    file_path: Path,
+    rel_path_str: str,
+    *,
+    blocks: int,
+    block_size: int,
+    size: Optional[int] = None,
+    sampler: str = SAMPLER_RANDOM,
+):
+    """Start partial_hash() of one file without waiting for its reads; returns finish() -> digest."""
+    # `size` may be passed in when the caller already knows it (e.g. from the scan plan),
+    # saving a stat round trip; otherwise it is looked up here.
+    if size is None:
+        size, _ = safe_stat_size_mtime(file_path)
+    if size is None:
+        raise OSError(f"Cannot stat {file_path}")
+
+    total_sample = blocks * block_size
+    h = hashlib.blake2b(digest_size=32)
+    h.update(str(size).encode("ascii"))
+    h.update(b"|")
+
+    # Small file: hash full content
+    if size <= total_sample or size <= block_size:
+        def hash_whole_file() -> str:
+            with lp_open(file_path, "rb") as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+            return h.hexdigest()
+
+        fut = _sample_read_pool().submit(hash_whole_file)
+        return fut.result
+
+    offsets = _sampler_offsets(sampler, rel_path_str, size, blocks, block_size)
+    collect = _start_block_reads(file_path, offsets, block_size)
+
+    def finish() -> str:
+        for block in collect():
+            h.update(block)
+        return h.hexdigest()
+
+    return finish
+
+
+def partial_hash(
+    file_path: Path,
+    rel_path_str: str,
+    *,
+    blocks: int,
+    block_size: int,
+    size: Optional[int] = None,
+    sampler: str = SAMPLER_RANDOM,
+) -> str:
+    return _start_partial_hash(file_path, rel_path_str, blocks=blocks, block_size=block_size, size=size,
+                               sampler=sampler)()
 
 
 TRAILING_ZERO_CHECK_BYTES = 1_048_576  # 1 MiB
 
 
-def has_all_zero_tail(path: Path, check_bytes: int = TRAILING_ZERO_CHECK_BYTES) -> bool:
+def has_all_zero_tail(
+    path: Path,
+    check_bytes: int = TRAILING_ZERO_CHECK_BYTES,
+    size: Optional[int] = None,
+) -> bool:
     """
     Heuristic check for a pre-allocated-but-never-fully-written file: reads up to
     `check_bytes` from the END of the file and reports whether every byte in that
@@ -465,10 +1412,11 @@ def has_all_zero_tail(path: Path, check_bytes: int = TRAILING_ZERO_CHECK_BYTES)
     so this is only ever surfaced as a warning for manual review, never used to
     auto-delete/auto-repair (unlike the whole-file-empty case above).
     """
-    try:
-        size = lp_stat(path).st_size
-    except Exception:
-        return False
+    if size is None:
+        try:
+            size = lp_stat(path).st_size
+        except Exception:
+            return False
     if size == 0:
         return False  # whole-file-empty case is handled separately, not here
     n = min(check_bytes, size)
@@ -481,14 +1429,312 @@ def has_all_zero_tail(path: Path, check_bytes: int = TRAILING_ZERO_CHECK_BYTES)
     return len(tail) == n and tail.count(0) == n
 
 
-def partial_hash_match(src: Path, dst: Path, rel_path_str: str, blocks: int, block_size: int) -> bool:
-    ss, _ = safe_stat_size_mtime(src)
-    ds, _ = safe_stat_size_mtime(dst)
+def partial_hash_match(
+    src: Path,
+    dst: Path,
+    rel_path_str: str,
+    blocks: int,
+    block_size: int,
+    src_size: Optional[int] = None,
+    dst_size: Optional[int] = None,
+    src_mtime: Optional[float] = None,
+    dst_mtime: Optional[float] = None,
+    use_cache: bool = True,
+    sampler: str = SAMPLER_RANDOM,
+) -> bool:
+    """
+    Size check + partial-hash comparison of src vs dst. Sizes/mtimes already
+    known to the caller (e.g. from the scan plan) are used as-is instead of
+    being re-stat'ed. Hashes come from the partial-hash cache when it is
+    configured and the file is unchanged (see _hash_cache_lookup()), unless
+    use_cache is False (e.g. for a just-written .part that is about to be renamed).
+    """
+    ss = src_size if src_size is not None else safe_stat_size_mtime(src)[0]
+    ds = dst_size if dst_size is not None else safe_stat_size_mtime(dst)[0]
     if ss is None or ds is None or ss != ds:
         return False
-    return partial_hash(src, rel_path_str, blocks=blocks, block_size=block_size) == partial_hash(
-        dst, rel_path_str, blocks=blocks, block_size=block_size
-    )
+
+    # Both files' block reads are issued before either is waited for, so src and dst
+    # are sampled at the same time instead of one after the other. If starting dst fails
+    # (vanished, access denied), src's reads are still collected, closing its fd.
+    sides = []
+    first_exc: Optional[BaseException] = None
+    try:
+        for path, size, mtime in ((src, ss, src_mtime), (dst, ds, dst_mtime)):
+            key, digest = (None, None)
+            if use_cache:
+                key, digest = _hash_cache_lookup(path, rel_path_str, blocks, block_size, size, mtime, sampler)
+            finish = None
+            if digest is None:
+                finish = _start_partial_hash(path, rel_path_str, blocks=blocks, block_size=block_size, size=size,
+                                             sampler=sampler)
+            sides.append([key, digest, finish])
+    except BaseException as e:
+        first_exc = e
+
+    for side in sides:
+        key, digest, finish = side
+        if finish is None:
+            continue
+        try:
+            side[1] = finish()   # always wait for both, even if one failed, so no read is left running
+        except Exception as e:
+            first_exc = first_exc or e
+            continue
+        _hash_cache_store(key, side[1])
+    if first_exc is not None:
+        raise first_exc
+    return sides[0][1] == sides[1][1]
+
+
+# ----------------------------
+# Partial-hash cache (persistent)
+# ----------------------------
+# A source file whose dst exists is partial-hashed again on every rerun, and again by
+# verifiedDeleteExisting.py - 16 random seeks per file on both sides each time. The
+# cache stores partial_hash() results in a small SQLite database in the user's local
+# cache folder, keyed by (path, relpath seed, size, mtime, blocks, block_size, sampler): a file
+# whose size and mtime are unchanged is not re-sampled, across runs and across tools.
+# Least-recently-used entries are evicted beyond --hash-cache-max-entries. Configured
+# once per process with configure_hash_cache(); partial_hash_match() consults it.
+DEFAULT_HASH_CACHE_MAX_ENTRIES = 200_000
+HASH_CACHE_COMMIT_EVERY = 200   # pending inserts/touches per commit
+
+
+def default_hash_cache_path() -> Path:
+    if os.name == "nt":
+        base = Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / "serverTransfer" / "partial_hash_cache.sqlite"
+
+
+class PartialHashCache:
+    """Thread-safe (path, relpath, size, mtime, blocks, block_size, sampler) -> partial-hash digest store."""
+
+    def __init__(self, db_path: Path, *, max_entries: int = DEFAULT_HASH_CACHE_MAX_ENTRIES) -> None:
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(partial_hashes)")]
+        if columns and "sampler" not in columns:
+            # Cache from before sampling strategies existed - just start over, it's only a cache.
+            self._conn.execute("DROP TABLE partial_hashes")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS partial_hashes (
+                path TEXT NOT NULL,
+                relpath TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                blocks INTEGER NOT NULL,
+                block_size INTEGER NOT NULL,
+                sampler TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (path, relpath, size, mtime, blocks, block_size, sampler)
+            );
+            CREATE INDEX IF NOT EXISTS idx_partial_hashes_last_used ON partial_hashes (last_used);
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM partial_hashes WHERE path = ? AND relpath = ? AND size = ? AND mtime = ? "
+                "AND blocks = ? AND block_size = ? AND sampler = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE partial_hashes SET last_used = ? WHERE path = ? AND relpath = ? AND size = ? AND mtime = ? "
+                "AND blocks = ? AND block_size = ? AND sampler = ?",
+                (time.time(),) + key,
+            )
+            self._note_write_locked()
+            return row[0]
+
+    def put(self, key: tuple, digest: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO partial_hashes "
+                "(path, relpath, size, mtime, blocks, block_size, sampler, digest, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (digest, time.time()),
+            )
+            self._note_write_locked()
+
+    def _note_write_locked(self) -> None:
+        self._uncommitted += 1
+        if self._uncommitted >= HASH_CACHE_COMMIT_EVERY:
+            self._commit_locked()
+
+    def _commit_locked(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM partial_hashes").fetchone()[0]
+        if count > self.max_entries:
+            # Evict down to 90% of the limit, least recently used first.
+            self._conn.execute(
+                "DELETE FROM partial_hashes WHERE rowid IN "
+                "(SELECT rowid FROM partial_hashes ORDER BY last_used LIMIT ?)",
+                (count - int(self.max_entries * 0.9),),
+            )
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._commit_locked()
+            finally:
+                self._conn.close()
+                self._conn = None
+
+
+_hash_cache: Optional[PartialHashCache] = None
+
+
+def configure_hash_cache(
+    db_path: Optional[Path] = None,
+    *,
+    enable: bool = True,
+    max_entries: int = DEFAULT_HASH_CACHE_MAX_ENTRIES,
+) -> Optional[PartialHashCache]:
+    """
+    Open (or, with enable=False, switch off) the process-wide partial-hash cache
+    used by partial_hash_match(). Meant to be called once per process, before
+    any transfer; the cache is committed and closed at exit. A cache that can't
+    be opened is reported and simply not used.
+    """
+    global _hash_cache
+    if _hash_cache is not None:
+        _hash_cache.close()
+        _hash_cache = None
+    if not enable:
+        return None
+    db_path = db_path or default_hash_cache_path()
+    try:
+        _hash_cache = PartialHashCache(db_path, max_entries=max_entries)
+    except Exception as e:
+        print(f"[WARN] Partial-hash cache unavailable, hashing without it: {db_path} ({e})")
+        return None
+    return _hash_cache
+
+
+def _close_hash_cache() -> None:
+    if _hash_cache is not None:
+        _hash_cache.close()
+
+
+atexit.register(_close_hash_cache)
+
+
+def _hash_cache_lookup(
+    file_path: Path,
+    rel_path_str: str,
+    blocks: int,
+    block_size: int,
+    size: Optional[int],
+    mtime: Optional[float],
+    sampler: str = SAMPLER_RANDOM,
+) -> Tuple[Optional[tuple], Optional[str]]:
+    """(cache key, cached digest or None). The key is None when no cache is configured."""
+    cache = _hash_cache
+    if cache is None:
+        return None, None
+    if size is None or mtime is None:
+        size, mtime = safe_stat_size_mtime(file_path)
+        if size is None:
+            raise OSError(f"Cannot stat {file_path}")
+    key = (str(file_path), rel_path_str, int(size), float(mtime), int(blocks), int(block_size), sampler)
+    try:
+        return key, cache.get(key)
+    except sqlite3.Error:
+        return key, None
+
+
+def _hash_cache_store(key: Optional[tuple], digest: str) -> None:
+    cache = _hash_cache
+    if key is None or cache is None:
+        return
+    try:
+        cache.put(key, digest)
+    except sqlite3.Error:
+        pass
+
+
+# ----------------------------
+# Verification tiers (--verify)
+# ----------------------------
+# Same idea as nvcompTIF.py's full/quick/memory tiers: how much of a source/destination
+# pair is compared before the destination is trusted.
+#   size   - size (and, for an already existing dst, mtime) only
+#   sample - partial hash of sampled blocks (partial_hash_match())
+#   full   - full-content hash of both files, streamed in parallel
+# Without --verify each check keeps its own default: an existing dst before DEL-SRC is
+# sampled, a fresh MOVE copy is read back in full, a fresh COPY copy gets size + tail.
+VERIFY_TIERS = ("size", "sample", "full")
+VERIFY_LABELS = {"size": "size+mtime match", "sample": "partial-hash match", "full": "full-hash match"}
+VERIFY_NOTES = {"size": "size and mtime", "sample": "partial hash", "full": "full-content hash"}
+COPY_VERIFY_FOR_TIER = {"size": "size", "sample": "sample", "full": "readback"}  # stream_copy() modes
+
+
+def full_hash_match(
+    src: Path,
+    dst: Path,
+    src_size: Optional[int] = None,
+    dst_size: Optional[int] = None,
+) -> bool:
+    """Size check + full-content hash of src and dst, both files streamed at the same time."""
+    ss = src_size if src_size is not None else safe_stat_size_mtime(src)[0]
+    ds = dst_size if dst_size is not None else safe_stat_size_mtime(dst)[0]
+    if ss is None or ds is None or ss != ds:
+        return False
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="full-hash") as ex:
+        src_digest = ex.submit(full_hash, src)
+        dst_digest = full_hash(dst)
+        return src_digest.result() == dst_digest
+
+
+def verify_existing(
+    tier: str,
+    src: Path,
+    dst: Path,
+    rel_path_str: str,
+    *,
+    blocks: int,
+    block_size: int,
+    src_size: int,
+    dst_size: int,
+    src_mtime: float,
+    dst_mtime: float,
+    sampler: str = SAMPLER_RANDOM,
+) -> bool:
+    """Does an existing dst match src at verification tier `tier` (see VERIFY_TIERS)?"""
+    with PHASE_TIMES.timed("hash"):
+        if tier == "size":
+            return size_and_mtime_match(src_size, src_mtime, dst_size, dst_mtime)
+        if tier == "sample":
+            return partial_hash_match(
+                src, dst, rel_path_str, blocks=blocks, block_size=block_size,
+                src_size=src_size, dst_size=dst_size, src_mtime=src_mtime, dst_mtime=dst_mtime,
+                sampler=sampler,
+            )
+        if tier == "full":
+            return full_hash_match(src, dst, src_size=src_size, dst_size=dst_size)
+    raise ValueError(f"Unknown verification tier: {tier}")
 
 
 # ----------------------------
@@ -559,9 +1805,10 @@ def manifest_has_entry(
     mtime_tolerance_s: float = 2.0,
 ) -> bool:
     key = (relpath_posix, target_root)
-    if key not in index:
-        return False
-    s0, t0 = index[key]
+    with PHASE_TIMES.timed("manifest"):
+        if key not in index:
+            return False
+        s0, t0 = index[key]
     return (s0 == size) and (abs(t0 - mtime) <= mtime_tolerance_s)
 
 
@@ -571,9 +1818,13 @@ def append_manifest_record(
     *,
     dry_run: bool,
     logf,
+    manifest_db: Optional["SqliteManifest"] = None,
+    writer: Optional["ManifestWriter"] = None,
 ) -> None:
     """
-    Append one JSON record as a line to manifest.ndjson (unless dry_run).
+    Append one JSON record as a line to manifest.ndjson (unless dry_run), or
+    to the SQLite manifest if one is passed in / exists (see SqliteManifest).
+    With a ManifestWriter, the record is buffered and written with its group.
     """
     mdir = manifest_dir(source_root)
     mpath = manifest_path(source_root)
@@ -583,6 +1834,23 @@ def append_manifest_record(
         return
 
     try:
+        if writer is not None:
+            writer.append(record)
+            logf(f"[MANIFEST] Appended: {record.get('action')} {record.get('relpath')}")
+            return
+        if manifest_db is None and lp_exists(manifest_db_path(source_root)):
+            # One-off append (e.g. from a companion tool): open, insert, close.
+            db = SqliteManifest(manifest_db_path(source_root), logf=logf)
+            try:
+                db.append(record)
+            finally:
+                db.close()
+            logf(f"[MANIFEST] Appended: {record.get('action')} {record.get('relpath')}")
+            return
+        if manifest_db is not None:
+            manifest_db.append(record)
+            logf(f"[MANIFEST] Appended: {record.get('action')} {record.get('relpath')}")
+            return
         lp_mkdir(mdir)
         with lp_open(mpath, "a", encoding="utf-8", newline="\n") as f:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -593,48 +1861,1257 @@ def append_manifest_record(
 
 
 # ----------------------------
-# Retry helper
+# Manifest (SQLite, optional)
 # ----------------------------
-def copy_with_retry(
-    src: Path,
-    dst: Path,
-    *,
-    retries: int,
-    retry_delay_s: float,
-    logf,
-) -> Optional[Exception]:
+# Long-lived source roots accumulate millions of manifest lines; parsing the whole
+# NDJSON with json.loads on every start takes minutes and the in-memory index grows
+# with history. The SQLite manifest keeps the same records in an indexed table and
+# answers per-file lookups with one indexed query instead. Enabled with
+# --manifest-db, and used automatically from then on whenever manifest.sqlite exists
+# (so a later run without the flag can't silently miss records written to it).
+MANIFEST_DB_BATCH = 500  # records per INSERT transaction
+
+
+def manifest_db_path(source_root: Path) -> Path:
+    return manifest_dir(source_root) / "manifest.sqlite"
+
+
+def _manifest_record_row(record: dict) -> tuple:
+    size = record.get("size")
+    mtime = record.get("mtime")
+    return (
+        record.get("relpath"),
+        record.get("target_root", ""),
+        size if isinstance(size, int) else None,
+        float(mtime) if isinstance(mtime, (int, float)) else None,
+        record.get("action"),
+        record.get("ts"),
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+class SqliteManifest:
     """
-    Attempt shutil.copy2(src, dst) up to (1 + retries) times.
-    On each failure the partial destination is removed before the next attempt.
-    Returns None on success, or the last exception if all attempts fail.
+    SQLite-backed manifest. Also serves as the (relpath, target_root) -> (size,
+    mtime) index that load_manifest_index() returns: it supports `in`, `[]` and
+    `[]=` like that dict, so manifest_has_entry() works unchanged - but each
+    lookup is an indexed query for the most recent valid record ("last line
+    wins", as in the NDJSON loader) rather than a scan of the whole history.
+
+    Records are inserted in batches of MANIFEST_DB_BATCH (one transaction each)
+    and flushed on close(). The database runs in WAL mode; on UNC (network)
+    sources, where SQLite's WAL shared memory is not supported, it falls back
+    to the default rollback journal.
+
+    On open, any NDJSON lines not yet imported are imported once (the imported
+    byte offset is kept in the meta table), so switching an existing source
+    root over loses no history.
     """
-    last_exc: Optional[Exception] = None
-    attempts = 1 + retries
-    for attempt in range(1, attempts + 1):
-        try:
-            shutil.copy2(long_path(src), long_path(dst))
-            return None  # success
-        except Exception as e:
-            last_exc = e
-            # Remove partial/empty destination before retrying
-            try:
-                if lp_exists(dst):
-                    lp_unlink(dst)
-                    logf(f"[CLEANUP] Removed partial destination: {dst}")
-            except Exception as ce:
-                logf(f"[WARN] Could not remove partial destination: {dst} ({ce})")
 
-            if attempt < attempts:
-                logf(f"[RETRY] COPY attempt {attempt}/{attempts} failed: {src} ({e}). "
-                     f"Retrying in {retry_delay_s}s...")
-                time.sleep(retry_delay_s)
+    def __init__(self, db_path: Path, *, ndjson_path: Optional[Path] = None, readonly: bool = False, logf=print) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending: list = []
+        self._overlay: Dict[Tuple[str, str], Tuple[int, float]] = {}
+        self._readonly = readonly
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True, check_same_thread=False)
+            return
+        lp_mkdir(db_path.parent)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        if not str(db_path).startswith("\\\\"):
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                relpath TEXT NOT NULL,
+                target_root TEXT NOT NULL,
+                size INTEGER,
+                mtime REAL,
+                action TEXT,
+                ts TEXT,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_records_relpath_target ON records (relpath, target_root);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self._conn.commit()
+        if ndjson_path is not None:
+            self.import_ndjson(ndjson_path, logf=logf)
+
+    def import_ndjson(self, ndjson_path: Path, *, logf=print) -> int:
+        """Import NDJSON lines appended since the last import. Returns the number of records imported."""
+        if not lp_exists(ndjson_path):
+            return 0
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'ndjson_offset'").fetchone()
+        offset = int(row[0]) if row else 0
+        if lp_stat(ndjson_path).st_size <= offset:
+            return 0
+
+        imported = bad_lines = 0
+        batch: list = []
+        with lp_open(ndjson_path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # incomplete last line (writer still busy) - pick it up next time
+                offset += len(raw)
+                line = raw.decode("utf-8", errors="replace").strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    bad_lines += 1
+                    continue
+                if not isinstance(rec, dict) or not isinstance(rec.get("relpath"), str):
+                    bad_lines += 1
+                    continue
+                batch.append(_manifest_record_row(rec))
+                imported += 1
+                if len(batch) >= 10 * MANIFEST_DB_BATCH:
+                    self._insert_rows(batch)
+                    batch = []
+        self._insert_rows(batch)
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('ndjson_offset', ?)", (str(offset),))
+        self._conn.commit()
+        logf(f"[MANIFEST] Imported {imported} NDJSON record(s) into {self.db_path} (bad_lines={bad_lines})")
+        return imported
+
+    def _insert_rows(self, rows: list) -> None:
+        if rows:
+            self._conn.executemany(
+                "INSERT INTO records (relpath, target_root, size, mtime, action, ts, record) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def record_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def lookup(self, key: Tuple[str, str]) -> Optional[Tuple[int, float]]:
+        """Most recent (size, mtime) recorded for (relpath, target_root), or None."""
+        with self._lock:
+            if key in self._overlay:
+                return self._overlay[key]
+            row = self._conn.execute(
+                "SELECT size, mtime FROM records WHERE relpath = ? AND target_root = ? "
+                "AND size IS NOT NULL AND mtime IS NOT NULL ORDER BY id DESC LIMIT 1",
+                key,
+            ).fetchone()
+        return (int(row[0]), float(row[1])) if row else None
+
+    def latest_record(self, relpath: str, target_root: Optional[str] = None) -> Optional[dict]:
+        """Most recent full record for relpath (optionally for one target_root), or None."""
+        sql = "SELECT record FROM records WHERE relpath = ?"
+        params: tuple = (relpath,)
+        if target_root is not None:
+            sql += " AND target_root = ?"
+            params += (target_root,)
+        with self._lock:
+            row = self._conn.execute(sql + " ORDER BY id DESC LIMIT 1", params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __contains__(self, key) -> bool:
+        return self.lookup(key) is not None
+
+    def __getitem__(self, key) -> Tuple[int, float]:
+        value = self.lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        # Callers update the index right after appending the matching record; keep it in
+        # memory so the lookup is answered even before the batch is committed.
+        with self._lock:
+            self._overlay[key] = value
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            self._pending.append(_manifest_record_row(record))
+            if len(self._pending) >= MANIFEST_DB_BATCH:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._pending and not self._readonly:
+            self._insert_rows(self._pending)
+            self._conn.commit()
+        self._pending = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def set_synchronous(self, mode: str) -> None:
+        """PRAGMA synchronous (OFF / NORMAL / FULL); see ManifestWriter's fsync policy."""
+        if not self._readonly:
+            with self._lock:
+                self._conn.execute(f"PRAGMA synchronous={mode}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def open_manifest_db(source_root: Path, *, enable: bool, dry_run: bool, logf) -> Optional[SqliteManifest]:
+    """
+    Open the SQLite manifest if --manifest-db was given or manifest.sqlite already
+    exists; otherwise None (NDJSON mode). In dry-run an existing database is
+    opened read-only and a missing one is not created.
+    """
+    db_path = manifest_db_path(source_root)
+    exists = lp_exists(db_path)
+    if not (enable or exists):
+        return None
+    if dry_run:
+        if not exists:
+            logf(f"[MANIFEST][DRY] Would create SQLite manifest: {db_path}")
+            return None
+        return SqliteManifest(db_path, readonly=True, logf=logf)
+    return SqliteManifest(db_path, ndjson_path=manifest_path(source_root), logf=logf)
 
-    return last_exc
 
+# ----------------------------
+# Manifest writer (group commit)
+# ----------------------------
+# append_manifest_record() opens, writes and closes manifest.ndjson for every record;
+# on a network source root that is several round trips per transferred file. During a
+# run, transfer_tree() instead keeps one ManifestWriter open that buffers records and
+# writes them in groups. A crash loses at most the last unflushed group, which is safe:
+# those files simply get re-verified (partial hash) instead of skipped on the next run.
+DEFAULT_MANIFEST_FLUSH_RECORDS = 200
+DEFAULT_MANIFEST_FLUSH_S = 5.0
+MANIFEST_FSYNC_POLICIES = ("none", "batch", "every")
+DEFAULT_MANIFEST_FSYNC = "batch"
+
+
+class ManifestWriter:
+    """
+    Long-lived, thread-safe manifest appender for one source root.
+
+    Records are buffered and written every `flush_records` records or every
+    `flush_s` seconds (background flusher thread), whichever comes first, and
+    on close() - which transfer_tree() calls from its finally block, so Ctrl-C
+    still flushes. Goes to the SQLite manifest if `manifest_db` is given,
+    otherwise to manifest.ndjson through a single open handle.
+
+    fsync policy:
+      none  - leave durability to the OS (fastest, a power loss can drop recent groups)
+      batch - fsync once per written group (default)
+      every - write and fsync each record immediately (old per-record durability)
+    For SQLite, none maps to synchronous=OFF and batch/every to synchronous=FULL.
+    """
 
-def move_with_verify(
-    src: Path,
-    dst: Path,
+    def __init__(
+        self,
+        source_root: Path,
+        *,
+        manifest_db: Optional[SqliteManifest] = None,
+        flush_records: int = DEFAULT_MANIFEST_FLUSH_RECORDS,
+        flush_s: float = DEFAULT_MANIFEST_FLUSH_S,
+        fsync: str = DEFAULT_MANIFEST_FSYNC,
+        logf=print,
+    ) -> None:
+        if fsync not in MANIFEST_FSYNC_POLICIES:
+            raise ValueError(f"Unknown manifest fsync policy: {fsync}")
+        self.source_root = source_root
+        self.manifest_db = manifest_db
+        self.flush_records = 1 if fsync == "every" else max(1, int(flush_records))
+        self.flush_s = float(flush_s)
+        self.fsync = fsync
+        self.logf = logf
+        self.written = 0
+        self._pending: List[dict] = []
+        self._handle = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if manifest_db is not None:
+            manifest_db.set_synchronous("OFF" if fsync == "none" else "FULL")
+        if self.flush_records > 1 and self.flush_s > 0:
+            self._thread = threading.Thread(target=self._flush_loop, name="manifest-writer", daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_s):
+            self.flush()
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.flush_records:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        batch = self._pending
+        with PHASE_TIMES.timed("manifest"):
+            try:
+                if self.manifest_db is not None:
+                    for rec in batch:
+                        self.manifest_db.append(rec)
+                    self.manifest_db.flush()
+                else:
+                    if self._handle is None:
+                        lp_mkdir(manifest_dir(self.source_root))
+                        self._handle = lp_open(manifest_path(self.source_root), "a", encoding="utf-8", newline="\n")
+                    self._handle.write("".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in batch))
+                    self._handle.flush()
+                    if self.fsync != "none":
+                        os.fsync(self._handle.fileno())
+            except Exception as e:
+                # Keep the records and try again with the next group; the transfer itself goes on.
+                self.logf(f"[MANIFEST][ERROR] Failed to write {len(batch)} manifest record(s), will retry ({e})")
+                return
+        self.written += len(batch)
+        self._pending = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self._flush_locked()
+            if self._pending:
+                self.logf(f"[MANIFEST][ERROR] {len(self._pending)} manifest record(s) could not be written; "
+                          f"those files will be re-verified on the next run.")
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+# ----------------------------
+# Kernel copy paths (Linux)
+# ----------------------------
+# stream_copy()'s loop moves every byte through Python buffers. On Linux the kernel can
+# copy a file by itself; kernel_copy() tries, in order:
+#   reflink          - ioctl(FICLONE): on btrfs/XFS (same filesystem) the copy shares the
+#                      source's extents - no data is copied and no extra space is used
+#   copy_file_range  - in-kernel copy; a server-side copy on NFS 4.2 / SMB3 mounts
+#   sendfile         - in-kernel copy between any two regular files
+# and stream_copy() falls back to its buffered loop when none of them applies (other
+# filesystems, other OSes, --copy-backend buffered). A method that fails with one of
+# KERNEL_COPY_FALLBACK_ERRNOS ("not supported here") is skipped for the next one; any
+# other error is a real I/O failure and goes to copy_with_retry() like a buffered one.
+# The method used is reported per file ("via ...") and counted in the run summary.
+# The data never passes through user space, so copy_file_range/sendfile get their content
+# hash from a SideHash: a read of the source alongside the copy (both read the same pages
+# at about the same time, so the source is still fetched about once). It only starts once
+# a first block-sized probe call has copied data, so a method that is not supported costs
+# no read, and it is cancelled, not waited for, when the copy then fails. A reflink copies
+# no data and records no hash (see stream_copy()).
+COPY_BACKENDS = ("auto", "buffered")
+DEFAULT_COPY_BACKEND = "auto"
+KERNEL_COPY_METHODS = ("reflink", "copy_file_range", "sendfile")
+KERNEL_COPY_CHUNK_BYTES = 1024 * 1024 * 1024   # per copy_file_range/sendfile call
+FICLONE = 0x40049409                          # _IOW(0x94, 9, int), linux/fs.h
+# Only "not supported for this pair of files" errnos: a real permission or descriptor
+# error (EPERM, EBADF, ...) is raised, not retried down the chain and by the buffered copy.
+KERNEL_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY}
+
+
+def kernel_copy_methods() -> List[str]:
+    """Kernel copy methods usable on this host, in the order kernel_copy() tries them."""
+    if not sys.platform.startswith("linux"):
+        return []
+    methods = []
+    if fcntl is not None:
+        methods.append("reflink")
+    if hasattr(os, "copy_file_range"):
+        methods.append("copy_file_range")
+    if hasattr(os, "sendfile"):
+        methods.append("sendfile")
+    return methods
+
+
+def _kernel_copy_fd(fd_src: int, fd_dst: int, size: int, method: str, on_copying=None, probe_bytes: int = 0) -> None:
+    """
+    With on_copying, the first call copies only probe_bytes: a method that is not
+    supported fails on it, and on_copying() runs once it has copied data.
+    """
+    if method == "reflink":
+        fcntl.ioctl(fd_dst, FICLONE, fd_src)
+        COPY_METER.add(size)
+        return
+    offset = 0
+    while offset < size:
+        n = min(probe_bytes if on_copying is not None else KERNEL_COPY_CHUNK_BYTES, size - offset)
+        if method == "copy_file_range":
+            done = os.copy_file_range(fd_src, fd_dst, n, offset, offset)
+        else:
+            os.lseek(fd_dst, offset, os.SEEK_SET)
+            done = os.sendfile(fd_dst, fd_src, offset, n)
+        if done == 0:
+            raise OSError(errno.EIO, f"Source ended at byte {offset} of {size} during {method}")
+        offset += done
+        COPY_METER.add(done)
+        if on_copying is not None:
+            on_copying()
+            on_copying = None
+
+
+class SideHash:
+    """Content hash of the first `size` bytes of a file, read on a background thread; cancel() stops it."""
+
+    def __init__(self, path: Path, size: int, block_bytes: int) -> None:
+        self._cancelled = threading.Event()
+        self._digest: Optional[str] = None
+        self._exc: Optional[BaseException] = None
+        # The side read keeps its pages cached (no drop-behind) so the kernel copy finds them.
+        self._thread = threading.Thread(target=self._run, args=(path, size, block_bytes),
+                                        name="side-hash", daemon=True)
+        self._thread.start()
+
+    def _run(self, path: Path, size: int, block_bytes: int) -> None:
+        try:
+            h = new_content_hasher()
+            mv = memoryview(bytearray(block_bytes))
+            remaining = size
+            with lp_open(path, "rb", buffering=0) as f:
+                while remaining and not self._cancelled.is_set():
+                    n = f.readinto(mv[:min(block_bytes, remaining)])
+                    if not n:
+                        break
+                    h.update(mv[:n])
+                    remaining -= n
+            self._digest = h.hexdigest()
+        except BaseException as e:
+            self._exc = e
+
+    def cancel(self) -> None:
+        """Stop the read within one block; the thread is not waited for."""
+        self._cancelled.set()
+
+    def result(self) -> str:
+        self._thread.join()
+        if self._exc is not None:
+            raise self._exc
+        return self._digest
+
+
+def kernel_copy(src: Path, dst: Path, size: int, block_bytes: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Copy the `size`-byte src onto dst (created/truncated) without user-space
+    buffers. Returns (method used, content hash of src - None after a reflink),
+    or (None, None) if no kernel method applies to this pair of files (dst is
+    then left empty for a buffered copy, which hashes inline).
+    """
+    methods = kernel_copy_methods()
+    if not methods or size == 0:
+        return None, None
+    side: Optional[SideHash] = None
+
+    def start_side_hash() -> None:
+        nonlocal side
+        if side is None:
+            side = SideHash(src, size, block_bytes)
+
+    try:
+        with lp_open(src, "rb", buffering=0) as fsrc, lp_open(dst, "wb", buffering=0) as fdst:
+            for method in methods:
+                try:
+                    _kernel_copy_fd(fsrc.fileno(), fdst.fileno(), size, method,
+                                    on_copying=start_side_hash, probe_bytes=block_bytes)
+                except OSError as e:
+                    if e.errno not in KERNEL_COPY_FALLBACK_ERRNOS:
+                        raise
+                    os.ftruncate(fdst.fileno(), 0)
+                    continue
+                return method, (side.result() if side is not None else None)
+    finally:
+        if side is not None:
+            side.cancel()
+    return None, None
+
+
+# ----------------------------
+# Large-file I/O mode (--large-file-io)
+# ----------------------------
+# A 200 GB .bin streamed through the page cache, then read back, evicts everything else
+# the acquisition/transfer PC had cached. For files of at least --large-file-min-gb:
+#   fadvise - reserve the destination's space (fallocate KEEP_SIZE), read the source with a
+#             sequential-readahead hint, and drop already copied/hashed pages from the
+#             cache every LARGE_IO_DROP_BYTES (POSIX_FADV_DONTNEED). Written pages must be
+#             clean before they can be dropped: each drop call starts writeback of the
+#             latest window and drops the window before it.
+#   direct  - as fadvise, but source and destination are opened with O_DIRECT (page-aligned
+#             buffer, the last block padded and truncated), bypassing the cache entirely.
+#             Falls back to fadvise where O_DIRECT is refused (e.g. tmpfs) or on an
+#             unaligned resume offset.
+# A kernel copy (--copy-backend auto) is still tried first; its pages are dropped afterwards.
+# Either way throughput and peak RSS of every such file are logged, also with "off", so
+# the modes can be compared. Hints are silently skipped where the OS lacks them (Windows).
+LARGE_FILE_IO_MODES = ("off", "fadvise", "direct")
+DEFAULT_LARGE_FILE_IO = "off"
+DEFAULT_LARGE_FILE_MIN_GB = 4.0
+LARGE_IO_DROP_BYTES = 64 * 1024 * 1024
+DIRECT_IO_ALIGN = 4096
+
+
+def _fadvise(fd: int, offset: int, length: int, advice_name: str) -> None:
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        pass  # only a hint
+
+
+# fallocate(2) with FALLOC_FL_KEEP_SIZE reserves the blocks but leaves the file size alone.
+# os.posix_fallocate() would grow the .part to its full size, and _resume_offset() takes
+# the .part size as the number of bytes written: after a crash a full-size .part would be
+# "resumed" at its end, with its unwritten zero tail passing the prefix/tail checks
+# whenever the source itself ends in zeros.
+FALLOC_FL_KEEP_SIZE = 0x01
+if sys.platform.startswith("linux"):
+    try:
+        import ctypes
+        _libc_fallocate = ctypes.CDLL(None, use_errno=True).fallocate
+        _libc_fallocate.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64)
+    except (ImportError, OSError, AttributeError):
+        _libc_fallocate = None
+else:
+    _libc_fallocate = None
+
+
+def preallocate(fd: int, size: int) -> bool:
+    """Reserve `size` bytes of disk space for fd without changing its size (see FALLOC_FL_KEEP_SIZE)."""
+    if size <= 0 or _libc_fallocate is None:
+        return False
+    # Not supported by every filesystem (SMB/NFS mounts); only an optimization.
+    return _libc_fallocate(fd, FALLOC_FL_KEEP_SIZE, 0, size) == 0
+
+
+class DropBehind:
+    """Drops a sequentially read or written file's pages from the page cache as it goes."""
+
+    def __init__(self, fd: int, start: int = 0, *, dirty: bool) -> None:
+        self.fd = fd
+        self.dirty = dirty
+        self.mark = start       # end of the last window handed to DONTNEED
+        self.clean_from = start  # start of the range that still needs a DONTNEED
+        if not dirty:
+            _fadvise(fd, start, 0, "POSIX_FADV_SEQUENTIAL")
+
+    def advance(self, pos: int) -> None:
+        if pos - self.mark < LARGE_IO_DROP_BYTES:
+            return
+        _fadvise(self.fd, self.clean_from, pos - self.clean_from, "POSIX_FADV_DONTNEED")
+        # Dirty pages only get their writeback started here; drop them again next time.
+        self.clean_from = self.mark if self.dirty else pos
+        self.mark = pos
+
+    def finish(self) -> None:
+        if self.dirty:
+            os.fsync(self.fd)
+        _fadvise(self.fd, 0, 0, "POSIX_FADV_DONTNEED")
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux /proc), or None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def drop_file_cache(path: Path, *, written: bool) -> None:
+    """Drop a whole file from the page cache (flushing it first if it was just written)."""
+    try:
+        with lp_open(path, "r+b" if written else "rb", buffering=0) as f:
+            DropBehind(f.fileno(), dirty=written).finish()
+    except OSError:
+        pass
+
+
+def _open_direct(path: Path, flags: int) -> Optional[int]:
+    """os.open() with O_DIRECT, or None if the OS/filesystem refuses O_DIRECT."""
+    if not hasattr(os, "O_DIRECT"):
+        return None
+    try:
+        return os.open(long_path(path), flags | os.O_DIRECT, 0o666)
+    except OSError as e:
+        if e.errno in (errno.EINVAL, errno.EOPNOTSUPP):
+            return None
+        raise
+
+
+def _direct_copy(src: Path, part: Path, src_size: int, offset: int, h, block_bytes: int,
+                 resume_state: dict, peak_rss: list) -> Optional[int]:
+    """
+    The stream_copy() loop with O_DIRECT on both files. Returns bytes in `part`
+    afterwards, or None (nothing done) if O_DIRECT isn't available for this pair.
+    """
+    fd_src = _open_direct(src, os.O_RDONLY)
+    if fd_src is None:
+        return None
+    try:
+        fd_dst = _open_direct(part, os.O_WRONLY | os.O_CREAT | (0 if offset else os.O_TRUNC))
+        if fd_dst is None:
+            return None
+        try:
+            if offset:
+                os.ftruncate(fd_dst, offset)
+            else:
+                preallocate(fd_dst, src_size)
+            buf = mmap.mmap(-1, block_bytes)   # page-aligned, as O_DIRECT requires
+            mv = memoryview(buf)
+            pos = offset
+            next_ckpt = offset + RESUME_CHECKPOINT_BYTES
+            next_rss = offset + LARGE_IO_DROP_BYTES
+            while pos < src_size:
+                n = os.preadv(fd_src, [buf], pos)
+                if not n:
+                    break
+                h.update(mv[:n])
+                padded = -(-n // DIRECT_IO_ALIGN) * DIRECT_IO_ALIGN
+                os.pwrite(fd_dst, mv[:padded], pos)
+                pos += n
+                COPY_METER.add(n)
+                if pos >= next_rss:
+                    peak_rss.append(current_rss_bytes())
+                    next_rss = pos + LARGE_IO_DROP_BYTES
+                if pos % DIRECT_IO_ALIGN:
+                    break  # short (final) read; a further O_DIRECT read can't start here
+                if pos >= next_ckpt:
+                    os.fsync(fd_dst)
+                    resume_state["offset"] = pos
+                    resume_state["hasher"] = h.copy()
+                    next_ckpt = pos + RESUME_CHECKPOINT_BYTES
+            os.ftruncate(fd_dst, pos)   # cut the padding of the last block
+            os.fsync(fd_dst)
+            mv.release()
+            buf.close()
+            return pos
+        finally:
+            os.close(fd_dst)
+    finally:
+        os.close(fd_src)
+
+
+# ----------------------------
+# Streaming copy engine
+# ----------------------------
+# Replaces shutil.copy2() + a separate partial_hash_match() pass. The source is read
+# exactly once, in large blocks, and hashed while it is written, so every copy yields
+# a full-content hash (recorded in the manifest) at no extra source I/O. The
+# destination is then checked either by a full hash read-back (source is about to be
+# deleted) or by size + tail comparison (cheap check for COPY-category files).
+COPY_BLOCK_BYTES = 8 * 1024 * 1024   # 8 MiB per read/write
+TAIL_CHECK_BYTES = 1_048_576         # 1 MiB compared at the end of the file for verify="tail"
+CONTENT_HASH_ALGO = "blake2b-256"
+
+# Resumable copies: data is written to "<name>.part" and only renamed to the final
+# name after completion and verification. A failed attempt leaves the .part in
+# place; the next attempt (or the next run) continues from its end instead of byte 0.
+PART_SUFFIX = ".part"
+RESUME_VERIFY_BYTES = 4 * 1024 * 1024         # prefix tail compared against the source before appending
+RESUME_CHECKPOINT_BYTES = 256 * 1024 * 1024   # fsync + hash-state checkpoint interval
+
+
+def new_content_hasher():
+    return hashlib.blake2b(digest_size=32)
+
+
+def full_hash(file_path: Path, block_bytes: int = COPY_BLOCK_BYTES, drop_cache: bool = False) -> str:
+    """Full-content hash of file_path (same algorithm as the inline hash in stream_copy())."""
+    h = new_content_hasher()
+    buf = bytearray(block_bytes)
+    mv = memoryview(buf)
+    with lp_open(file_path, "rb", buffering=0) as f:
+        behind = DropBehind(f.fileno(), dirty=False) if drop_cache else None
+        pos = 0
+        while True:
+            n = f.readinto(mv)
+            if not n:
+                break
+            h.update(mv[:n])
+            pos += n
+            if behind is not None:
+                behind.advance(pos)
+        if behind is not None:
+            behind.finish()
+    return h.hexdigest()
+
+
+def read_tail(file_path: Path, size: int, n: int = TAIL_CHECK_BYTES) -> bytes:
+    n = min(n, size)
+    with lp_open(file_path, "rb") as f:
+        f.seek(size - n)
+        return f.read(n)
+
+
+def part_path(dst: Path) -> Path:
+    return dst.with_name(dst.name + PART_SUFFIX)
+
+
+def _ranges_equal(a: Path, b: Path, start: int, length: int) -> bool:
+    with lp_open(a, "rb") as fa, lp_open(b, "rb") as fb:
+        fa.seek(start)
+        fb.seek(start)
+        return fa.read(length) == fb.read(length)
+
+
+def _resume_offset(src: Path, part: Path, src_size: int, resume_state: dict, logf):
+    """
+    Decide where to resume an interrupted copy into `part`. Returns (offset,
+    hasher) with the hasher already fed bytes [0, offset), or (0, None) to start
+    over. The existing prefix is only trusted if its last RESUME_VERIFY_BYTES
+    match the source at the same position.
+    """
+    try:
+        part_size = lp_stat(part).st_size
+    except OSError:
+        return 0, None
+    if part_size == 0 or part_size > src_size:
+        return 0, None
+
+    # Same-process retry: resume from the last fsync'ed checkpoint, whose hash state is
+    # still in memory. Otherwise (new run, or the .part is shorter than the checkpoint),
+    # resume from the end of the .part and rebuild the hash from the source prefix -
+    # a local read, instead of re-sending that prefix to the target.
+    ckpt_offset = resume_state.get("offset", 0)
+    hasher = None
+    if 0 < ckpt_offset <= part_size:
+        offset = ckpt_offset
+        hasher = resume_state["hasher"].copy()
+    else:
+        offset = part_size
+
+    check = min(RESUME_VERIFY_BYTES, offset)
+    if not _ranges_equal(src, part, offset - check, check):
+        logf(f"[RESUME] Existing partial copy does not match source, restarting from 0: {part}")
+        return 0, None
+
+    if hasher is None:
+        hasher = new_content_hasher()
+        remaining = offset
+        with lp_open(src, "rb") as f:
+            while remaining:
+                chunk = f.read(min(COPY_BLOCK_BYTES, remaining))
+                if not chunk:
+                    return 0, None
+                hasher.update(chunk)
+                remaining -= len(chunk)
+
+    logf(f"[RESUME] Continuing partial copy at byte {offset} of {src_size}: {part}")
+    return offset, hasher
+
+
+def stream_copy(
+    src: Path,
+    dst: Path,
+    *,
+    verify: str,
+    block_bytes: int = COPY_BLOCK_BYTES,
+    resume_state: Optional[dict] = None,
+    logf=print,
+    sample_blocks: int = DEFAULT_SAMPLE_BLOCKS,
+    sample_block_size: int = DEFAULT_SAMPLE_BLOCK_KB * 1024,
+    sampler: str = SAMPLER_RANDOM,
+    backend: str = DEFAULT_COPY_BACKEND,
+    large_io: str = DEFAULT_LARGE_FILE_IO,
+    large_min_bytes: int = int(DEFAULT_LARGE_FILE_MIN_GB * 1024**3),
+) -> dict:
+    """
+    Copy src -> dst in `block_bytes` blocks, hashing the stream inline, then copy
+    the source's timestamps/permissions (shutil.copystat, as shutil.copy2 did) and
+    verify the destination.
+
+    With backend="auto", a fresh copy (nothing to resume) first goes through
+    kernel_copy(). copy_file_range/sendfile take their content hash from a side
+    read of the source (SideHash); a reflink has none, and verify="readback"
+    then hashes the source as well (the two files share their extents).
+
+    Files of at least large_min_bytes are copied in --large-file-io mode
+    `large_io` (see DropBehind/_direct_copy()) and report "mb_s" and "peak_rss"
+    (bytes, None if unknown) in the returned dict.
+
+    Data goes to part_path(dst) and is renamed onto dst only after the copy is
+    complete and verified. If a .part from an earlier failed attempt exists, the
+    copy resumes from its end (see _resume_offset()). `resume_state`, if given,
+    carries the last fsync'ed offset and hash state between attempts of the same
+    copy_with_retry() call, so a retry needn't re-hash the prefix.
+
+    Verification of the finished .part:
+
+      verify="readback": re-read dst in full and compare its hash with the inline
+                         source hash (strongest; costs one read of the destination,
+                         never a second read of the source).
+      verify="tail":     dst size == bytes written, and the last TAIL_CHECK_BYTES of
+                         dst equal those of src (catches truncation/short writes).
+      verify="sample":   dst size == bytes written, and a partial hash (sample_blocks
+                         x sample_block_size, `sampler`) of dst equals that of src.
+      verify="size":     dst size == bytes written only.
+
+    Returns {"content_hash", "hash_algo", "bytes", "resumed_from", "copied_by"}
+    ("content_hash"/"hash_algo" are None when not computed). Raises OSError
+    on I/O failure (the .part is kept for resuming) and RuntimeError on a
+    verification mismatch (the .part is left for the caller to discard).
+    """
+    if resume_state is None:
+        resume_state = {}
+    part = part_path(dst)
+    src_size = lp_stat(src).st_size
+
+    offset, h = _resume_offset(src, part, src_size, resume_state, logf)
+    if h is None:
+        offset, h = 0, new_content_hasher()
+        resume_state.clear()
+    tracked = src_size >= large_min_bytes
+    io_mode = large_io if tracked else "off"
+    peak_rss: list = [current_rss_bytes()] if tracked else []
+    t0 = time.monotonic()
+    copied_by = None
+    digest = None
+    if backend == "auto" and offset == 0:
+        copied_by, digest = kernel_copy(src, part, src_size, block_bytes)
+        written = src_size
+        if copied_by is not None and io_mode != "off":
+            drop_file_cache(src, written=False)
+            drop_file_cache(part, written=True)
+    if copied_by is None and io_mode == "direct" and offset % DIRECT_IO_ALIGN == 0:
+        direct_written = _direct_copy(src, part, src_size, offset, h, block_bytes, resume_state, peak_rss)
+        if direct_written is not None:
+            copied_by, written = "buffered, O_DIRECT", direct_written
+            digest = h.hexdigest()
+        else:
+            io_mode = "fadvise"
+    if copied_by is None:
+        copied_by = "buffered"
+        buf = bytearray(block_bytes)
+        mv = memoryview(buf)
+        written = offset
+        next_ckpt = offset + RESUME_CHECKPOINT_BYTES
+        next_rss = offset + LARGE_IO_DROP_BYTES
+        with lp_open(src, "rb", buffering=0) as fsrc, lp_open(part, "r+b" if offset else "wb") as fdst:
+            if offset:
+                fdst.truncate(offset)
+                fdst.seek(offset)
+                fsrc.seek(offset)
+            behind_src = behind_dst = None
+            if io_mode != "off":
+                if not offset:
+                    preallocate(fdst.fileno(), src_size)
+                behind_src = DropBehind(fsrc.fileno(), offset, dirty=False)
+                behind_dst = DropBehind(fdst.fileno(), offset, dirty=True)
+            while True:
+                n = fsrc.readinto(mv)
+                if not n:
+                    break
+                fdst.write(mv[:n])
+                h.update(mv[:n])
+                written += n
+                COPY_METER.add(n)
+                if behind_src is not None:
+                    behind_src.advance(written)
+                    behind_dst.advance(written)
+                if tracked and written >= next_rss:
+                    peak_rss.append(current_rss_bytes())
+                    next_rss = written + LARGE_IO_DROP_BYTES
+                if written >= next_ckpt:
+                    fdst.flush()
+                    os.fsync(fdst.fileno())
+                    resume_state["offset"] = written
+                    resume_state["hasher"] = h.copy()
+                    next_ckpt = written + RESUME_CHECKPOINT_BYTES
+            if behind_src is not None:
+                fdst.truncate(written)   # in case preallocation ran past a shrunken source
+                fdst.flush()
+                behind_dst.finish()
+                behind_src.finish()
+        digest = h.hexdigest()
+    copy_s = time.monotonic() - t0
+    shutil.copystat(long_path(src), long_path(part))
+
+    with PHASE_TIMES.timed("hash"):
+        drop = io_mode != "off"
+        if verify == "readback":
+            if digest is None:   # reflink: no inline hash
+                digest = full_hash(src, block_bytes=block_bytes, drop_cache=drop)
+            dst_digest = full_hash(part, block_bytes=block_bytes, drop_cache=drop)
+            if dst_digest != digest:
+                raise RuntimeError(f"Read-back hash mismatch after copy: {part} ({dst_digest} != {digest})")
+        elif verify in ("tail", "sample", "size"):
+            dst_size = lp_stat(part).st_size
+            if dst_size != written:
+                raise RuntimeError(f"Size mismatch after copy: {part} ({dst_size} != {written} bytes written)")
+            if verify == "tail" and written and read_tail(part, written) != read_tail(src, written):
+                raise RuntimeError(f"Tail mismatch after copy: {part}")
+            if verify == "sample" and not partial_hash_match(
+                src, part, dst.name, sample_blocks, sample_block_size, src_size=written, dst_size=dst_size,
+                use_cache=False, sampler=sampler,
+            ):
+                raise RuntimeError(f"Partial-hash mismatch after copy: {part}")
+        else:
+            raise ValueError(f"Unknown verify mode: {verify}")
+
+    os.replace(long_path(part), long_path(dst))
+    info = {"content_hash": digest, "hash_algo": CONTENT_HASH_ALGO if digest else None, "bytes": written,
+            "resumed_from": offset, "copied_by": copied_by}
+    if tracked:
+        peak_rss.append(current_rss_bytes())
+        known = [r for r in peak_rss if r is not None]
+        info["mb_s"] = (written - offset) / 1024**2 / max(copy_s, 1e-6)
+        info["peak_rss"] = max(known) if known else None
+    return info
+
+
+# ----------------------------
+# Ranged (multi-stream) copy
+# ----------------------------
+# One sequential stream reaches only a fraction of a high-latency 10G link. For
+# files of at least --stream-min-gb, copy_with_retry() can instead split the file
+# into RANGE_COPY_BYTES ranges and copy `streams` of them at a time, each thread
+# writing at its own offset into a full-size "<name>.rpart". Ranges are started in
+# ascending order, so at most `streams` neighbouring ranges are open at a time. Where
+# fallocate() works (Linux, see preallocate()) the .rpart gets its blocks up front;
+# elsewhere it is only extended and stays sparse until written - on NTFS a write above
+# the valid data length zero-fills the gap first, so the ranges of the open window may
+# be written twice. Ranged copies are buffered reads/writes: --copy-backend auto and
+# --large-file-io do not apply to them (logged per file). Every range is
+# hashed while it is copied and read back + compared right after it is written;
+# a failed or mismatching range is retried on its own. Verified ranges are listed
+# in "<name>.rpart.json", so an interrupted ranged copy resumes with the missing
+# ranges only (also on the next run). Once all ranges are verified, the .rpart is
+# renamed onto dst.
+#
+# The content hash of a ranged copy is a tree hash: blake2b-256 over the
+# concatenated per-range digests, recorded with hash_algo
+# "blake2b-256-tree/<range MiB>M" so it is never compared against a plain
+# full_hash() of the file.
+RANGED_PART_SUFFIX = ".rpart"
+RANGE_COPY_BYTES = 256 * 1024 * 1024
+DEFAULT_STREAMS = 1            # 1 = always a single sequential stream (stream_copy)
+DEFAULT_STREAM_MIN_GB = 8.0
+
+
+def ranged_part_paths(dst: Path) -> Tuple[Path, Path]:
+    part = dst.with_name(dst.name + RANGED_PART_SUFFIX)
+    return part, part.with_name(part.name + ".json")
+
+
+def ranged_hash_algo(range_bytes: int) -> str:
+    return f"{CONTENT_HASH_ALGO}-tree/{range_bytes // (1024 * 1024)}M"
+
+
+def _load_range_state(state_path: Path, part: Path, src_size: int, src_mtime: float, range_bytes: int) -> Dict[int, str]:
+    """Verified ranges of an earlier attempt ({index: digest}), if its state matches this source."""
+    try:
+        if lp_stat(part).st_size != src_size:
+            return {}
+        with lp_open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (state.get("size") != src_size or state.get("range_bytes") != range_bytes
+            or abs(float(state.get("mtime", 0.0)) - src_mtime) > 2.0):
+        return {}
+    return {int(k): v for k, v in state.get("done", {}).items()}
+
+
+def _save_range_state(state_path: Path, src_size: int, src_mtime: float, range_bytes: int, done: Dict[int, str]) -> None:
+    tmp = state_path.with_name(state_path.name + ".tmp")
+    with lp_open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"size": src_size, "mtime": src_mtime, "range_bytes": range_bytes,
+                   "done": {str(k): v for k, v in sorted(done.items())}}, f)
+    os.replace(long_path(tmp), long_path(state_path))
+
+
+def _copy_range(src: Path, part: Path, start: int, length: int, block_bytes: int) -> str:
+    """Copy bytes [start, start+length) of src into part at the same offset, then read them back. Returns the digest."""
+    h = new_content_hasher()
+    buf = bytearray(min(block_bytes, length) or 1)
+    mv = memoryview(buf)
+    with lp_open(src, "rb", buffering=0) as fsrc, lp_open(part, "r+b") as fdst:
+        fsrc.seek(start)
+        fdst.seek(start)
+        remaining = length
+        while remaining:
+            n = fsrc.readinto(mv[:min(len(buf), remaining)])
+            if not n:
+                raise OSError(f"Source ended early at byte {start + length - remaining}: {src}")
+            fdst.write(mv[:n])
+            h.update(mv[:n])
+            remaining -= n
+            COPY_METER.add(n)
+        fdst.flush()
+        os.fsync(fdst.fileno())
+
+    check = new_content_hasher()
+    with lp_open(part, "rb", buffering=0) as f:
+        f.seek(start)
+        remaining = length
+        while remaining:
+            n = f.readinto(mv[:min(len(buf), remaining)])
+            if not n:
+                break
+            check.update(mv[:n])
+            remaining -= n
+    digest = h.hexdigest()
+    if remaining or check.hexdigest() != digest:
+        raise RuntimeError(f"Read-back mismatch in range {start}-{start + length}: {part}")
+    return digest
+
+
+def ranged_copy(
+    src: Path,
+    dst: Path,
+    *,
+    streams: int,
+    retries: int,
+    retry_delay_s: float,
+    range_bytes: int = RANGE_COPY_BYTES,
+    block_bytes: int = COPY_BLOCK_BYTES,
+    logf=print,
+) -> dict:
+    """
+    Copy src -> dst as parallel ranges (see the section comment above). Each
+    range is attempted up to (1 + retries) times on its own. Returns the same
+    dict as stream_copy(), with a tree hash. Raises the last error of a range
+    that failed every attempt; verified ranges stay recorded for the next try.
+    """
+    part, state_path = ranged_part_paths(dst)
+    st = lp_stat(src)
+    src_size, src_mtime = st.st_size, st.st_mtime
+    n_ranges = max(1, -(-src_size // range_bytes))
+
+    done = _load_range_state(state_path, part, src_size, src_mtime, range_bytes)
+    if done:
+        logf(f"[RESUME] Ranged copy: {len(done)}/{n_ranges} range(s) already verified: {part}")
+    else:
+        # Every range is written at its own offset into a full-size file; reserve its blocks
+        # where the platform can (sparse otherwise, see the section comment).
+        with lp_open(part, "wb") as f:
+            f.truncate(src_size)
+            preallocate(f.fileno(), src_size)
+        _save_range_state(state_path, src_size, src_mtime, range_bytes, done)
+
+    state_lock = threading.Lock()
+
+    def run_range(idx: int) -> None:
+        start = idx * range_bytes
+        length = min(range_bytes, src_size - start)
+        for attempt in range(1, retries + 2):
+            try:
+                digest = _copy_range(src, part, start, length, block_bytes)
+            except Exception as e:
+                if attempt > retries:
+                    raise
+                logf(f"[RETRY] Range {idx + 1}/{n_ranges} attempt {attempt}/{retries + 1} failed: {src} ({e}). "
+                     f"Retrying in {retry_delay_s}s...")
+                time.sleep(retry_delay_s)
+                continue
+            with state_lock:
+                done[idx] = digest
+                _save_range_state(state_path, src_size, src_mtime, range_bytes, done)
+            return
+
+    todo = [i for i in range(n_ranges) if i not in done]
+    resumed_bytes = src_size - sum(min(range_bytes, src_size - i * range_bytes) for i in todo)
+    first_exc: Optional[Exception] = None
+    with ThreadPoolExecutor(max_workers=max(1, min(streams, len(todo) or 1))) as pool:
+        for fut in as_completed([pool.submit(run_range, i) for i in todo]):
+            exc = fut.exception()
+            if exc is not None and first_exc is None:
+                first_exc = exc
+    if first_exc is not None:
+        raise first_exc
+
+    dst_size = lp_stat(part).st_size
+    if dst_size != src_size:
+        raise RuntimeError(f"Size mismatch after ranged copy: {part} ({dst_size} != {src_size})")
+    shutil.copystat(long_path(src), long_path(part))
+    tree = new_content_hasher()
+    for i in range(n_ranges):
+        tree.update(bytes.fromhex(done[i]))
+    os.replace(long_path(part), long_path(dst))
+    try:
+        lp_unlink(state_path)
+    except OSError:
+        pass
+    # resumed_from: bytes that were already verified before this call (not necessarily a prefix here).
+    return {"content_hash": tree.hexdigest(), "hash_algo": ranged_hash_algo(range_bytes),
+            "bytes": src_size, "resumed_from": resumed_bytes, "copied_by": f"{streams} streams"}
+
+
+# ----------------------------
+# Same-volume detection
+# ----------------------------
+# move_with_verify() used to try os.rename() for every MOVE and fall back to copy+verify
+# on OSError. Across volumes (acquisition PC -> NAS, the usual case) each of those renames
+# is a wasted round trip that fails with WinError 17 / EXDEV. Whether a source and a
+# destination folder share a volume is now decided once per folder pair: the same device
+# (st_dev, the volume serial number on Windows) and, for UNC paths, the same host\share
+# after normalize_unc_root() - SMB cannot rename between two shares even when they sit
+# on one server volume. A rename that still fails cross-device marks the pair, and a pair
+# that cannot be decided (stat fails, serial 0) keeps the old try-rename-first behavior.
+def unc_share(path: Path) -> str:
+    """Host and share of a UNC path (aliases canonicalized, casefolded), '' for drive-letter paths."""
+    anchor = PureWindowsPath(normalize_unc_root(str(path))).anchor
+    return anchor.rstrip("\\").casefold() if anchor.startswith("\\\\") else ""
+
+
+class SameVolumeCache:
+    """
+    Per-run cache of "can a MOVE from this source folder to this destination
+    folder be a rename?" (see the section comment). same() stats each folder
+    once (the nearest existing ancestor for a destination not created yet)
+    and answers True, False or None (unknown: try the rename).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._devices: Dict[Path, Optional[int]] = {}
+        self._pairs: Dict[Tuple[Path, Path], Optional[bool]] = {}
+
+    def _device(self, dir_path: Path) -> Optional[int]:
+        with self._lock:
+            if dir_path in self._devices:
+                return self._devices[dir_path]
+        dev = None
+        for p in (dir_path, *dir_path.parents):
+            try:
+                dev = os.stat(long_path(p)).st_dev or None
+                break
+            except OSError:
+                continue
+        with self._lock:
+            return self._devices.setdefault(dir_path, dev)
+
+    def same(self, src_dir: Path, dst_dir: Path) -> Optional[bool]:
+        key = (src_dir, dst_dir)
+        with self._lock:
+            if key in self._pairs:
+                return self._pairs[key]
+        if unc_share(src_dir) != unc_share(dst_dir):
+            same = False
+        else:
+            src_dev, dst_dev = self._device(src_dir), self._device(dst_dir)
+            same = None if src_dev is None or dst_dev is None else src_dev == dst_dev
+        with self._lock:
+            return self._pairs.setdefault(key, same)
+
+    def note_cross_device(self, src_dir: Path, dst_dir: Path) -> None:
+        """A rename between these folders failed cross-device: copy from now on."""
+        with self._lock:
+            self._pairs[(src_dir, dst_dir)] = False
+
+
+def describe_same_volume(same: Optional[bool]) -> str:
+    return {True: "yes (MOVEs are renames)", False: "no (MOVEs copy, verify, then delete)",
+            None: "unknown (MOVEs try a rename first)"}[same]
+
+
+# ----------------------------
+# Retry helper
+# ----------------------------
+def copy_with_retry(
+    src: Path,
+    dst: Path,
+    *,
+    retries: int,
+    retry_delay_s: float,
+    logf,
+    verify: str = "tail",
+    streams: int = DEFAULT_STREAMS,
+    stream_min_bytes: int = int(DEFAULT_STREAM_MIN_GB * 1024**3),
+    sample_blocks: int = DEFAULT_SAMPLE_BLOCKS,
+    sample_block_size: int = DEFAULT_SAMPLE_BLOCK_KB * 1024,
+    sampler: str = SAMPLER_RANDOM,
+    backend: str = DEFAULT_COPY_BACKEND,
+    large_io: str = DEFAULT_LARGE_FILE_IO,
+    large_min_bytes: int = int(DEFAULT_LARGE_FILE_MIN_GB * 1024**3),
+) -> Tuple[Optional[Exception], dict]:
+    """
+    Attempt stream_copy(src, dst, verify=verify, backend=backend, large_io=large_io)
+    up to (1 + retries) times.
+
+    An I/O failure keeps the partial "<dst>.part", and the next attempt resumes
+    from its last verified offset instead of restarting from byte 0 - a timeout
+    150 GB into a 200 GB file no longer costs another 150 GB. A verification
+    mismatch discards the .part (its content can't be trusted) and the next
+    attempt starts over. If every attempt fails, the .part is left in place so
+    the next run can resume it.
+    Returns (None, copy info) on success - see stream_copy() - or
+    (last exception, {}) if all attempts fail.
+
+    With streams > 1, files of at least stream_min_bytes go through
+    ranged_copy() instead, which retries each failed range on its own (and
+    always verifies every range by read-back, whatever `verify` says).
+    """
+    if streams > 1:
+        try:
+            src_size = lp_stat(src).st_size
+        except OSError as e:
+            return e, {}
+        if src_size >= stream_min_bytes:
+            unused = []
+            if backend == "auto" and kernel_copy_methods():
+                unused.append("--copy-backend auto")
+            if large_io != "off" and src_size >= large_min_bytes:
+                unused.append(f"--large-file-io {large_io}")
+            if unused:
+                logf(f"[WARN] --streams {streams} copies this file as buffered ranges; "
+                     f"{' and '.join(unused)} not applied: {src}")
+            try:
+                with PHASE_TIMES.timed("copy"):
+                    return None, ranged_copy(src, dst, streams=streams, retries=retries,
+                                             retry_delay_s=retry_delay_s, logf=logf)
+            except Exception as e:
+                logf(f"[INFO] Keeping verified ranges for resume on the next run: {ranged_part_paths(dst)[0]}")
+                return e, {}
+
+    last_exc: Optional[Exception] = None
+    attempts = 1 + retries
+    resume_state: dict = {}
+    part = part_path(dst)
+    for attempt in range(1, attempts + 1):
+        try:
+            with PHASE_TIMES.timed("copy"):
+                return None, stream_copy(src, dst, verify=verify, resume_state=resume_state, logf=logf,
+                                         sample_blocks=sample_blocks, sample_block_size=sample_block_size,
+                                         sampler=sampler, backend=backend,
+                                         large_io=large_io, large_min_bytes=large_min_bytes)
+        except Exception as e:
+            last_exc = e
+            if isinstance(e, RuntimeError):
+                # Verification mismatch: the partial copy is bad, don't resume from it.
+                resume_state.clear()
+                try:
+                    if lp_exists(part):
+                        lp_unlink(part)
+                        logf(f"[CLEANUP] Removed unverified partial destination: {part}")
+                except Exception as ce:
+                    logf(f"[WARN] Could not remove partial destination: {part} ({ce})")
+
+            if attempt < attempts:
+                logf(f"[RETRY] COPY attempt {attempt}/{attempts} failed: {src} ({e}). "
+                     f"Retrying in {retry_delay_s}s...")
+                with PHASE_TIMES.timed("retry_wait"):
+                    time.sleep(retry_delay_s)
+
+    if lp_exists(part):
+        logf(f"[INFO] Keeping partial destination for resume on the next run: {part}")
+    return last_exc, {}
+
+
+def move_with_verify(
+    src: Path,
+    dst: Path,
     *,
     rel_path_str: str,
     retries: int,
@@ -642,7 +3119,15 @@ def move_with_verify(
     sample_blocks: int,
     block_size: int,
     logf,
-) -> Optional[Exception]:
+    streams: int = DEFAULT_STREAMS,
+    stream_min_bytes: int = int(DEFAULT_STREAM_MIN_GB * 1024**3),
+    verify: str = "readback",
+    sampler: str = SAMPLER_RANDOM,
+    backend: str = DEFAULT_COPY_BACKEND,
+    large_io: str = DEFAULT_LARGE_FILE_IO,
+    large_min_bytes: int = int(DEFAULT_LARGE_FILE_MIN_GB * 1024**3),
+    volumes: Optional[SameVolumeCache] = None,
+) -> Tuple[Optional[Exception], dict]:
     """
     Move src to dst safely, freeing source space as soon as each file is
     confirmed intact (rather than only after a whole separate verification
@@ -655,49 +3140,61 @@ def move_with_verify(
     explicitly here so we control the fallback instead of shutil.move()'s own
     unverified copy+delete.
 
-    Cross-volume case (rename fails, e.g. WinError 17): copy (via the
-    existing copy_with_retry(), which already retries on exceptions such as
-    transient network faults), then hash-verify the copy against the source
-    before deleting anything. A copy2() call completing without raising is
-    not on its own proof of a correct copy - it only means no exception was
-    raised, which doesn't rule out rare silent corruption. On a verification
-    mismatch, retry ONCE (delete the bad copy, copy again, verify again) - a
-    second consecutive mismatch is treated as a real problem worth surfacing
-    rather than something to retry indefinitely.
-
-    Returns None on success (source has been deleted), or an Exception
-    describing the failure (source is left intact in every failure case).
+    Cross-volume case (rename fails, e.g. WinError 17): stream-copy via
+    copy_with_retry() with verify="readback" - the source is read once and
+    hashed inline, the destination is read back in full and its hash must
+    match before the source is deleted. A copy completing without raising is
+    not on its own proof of a correct copy; the read-back covers the whole
+    file, where the old post-copy partial_hash_match() only sampled ~1 MB of
+    it (and re-read those blocks from the source). A mismatch counts as a
+    failed attempt in copy_with_retry(), so the bad copy is removed and
+    retried up to `retries` times before giving up with the source intact.
+    `verify` (a stream_copy() mode) can lower this for --verify size/sample;
+    sample_blocks/block_size/sampler are the sampling used by verify="sample".
+    streams/stream_min_bytes select the ranged copy for huge files and
+    `backend` the kernel/buffered copy path and large_io/large_min_bytes the
+    --large-file-io mode, see copy_with_retry(). With `volumes` the rename is
+    skipped for a folder pair known to be on different volumes, and a rename
+    failing cross-device (EXDEV) marks its pair, see SameVolumeCache.
+
+    Returns (None, copy info) on success (source has been deleted; copy info
+    is {"copied_by": "rename"} for a rename, which moves no data), or (Exception, {}) describing
+    the failure (source is left intact in every failure case).
     """
-    try:
-        os.rename(long_path(src), long_path(dst))
-        return None
-    except OSError:
-        pass  # cross-device (or other rename failure) - fall through to copy+verify+delete
-
-    for attempt in (1, 2):
-        exc = copy_with_retry(src, dst, retries=retries, retry_delay_s=retry_delay_s, logf=logf)
-        if exc is not None:
-            return exc
-
-        if partial_hash_match(src, dst, rel_path_str, blocks=sample_blocks, block_size=block_size):
-            lp_unlink(src)
-            return None
-
-        logf(f"[WARN] Verification mismatch after copy (attempt {attempt}/2): {src} -> {dst}")
+    if volumes is None or volumes.same(src.parent, dst.parent) is not False:
         try:
-            lp_unlink(dst)
-        except Exception as ce:
-            logf(f"[WARN] Could not remove mismatched destination: {dst} ({ce})")
-
-    return RuntimeError(
-        f"Copy succeeded but failed content verification twice in a row - "
-        f"source kept, destination removed: {src}"
-    )
+            with PHASE_TIMES.timed("copy"):
+                os.rename(long_path(src), long_path(dst))
+            return None, {"copied_by": "rename"}
+        except OSError as e:
+            # Cross-device (or other rename failure) - fall through to copy+verify+delete.
+            # Python maps WinError 17 (ERROR_NOT_SAME_DEVICE) to EXDEV as well.
+            if e.errno == errno.EXDEV and volumes is not None:
+                volumes.note_cross_device(src.parent, dst.parent)
+
+    exc, info = copy_with_retry(src, dst, retries=retries, retry_delay_s=retry_delay_s, logf=logf, verify=verify,
+                                streams=streams, stream_min_bytes=stream_min_bytes,
+                                sample_blocks=sample_blocks, sample_block_size=block_size, sampler=sampler,
+                                backend=backend, large_io=large_io, large_min_bytes=large_min_bytes)
+    if exc is not None:
+        return exc, {}
+    lp_unlink(src)
+    return None, info
 
 
 # ----------------------------
 # Logging helpers
 # ----------------------------
+def copy_note(info: dict) -> str:
+    """'via <path>' for a [COPY]/[MOVE] log line, plus throughput/peak RSS for --large-file-io sized files."""
+    note = f"via {info.get('copied_by', 'buffered')}"
+    if "mb_s" in info:
+        note += f", {info['mb_s']:.0f} MB/s"
+        if info.get("peak_rss") is not None:
+            note += f", peak RSS {info['peak_rss'] / 1024**2:.0f} MB"
+    return note
+
+
 def timestamp_for_log() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
@@ -730,6 +3227,557 @@ def open_log_files(
     return src_handle, tgt_handle, src_log_path, tgt_log_path
 
 
+# ----------------------------
+# Run statistics (progress / ETA, phase times, JSON summary)
+# ----------------------------
+# A long run used to show only one line per file and a count summary at the end, so
+# there was no telling whether a 30-hour transfer was network-bound, hash-bound or
+# stuck in retries. TransferProgress logs a [PROGRESS] line every --progress-s
+# seconds: rolling MB/s and files/s, bytes remaining from the scan and an ETA. Bytes
+# are counted as the copy loops write them, so a single huge file shows progress too.
+# PHASE_TIMES accumulates the time spent per phase; both end up in
+# transferSummary_<ts>.json next to the transfer logs.
+TRANSFER_PHASES = ("walk", "stat", "hash", "copy", "retry_wait", "manifest", "log")
+DEFAULT_PROGRESS_S = 60.0
+PROGRESS_WINDOW_S = 300.0   # rolling window for the rates and the ETA
+
+
+class PhaseTimer:
+    """
+    Seconds spent in each of TRANSFER_PHASES, summed over all threads (so with
+    --workers N they can add up to more than the wall time). A phase timed
+    inside another one - e.g. the read-back "hash" within a "copy" - counts
+    only for the inner phase. Never reset: a run reports seconds(since=...)
+    from its own start, so runs after each other in one process (batch mode)
+    each get their own times.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._seconds: Dict[str, float] = dict.fromkeys(TRANSFER_PHASES, 0.0)
+
+    @contextmanager
+    def timed(self, phase: str):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        frame = [time.perf_counter(), 0.0]   # start, seconds spent in nested phases
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if stack:
+                stack[-1][1] += elapsed
+            with self._lock:
+                self._seconds[phase] += elapsed - frame[1]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._seconds)
+
+    def seconds(self, since: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Seconds per phase, optionally counted from an earlier snapshot()."""
+        now = self.snapshot()
+        return {phase: round(s - (since or {}).get(phase, 0.0), 3) for phase, s in now.items()}
+
+
+class ByteMeter:
+    """Bytes written by the copy loops (all threads), for live throughput."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def add(self, n: int) -> None:
+        with self._lock:
+            self.total += n
+
+
+PHASE_TIMES = PhaseTimer()
+COPY_METER = ByteMeter()
+
+
+class TransferProgress:
+    """
+    Progress of one run's execution phase. file_done() is called once per
+    planned file (from any worker thread); the background reporter logs a
+    [PROGRESS] line every `interval_s` seconds until stop().
+
+    "Done" bytes are the bytes copied so far (COPY_METER) plus the full size of
+    every file that finished without copying data (skipped, renamed, source
+    deleted), so skips move the ETA forward as much as copies do. Rates and the
+    ETA use the last PROGRESS_WINDOW_S seconds only.
+    """
+
+    def __init__(self, total_files: int, total_bytes: int, *, interval_s: float, logf) -> None:
+        self.total_files = total_files
+        self.total_bytes = total_bytes
+        self.interval_s = interval_s
+        self.logf = logf
+        self._lock = threading.Lock()
+        self._files_done = 0
+        self._uncopied_bytes = 0
+        self._meter_start = COPY_METER.total
+        self._samples: List[Tuple[float, int, int, int]] = []   # (t, copied, files done, done bytes)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._samples.append(self._sample())
+        if self.interval_s > 0:
+            self._thread = threading.Thread(target=self._run, name="transfer-progress", daemon=True)
+            self._thread.start()
+
+    def file_done(self, size: int, copied: bool) -> None:
+        with self._lock:
+            self._files_done += 1
+            if not copied:
+                self._uncopied_bytes += size
+
+    def _sample(self) -> Tuple[float, int, int, int]:
+        copied = COPY_METER.total - self._meter_start
+        with self._lock:
+            return time.monotonic(), copied, self._files_done, copied + self._uncopied_bytes
+
+    def line(self) -> str:
+        now = self._sample()
+        self._samples.append(now)
+        while len(self._samples) > 2 and now[0] - self._samples[1][0] >= PROGRESS_WINDOW_S:
+            self._samples.pop(0)
+        t0, copied0, files0, done0 = self._samples[0]
+        span = max(now[0] - t0, 1e-6)
+        mb_s = (now[1] - copied0) / 1024**2 / span
+        files_s = (now[2] - files0) / span
+        done_rate = (now[3] - done0) / span
+        remaining = max(self.total_bytes - now[3], 0)
+        eta = format_duration(remaining / done_rate) if done_rate > 0 else "unknown"
+        pct = 100.0 * min(now[3], self.total_bytes) / self.total_bytes if self.total_bytes else 100.0
+        return (f"[PROGRESS] {now[2]}/{self.total_files} file(s), {now[3] / 1024**3:.2f}/"
+                f"{self.total_bytes / 1024**3:.2f} GB ({pct:.0f}%) | {mb_s:.1f} MB/s, {files_s:.1f} files/s "
+                f"(last {min(span, PROGRESS_WINDOW_S):.0f}s) | remaining {remaining / 1024**3:.2f} GB, "
+                f"ETA {eta}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.logf(self.line())
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def summary_path_for_log(log_path: Path) -> Path:
+    """transferSummary_<ts>.json next to transferLog_<ts>.log."""
+    return log_path.with_name(f"transferSummary_{log_path.stem[len('transferLog_'):]}.json")
+
+
+def write_run_summary(paths: List[Path], summary: dict) -> List[Path]:
+    """Write the JSON run summary to each of `paths`; returns the ones written."""
+    written = []
+    for path in paths:
+        try:
+            with lp_open(path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=1)
+            written.append(path)
+        except OSError:
+            continue
+    return written
+
+
+# ----------------------------
+# Profiling (--profile)
+# ----------------------------
+# For diagnosing a slow run from its artifacts alone. RunProfiler runs cProfile on
+# the main thread and on every thread started while it is active (workers, hash
+# readers, log/manifest writers), and swaps the PROFILED_FUNCTIONS module globals
+# for wrappers that record calls and wall-clock time. Nothing is wrapped without
+# --profile. The report (call timers, phase times, hot paths by cumulative and by
+# own time) and the merged pstats file land next to the source transfer log.
+# Hash verification is timed at the entry points the transfer code really calls
+# (partial_hash_match() starts its reads via _start_partial_hash(), not partial_hash()).
+PROFILED_FUNCTIONS = (
+    "lp_exists", "lp_isdir", "lp_mkdir", "lp_unlink", "lp_stat", "lp_open",
+    "verify_existing", "partial_hash_match", "full_hash",
+    "copy_with_retry", "move_with_verify", "append_manifest_record",
+)
+PROFILE_TOP_N = 40
+
+
+class CallTimers:
+    """Calls and wall-clock seconds (inclusive, all threads) per wrapped function."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stats: Dict[str, List[float]] = {}   # name -> [calls, total s, max s]
+        self._originals: Dict[str, object] = {}
+
+    def _wrap(self, name: str, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - t0
+                with self._lock:
+                    st = self.stats.setdefault(name, [0, 0.0, 0.0])
+                    st[0] += 1
+                    st[1] += elapsed
+                    st[2] = max(st[2], elapsed)
+        return timed
+
+    def install(self, namespace: dict, names: Iterable[str]) -> None:
+        for name in names:
+            self._originals[name] = namespace[name]
+            namespace[name] = self._wrap(name, namespace[name])
+
+    def uninstall(self, namespace: dict) -> None:
+        namespace.update(self._originals)
+        self._originals = {}
+
+    def report_lines(self) -> List[str]:
+        lines = [f"{'function':<24} {'calls':>10} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, (calls, total, peak) in sorted(self.stats.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{name:<24} {calls:>10} {total:>10.2f} {1000 * total / calls:>10.2f} {1000 * peak:>10.1f}")
+        return lines
+
+
+class RunProfiler:
+    def __init__(self) -> None:
+        self.timers = CallTimers()
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._main: Optional[cProfile.Profile] = None
+        self._t0 = 0.0
+        self.log_path: Optional[Path] = None   # the run's source transfer log, once known
+
+    def _thread_hook(self, frame, event, arg) -> None:
+        # Installed for new threads by threading.setprofile(); replaces itself with a
+        # cProfile.Profile of that thread on the thread's first event.
+        sys.setprofile(None)
+        prof = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(prof)
+        prof.enable()
+
+    def start(self) -> None:
+        self._t0 = time.monotonic()
+        self.timers.install(globals(), PROFILED_FUNCTIONS)
+        threading.setprofile(self._thread_hook)
+        self._main = cProfile.Profile()
+        self._main.enable()
+
+    def stop(self) -> pstats.Stats:
+        self._main.disable()
+        threading.setprofile(None)
+        self.timers.uninstall(globals())
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            profiles = list(self._profiles)
+        for prof in profiles:
+            try:
+                stats.add(prof)
+            except Exception:
+                continue   # a thread still running its profile; its numbers are left out
+        self.threads = 1 + len(profiles)
+        self.wall_s = time.monotonic() - self._t0
+        return stats
+
+    def write_report(self, log_path: Path, *, title: str) -> Tuple[Path, Path]:
+        """Stop profiling; write transferProfile_<ts>.txt/.pstats next to `log_path`. Returns both paths."""
+        stats = self.stop()
+        base = log_path.with_name(f"transferProfile_{log_path.stem[len('transferLog_'):]}")
+        pstats_path = base.with_suffix(".pstats")
+        report_path = base.with_suffix(".txt")
+        stats.dump_stats(long_path(pstats_path))
+        out = io.StringIO()
+        out.write(f"{title}\n")
+        out.write(f"Wall: {self.wall_s:.1f}s | profiled threads: {self.threads} | pstats: {pstats_path.name}\n\n")
+        out.write("Call timers (wall-clock, inclusive, summed over threads):\n")
+        out.write("\n".join(self.timers.report_lines()) + "\n\n")
+        out.write("Phase times (s, summed over threads, nested phases counted once):\n")
+        out.write(" | ".join(f"{phase}: {sec:.2f}" for phase, sec in PHASE_TIMES.seconds().items()) + "\n\n")
+        stats.stream = out
+        stats.strip_dirs()   # after dump_stats(), so the .pstats file keeps full paths
+        for key, label in (("cumulative", "cumulative time"), ("tottime", "own time")):
+            out.write(f"Hot paths by {label} (top {PROFILE_TOP_N}):\n")
+            stats.sort_stats(key).print_stats(PROFILE_TOP_N)
+        with lp_open(report_path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        return report_path, pstats_path
+
+
+# ----------------------------
+# Transfer logger (background writer)
+# ----------------------------
+# Every log line used to be printed and then written + flushed to both the source log
+# and the target log on the calling thread; the target log lives on the NAS, so each
+# logged file cost synchronous network writes. TransferLogger keeps the console output
+# on the calling thread but hands file writes to one background thread that writes in
+# batches. Per-file lines are flushed every LOG_FLUSH_S seconds; [INFO]/[WARN]/[ERROR]
+# lines (header, summary, errors) are flushed as soon as the writer picks them up.
+LOG_LEVEL_DETAIL = 10   # per-file actions: [COPY], [MOVE], [SKIP], [DEL ], ...
+LOG_LEVEL_INFO = 20
+LOG_LEVEL_WARN = 30
+LOG_LEVEL_ERROR = 40
+
+DETAIL_LOG_PREFIXES = (
+    "[COPY]", "[MOVE]", "[SKIP]", "[SKIP-MANIFEST]", "[DEL ]", "[DEL-SRC]", "[MKDIR]",
+    "[CLEANUP]", "[MANIFEST] Appended", "[MANIFEST][DRY]",
+)
+_LOG_TAGS_RE = re.compile(r"^((?:\[[^\]]*\])*)")
+
+CONSOLE_MODES = ("all", "rate", "quiet")
+DEFAULT_CONSOLE_MODE = "all"
+DEFAULT_CONSOLE_RATE = 20   # per-file lines per second on the console with --console rate
+LOG_FLUSH_S = 2.0
+LOG_QUEUE_MAX = 10_000      # callers block (back-pressure) if the writer falls this far behind
+
+
+def log_level(msg: str) -> int:
+    """Level of a log line, from its leading [TAG] prefix(es)."""
+    tags = _LOG_TAGS_RE.match(msg).group(1)
+    if "ERROR" in tags:
+        return LOG_LEVEL_ERROR
+    if "WARN" in tags or tags.startswith("[LOCK]"):
+        return LOG_LEVEL_WARN
+    if msg.startswith(DETAIL_LOG_PREFIXES):
+        return LOG_LEVEL_DETAIL
+    return LOG_LEVEL_INFO
+
+
+class TransferLogger:
+    """
+    Drop-in replacement for the old logf closure: call it with one line.
+
+    Console (calling thread):
+      all   - every line (previous behavior)
+      rate  - per-file lines limited to `console_rate` per second, with a note
+              how many were left out; all other lines always shown
+      quiet - per-file lines go to the log files only
+    Log files always receive every line, in order, via a bounded queue and one
+    writer thread. close() drains the queue and flushes; the caller still owns
+    (and closes) the file handles. `console_prefix` is put in front of console
+    lines only (batch mode tells concurrent sources apart with it).
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        handles: Iterable[Optional[object]],
+        *,
+        console: str = DEFAULT_CONSOLE_MODE,
+        console_rate: int = DEFAULT_CONSOLE_RATE,
+        console_prefix: str = "",
+        flush_s: float = LOG_FLUSH_S,
+        queue_max: int = LOG_QUEUE_MAX,
+    ) -> None:
+        if console not in CONSOLE_MODES:
+            raise ValueError(f"Unknown console mode: {console}")
+        self.console = console
+        self.console_rate = max(1, int(console_rate))
+        self.console_prefix = console_prefix
+        self.flush_s = float(flush_s)
+        self._handles = [h for h in handles if h]
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._window_count = 0
+        self._suppressed = 0
+        self._write_failed = False
+        self._thread = threading.Thread(target=self._run, name="transfer-logger", daemon=True)
+        self._thread.start()
+
+    def __call__(self, msg: str) -> None:
+        level = log_level(msg)
+        # One lock for console and queue, so console order and file order are the same
+        # and lines from concurrent workers never interleave mid-line.
+        with self._lock:
+            if self._show_on_console(level):
+                with PHASE_TIMES.timed("log"):
+                    # One write per line: loggers of concurrent batch sources share the console.
+                    print(f"{self.console_prefix}{msg}\n", end="")
+            self._queue.put((msg, level >= LOG_LEVEL_INFO))
+
+    def _show_on_console(self, level: int) -> bool:
+        if level >= LOG_LEVEL_INFO or self.console == "all":
+            return True
+        if self.console == "quiet":
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._report_suppressed()
+            self._window_start = now
+            self._window_count = 0
+        if self._window_count < self.console_rate:
+            self._window_count += 1
+            return True
+        self._suppressed += 1
+        return False
+
+    def _report_suppressed(self) -> None:
+        if self._suppressed:
+            print(f"{self.console_prefix}[INFO] ... {self._suppressed} per-file line(s) not shown on console (see log)")
+            self._suppressed = 0
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        dirty = False
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_s)
+            except queue.Empty:
+                item = None
+            lines: List[str] = []
+            urgent = stop = False
+            while item is not None:
+                if item is self._STOP:
+                    stop = True
+                    break
+                lines.append(item[0])
+                urgent = urgent or item[1]
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if lines:
+                self._write("".join(line + "\n" for line in lines))
+                dirty = True
+            now = time.monotonic()
+            if dirty and (urgent or stop or now - last_flush >= self.flush_s):
+                self._flush()
+                last_flush = now
+                dirty = False
+            if stop:
+                return
+
+    def _write(self, text: str) -> None:
+        with PHASE_TIMES.timed("log"):
+            for h in self._handles:
+                try:
+                    h.write(text)
+                except Exception as e:
+                    self._write_error(e)
+
+    def _flush(self) -> None:
+        with PHASE_TIMES.timed("log"):
+            for h in self._handles:
+                try:
+                    h.flush()
+                except Exception as e:
+                    self._write_error(e)
+
+    def _write_error(self, e: Exception) -> None:
+        # The console still has every [INFO]/[WARN]/[ERROR] line; report a broken log file once.
+        if not self._write_failed:
+            self._write_failed = True
+            print(f"[WARN] Writing the transfer log failed ({e}); console output continues.")
+
+    def close(self) -> None:
+        with self._lock:
+            self._report_suppressed()
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+
+# ----------------------------
+# Scheduling (--order)
+# ----------------------------
+# The order in which planned files are handed to the workers. "scan" is the scan
+# order (os.walk-like, the historical behavior); "path" sorts by relative path, so
+# each folder is done in one go; largest-first / smallest-first sort by size;
+# move-first runs the MOVE-category files (largest first - they free the most
+# source space) before everything else. "auto" keeps the scan order but, while the
+# source volume has less than --min-free-gb free (shutil.disk_usage, checked at
+# most every DISK_CHECK_S seconds), takes the largest remaining MOVE-category file
+# next, so a nearly full acquisition PC gets space back before the small COPY files.
+ORDERS = ("scan", "path", "largest-first", "smallest-first", "move-first", "auto")
+DEFAULT_ORDER = "scan"
+DEFAULT_MIN_FREE_GB = 50.0
+DISK_CHECK_S = 5.0
+
+
+def order_plan(plan: List[PlanEntry], order: str) -> List[PlanEntry]:
+    """Static orders; "auto" is DiskPressureSchedule."""
+    if order == "path":
+        return sorted(plan, key=lambda e: e.relpath.casefold().split("/"))
+    if order == "largest-first":
+        return sorted(plan, key=lambda e: -e.size)
+    if order == "smallest-first":
+        return sorted(plan, key=lambda e: e.size)
+    if order == "move-first":
+        moves = sorted((e for e in plan if e.category == "MOVE"), key=lambda e: -e.size)
+        return moves + [e for e in plan if e.category != "MOVE"]
+    return plan
+
+
+class DiskPressureSchedule:
+    """
+    Iterates the plan in scan order, except that the largest remaining
+    MOVE-category entry comes next whenever the source volume's free space is
+    below min_free_bytes. Iterated lazily by the execution loop, so the order
+    follows the free space as the run goes.
+    """
+
+    def __init__(self, plan: List[PlanEntry], source_dir: Path, min_free_bytes: int, logf,
+                 check_s: float = DISK_CHECK_S) -> None:
+        self.plan = plan
+        self.source_dir = source_dir
+        self.min_free_bytes = min_free_bytes
+        self.logf = logf
+        self.check_s = check_s
+        self.promoted = 0
+        self._moves = sorted((i for i, e in enumerate(plan) if e.category == "MOVE"), key=lambda i: -plan[i].size)
+        self._last_check = None
+        self._pressure = False
+
+    def _under_pressure(self) -> bool:
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < self.check_s:
+            return self._pressure
+        self._last_check = now
+        try:
+            free = shutil.disk_usage(long_path(self.source_dir)).free
+        except OSError as e:
+            self.logf(f"[ORDER][WARN] Cannot read free space of {self.source_dir}, keeping scan order ({e})")
+            self._last_check = float("inf")   # don't retry on every file
+            self._pressure = False
+            return False
+        pressure = free < self.min_free_bytes
+        if pressure != self._pressure:
+            if pressure:
+                self.logf(f"[ORDER] Source free space {free / 1024**3:.1f} GB < {self.min_free_bytes / 1024**3:g} GB: "
+                          f"MOVE-category files first")
+            else:
+                self.logf(f"[ORDER] Source free space back to {free / 1024**3:.1f} GB: scan order")
+        self._pressure = pressure
+        return pressure
+
+    def __iter__(self):
+        done = [False] * len(self.plan)
+        next_scan = next_move = 0
+        while True:
+            while next_scan < len(self.plan) and done[next_scan]:
+                next_scan += 1
+            while next_move < len(self._moves) and done[self._moves[next_move]]:
+                next_move += 1
+            if next_scan >= len(self.plan):
+                return
+            if next_move < len(self._moves) and self._under_pressure():
+                i = self._moves[next_move]
+                if i != next_scan:
+                    self.promoted += 1
+            else:
+                i = next_scan
+            done[i] = True
+            yield self.plan[i]
+
+
 # ----------------------------
 # Main transfer routine
 # ----------------------------
@@ -751,19 +3799,68 @@ def transfer_tree(
     ignore_manifest: bool,
     retries: int,
     retry_delay_s: float,
+    workers: int = DEFAULT_WORKERS,
+    manifest_db: bool = False,
+    manifest_fsync: str = DEFAULT_MANIFEST_FSYNC,
+    manifest_flush_records: int = DEFAULT_MANIFEST_FLUSH_RECORDS,
+    manifest_flush_s: float = DEFAULT_MANIFEST_FLUSH_S,
+    console: str = DEFAULT_CONSOLE_MODE,
+    console_rate: int = DEFAULT_CONSOLE_RATE,
+    streams: int = DEFAULT_STREAMS,
+    stream_min_gb: float = DEFAULT_STREAM_MIN_GB,
+    verify: Optional[str] = None,
+    sample_strategy: str = DEFAULT_SAMPLE_STRATEGY,
+    sample_budget_mb: int = DEFAULT_SAMPLE_BUDGET_MB,
+    copy_backend: str = DEFAULT_COPY_BACKEND,
+    large_file_io: str = DEFAULT_LARGE_FILE_IO,
+    large_file_min_gb: float = DEFAULT_LARGE_FILE_MIN_GB,
+    full_rescan: bool = False,
+    snapshot_max_age_h: float = DEFAULT_SNAPSHOT_MAX_AGE_H,
+    plan_out: Optional[Path] = None,
+    plan_entries: Optional[List[PlanEntry]] = None,
+    progress_s: float = DEFAULT_PROGRESS_S,
+    log_ts: Optional[str] = None,
+    pool: Optional[ThreadPoolExecutor] = None,
+    console_prefix: str = "",
+    cancel: Optional[threading.Event] = None,
+    engine: str = DEFAULT_ENGINE,
+    async_metadata: int = DEFAULT_ASYNC_METADATA,
+    async_hash: int = DEFAULT_ASYNC_HASH,
+    async_bulk: int = DEFAULT_ASYNC_BULK,
+    order: str = DEFAULT_ORDER,
+    min_free_gb: float = DEFAULT_MIN_FREE_GB,
 ) -> Tuple[int, int, int, int, int, int, int, int, Path, Path]:
     """
+    Runs in two phases: scan_tree() builds the transfer plan (one listing per
+    directory, one stat per file, one destination listing per directory), then
+    process_entry() acts on each PlanEntry - inline when workers == 1, or on a
+    bounded thread pool of `workers` threads otherwise; with engine="asyncio",
+    via asyncio.to_thread with separate hash/bulk limits (see ENGINES). Progress is logged every
+    `progress_s` seconds (0 = off), and a JSON summary with per-phase times is
+    written next to the logs (summary_path_for_log()), also after Ctrl-C.
+    In batch mode, `pool` is the file worker pool shared by all sources; it is
+    used instead of a pool of this run's own and is not shut down here. Setting
+    `cancel` stops the run before its next file, as Ctrl-C does.
+
     Returns:
       (copied, moved, deleted_src, skipped_manifest, skipped_existing, mismatched,
        suspected_truncated, errors, src_log_path, tgt_log_path)
     """
     max_bytes = int(max_size_gb * 1024**3)
     block_size = sample_block_kb * 1024
-
-    copied = moved = deleted_src = skipped_manifest = skipped_existing = errors = 0
-    mismatched = suspected_truncated = 0
-
-    ts = timestamp_for_log()
+    stream_min_bytes = int(stream_min_gb * 1024**3)
+    large_min_bytes = int(large_file_min_gb * 1024**3)
+    sampler = make_sampler(sample_strategy, sample_budget_mb)
+    # --verify applies one tier everywhere; without it each check keeps its default.
+    existing_tier = verify or "sample"
+    move_copy_verify = COPY_VERIFY_FOR_TIER[verify] if verify else "readback"
+    copy_copy_verify = COPY_VERIFY_FOR_TIER[verify] if verify else "tail"
+
+    ts = log_ts or timestamp_for_log()
+    run_t0 = time.monotonic()
+    started = datetime.now()
+    phase_start = PHASE_TIMES.snapshot()
+    meter_start = COPY_METER.total
     src_log_handle, tgt_log_handle, src_log_path, tgt_log_path = open_log_files(
         source_root=source_dir,
         target_root=target_dir,
@@ -771,18 +3868,21 @@ def transfer_tree(
         ts=ts,
     )
 
-    def logf(msg: str) -> None:
-        print(msg)
-        if src_log_handle:
-            src_log_handle.write(msg + "\n")
-            src_log_handle.flush()
-        if tgt_log_handle:
-            tgt_log_handle.write(msg + "\n")
-            tgt_log_handle.flush()
+    logf = TransferLogger((src_log_handle, tgt_log_handle), console=console, console_rate=console_rate,
+                          console_prefix=console_prefix)
 
     if dry_run and tgt_log_handle is None:
         logf(f"[WARN] Dry-run: target folder does not exist, so target log was not written: {tgt_log_path}")
 
+    mdb: Optional[SqliteManifest] = None
+    mwriter: Optional[ManifestWriter] = None
+    summary_paths = [summary_path_for_log(src_log_path)]
+    if tgt_log_handle is not None:
+        summary_paths.append(summary_path_for_log(tgt_log_path))
+    # Counters are not shared between threads: each file's outcome comes back from
+    # process_entry() as its own Counter and is only summed into `totals` on the main thread.
+    totals: Counter = Counter()
+    run_stats = {"status": "interrupted", "planned_files": 0, "planned_bytes": 0, "scan_s": None, "execute_s": None}
     try:
         total_mb = (sample_blocks * sample_block_kb) / 1024.0
 
@@ -794,7 +3894,29 @@ def transfer_tree(
         logf(f"[INFO] Mode: {'DRY RUN' if dry_run else 'LIVE'} | Overwrite: {overwrite}")
         logf(f"[INFO] maxSizeGB: {max_size_gb}")
         logf(f"[INFO] Retries: {retries} | Retry delay: {retry_delay_s}s")
-        logf(f"[INFO] Partial-hash sampling: {sample_blocks} blocks x {sample_block_kb} KB (~{total_mb:.2f} MB/file)")
+        if engine == "asyncio":
+            logf(f"[INFO] Engine: asyncio | metadata: {async_metadata} file(s), hashing: {async_hash}, "
+                 f"bulk copies: {async_bulk} (--workers not used)")
+        else:
+            logf(f"[INFO] Workers: {workers}")
+        logf(f"[INFO] Order: {order}" + (f" (MOVE-category files first while source free space < {min_free_gb:g} GB)"
+                                         if order == "auto" else ""))
+        if plan_out is not None:
+            logf(f"[INFO] Plan: metadata-only scan, no per-file work; writing {plan_out}")
+        elif plan_entries is not None:
+            logf(f"[INFO] Executing plan: {len(plan_entries)} planned action(s), source not rescanned")
+        logf(f"[INFO] Console: {console}" + (f" ({console_rate} per-file lines/s)" if console == "rate" else ""))
+        logf("[INFO] Progress: " + (f"every {progress_s:g}s" if progress_s > 0 else "off")
+             + f" | run summary: {summary_paths[0].name}")
+        if sampler == SAMPLER_RANDOM:
+            logf(f"[INFO] Partial-hash sampling: {sample_blocks} blocks x {sample_block_kb} KB (~{total_mb:.2f} MB/file)")
+        else:
+            logf(f"[INFO] Partial-hash sampling: stratified - head + tail + 1 block per "
+                 f"{STRATIFIED_REGION_BYTES // 1024**3} GB region, >= {sample_blocks} blocks x {sample_block_kb} KB, "
+                 f"<= {sample_budget_mb} MB/file")
+        hash_cache = _hash_cache
+        logf(f"[INFO] Partial-hash cache: {hash_cache.db_path if hash_cache is not None else '<off>'}")
+        hash_cache_counts = (hash_cache.hits, hash_cache.misses) if hash_cache is not None else (0, 0)
 
         if move_exts:
             logf(f"[INFO] move-ext provided: {sorted(move_exts)}")
@@ -818,269 +3940,605 @@ def transfer_tree(
             logf(f"[INFO] Lock check: no lock file found at {lock_file}")
 
         logf(f"[INFO] Manifest: {manifest_path(source_dir)}")
-        logf(f"[INFO] Manifest mode: {'IGNORED' if ignore_manifest else 'ACTIVE'}")
+        logf(f"[INFO] Manifest mode: {'IGNORED' if ignore_manifest else 'ACTIVE'}"
+             f"{' | SQLite requested (--manifest-db)' if manifest_db else ''}")
+        snapshot_mode = ("off (--ignore-manifest)" if ignore_manifest
+                         else "full rescan" if full_rescan or overwrite
+                         else f"skip unchanged covered directories listed within {snapshot_max_age_h:g} h")
+        logf(f"[INFO] Directory snapshot: {snapshot_mode}")
+        logf(f"[INFO] Manifest writes: grouped every {manifest_flush_records} record(s) or {manifest_flush_s}s | "
+             f"fsync: {manifest_fsync}")
         logf("[INFO] Default: COPY everything; MOVE only if > maxSize or matches --move-ext/--move-keyword")
-        logf("[INFO] MOVE-category + dst exists (no --overwrite): delete source ONLY if size + partial-hash match")
+        logf(f"[INFO] MOVE-category + dst exists (no --overwrite): delete source ONLY if "
+             f"{VERIFY_LABELS[existing_tier]}")
+        if verify:
+            logf(f"[INFO] Verification tier: {verify} (--verify) for existing and freshly copied files")
+        logf(f"[INFO] Copy engine: streaming, inline {CONTENT_HASH_ALGO} content hash "
+             f"(MOVE: {move_copy_verify} verify, COPY: {copy_copy_verify} verify)")
+        kernel_methods = kernel_copy_methods() if copy_backend == "auto" else []
+        if kernel_methods:
+            logf(f"[INFO] Kernel copy: tried first for new copies ({' -> '.join(kernel_methods)} -> buffered); "
+                 f"content hash from a side read of the source (none for a reflink)")
+        logf(f"[INFO] Large-file I/O (files >= {large_file_min_gb} GB, throughput + peak RSS logged): "
+             f"{large_file_io}")
+        if streams > 1:
+            logf(f"[INFO] Ranged copy: files >= {stream_min_gb} GB in {RANGE_COPY_BYTES // 1024**2} MB ranges, "
+                 f"{streams} streams, each range verified by read-back (buffered I/O)")
         logf("-" * 110)
 
-        # Load manifest index (for skip decisions)
-        manifest_index = load_manifest_index(source_dir, logf=logf, ignore_manifest=ignore_manifest)
+        # Load manifest index (for skip decisions). With the SQLite manifest, the database
+        # itself is the index - lookups are per-file indexed queries, nothing is preloaded.
+        with PHASE_TIMES.timed("manifest"):
+            mdb = open_manifest_db(source_dir, enable=manifest_db, dry_run=dry_run, logf=logf)
+            if mdb is not None:
+                logf(f"[MANIFEST] Using SQLite manifest: {mdb.db_path} ({mdb.record_count()} records)")
+            if ignore_manifest:
+                manifest_index = load_manifest_index(source_dir, logf=logf, ignore_manifest=True)
+            elif mdb is not None:
+                manifest_index = mdb
+            else:
+                manifest_index = load_manifest_index(source_dir, logf=logf, ignore_manifest=False)
+
+        if not dry_run:
+            mwriter = ManifestWriter(
+                source_dir,
+                manifest_db=mdb,
+                flush_records=manifest_flush_records,
+                flush_s=manifest_flush_s,
+                fsync=manifest_fsync,
+                logf=logf,
+            )
 
         # In live mode, ensure target root exists before walking
         if not dry_run:
             lp_mkdir(target_dir)
 
-        for root, dirs, files in os.walk(source_dir):
-            root_path = Path(root)
-            rel_dir = root_path.relative_to(source_dir)
-            out_root = target_dir / rel_dir
-
-            # Directories are created lazily (see ensure_dir(dst_file.parent, ...) below),
-            # only when a file actually needs to land in them. This avoids creating empty
-            # target folders for source directories that contain no files (directly or in
-            # any subfolder).
-            for fname in files:
-                # Skip logs and manifest folder itself to avoid re-transferring control files
-                if fname.startswith("transferLog_") and fname.endswith(".log"):
-                    continue
-
-                src_file = root_path / fname
-
-                # Never transfer the manifest directory itself
-                if ".server_transfer" in src_file.parts:
-                    continue
-
-                if not should_process_by_include_ext(src_file, include_exts):
-                    logf(f"[SKIP] Not in --include-ext: {src_file}")
-                    continue
-
-                dst_file = out_root / fname
-
-                # --- PATH LENGTH GUARD (warn + skip) ---
-                # All actual file I/O below goes through the lp_*/long_path() \\?\ helpers,
-                # which bypass the classic ~260-char MAX_PATH limit - so this only needs to
-                # catch the (much higher, ~32767) Windows long-path ceiling as a formality.
-                dst_str = str(dst_file)
-                if len(dst_str) > MAX_SAFE_PATH_CHARS:
-                    logf(f"[PATH-ERROR] Destination path too long ({len(dst_str)} chars > {MAX_SAFE_PATH_CHARS}). Skipping: {dst_str}")
-                    errors += 1
-                    continue
-
-                ensure_dir(dst_file.parent, dry_run=dry_run, logf=logf)
-
-                src_size, src_mtime = safe_stat_size_mtime(src_file)
-                if src_size is None or src_mtime is None:
-                    logf(f"[ERROR] Cannot stat: {src_file}")
-                    errors += 1
-                    continue
-
-                rel_path_posix = str((rel_dir / fname).as_posix())
-
-                # Decide move/copy classification under *current* rules
-                do_move = should_move(
-                    src_file=src_file,
-                    file_size_bytes=int(src_size),
-                    max_bytes=max_bytes,
-                    move_exts=move_exts,
-                    move_keywords=move_keywords,
-                )
-
-                # --- NEW: treat a 0-byte destination as corrupt, not a legitimate mismatch ---
-                # A MOVE-category destination is never legitimately empty when the source isn't,
-                # so replace it unconditionally (regardless of --overwrite) instead of letting it
-                # fall into the "kept src" mismatch skip below, which would leave it broken forever.
-                if lp_exists(dst_file) and do_move and int(src_size) > 0:
-                    try:
-                        dst_size_for_empty_check = lp_stat(dst_file).st_size
-                    except Exception:
-                        dst_size_for_empty_check = None
-                    if dst_size_for_empty_check == 0:
-                        if dry_run:
-                            logf(f"[DEL ] {dst_file} (empty destination, treated as corrupt, will re-copy)")
-                        else:
-                            try:
-                                lp_unlink(dst_file)
-                                logf(f"[DEL ] {dst_file} (empty destination, treated as corrupt, will re-copy)")
-                            except Exception as e:
-                                logf(f"[ERROR] Cannot delete empty dst: {dst_file} ({e})")
-                                errors += 1
-                                continue
-
-                # --- NEW: cleanup path BEFORE manifest skip ---
-                # If under current rules this file should be MOVED, but it already exists in target,
-                # then delete the source after verifying dst matches src (size + partial hash).
-                if lp_exists(dst_file) and (not overwrite) and do_move:
+        # Shared state touched from worker threads (--workers > 1).
+        dest_cache = DestDirCache()
+        volumes = SameVolumeCache()
+        logf(f"[INFO] Same volume: {describe_same_volume(volumes.same(source_dir, target_dir))}")
+        manifest_lock = threading.Lock()
+
+        def record_transfer(
+            rel_path_posix: str,
+            src_size: int,
+            src_mtime: float,
+            action: str,
+            note: Optional[str] = None,
+            copy_info: Optional[dict] = None,
+        ) -> None:
+            rec = {
+                "ts": datetime.now().isoformat(timespec="seconds"),
+                "user": user_name,
+                "source_root": str(source_dir),
+                "target_root": str(target_dir),
+                "relpath": rel_path_posix,
+                "size": int(src_size),
+                "mtime": float(src_mtime),
+                "action": action,
+            }
+            if note:
+                rec["note"] = note
+            # Full-content hash from the streaming copy engine, so a later tape restore or
+            # orphan deletion can be checked without the original.
+            if copy_info and copy_info.get("content_hash"):
+                rec["content_hash"] = copy_info["content_hash"]
+                rec["hash_algo"] = copy_info["hash_algo"]
+            with manifest_lock:
+                append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf, writer=mwriter)
+                manifest_index[(rel_path_posix, str(target_dir))] = (int(src_size), float(src_mtime))
+
+        def process_entry(entry: PlanEntry):
+            """
+            All per-file work (existence/size decisions, partial hash, copy/move, manifest append)
+            for one planned source file. Decisions use only the stat data captured by the scan
+            phase (entry.size/mtime and entry.dst_size/dst_mtime) - nothing is re-queried here.
+            Returns the counter increments for this file instead of touching the run totals
+            directly, so the same code runs unchanged on the serial path and on the --workers
+            thread pool.
+
+            A generator, run in steps: it yields "hash" before a hash comparison and "bulk"
+            before a copy/move, and None after it, i.e. the slot the next step needs. The threads
+            engine runs it straight through (run_stages()); --engine asyncio takes the matching
+            asyncio.Semaphore between steps, so a file waiting for a slot holds no thread.
+            The Counter is the generator's return value.
+            """
+            c: Counter = Counter()
+            rel_path_posix = entry.relpath
+            src_size, src_mtime = entry.size, entry.mtime
+            do_move = entry.category == "MOVE"
+            src_file = source_dir.joinpath(*rel_path_posix.split("/"))
+            dst_file = target_dir.joinpath(*rel_path_posix.split("/"))
+            # Destination state as captured by the scan; updated locally when this function
+            # deletes the destination, instead of being re-checked on disk.
+            dst_exists = entry.dst_size is not None
+
+            # --- PATH LENGTH GUARD (warn + skip) ---
+            # All actual file I/O below goes through the lp_*/long_path() \\?\ helpers,
+            # which bypass the classic ~260-char MAX_PATH limit - so this only needs to
+            # catch the (much higher, ~32767) Windows long-path ceiling as a formality.
+            dst_str = str(dst_file)
+            if len(dst_str) > MAX_SAFE_PATH_CHARS:
+                logf(f"[PATH-ERROR] Destination path too long ({len(dst_str)} chars > {MAX_SAFE_PATH_CHARS}). Skipping: {dst_str}")
+                c["errors"] += 1
+                return c
+
+            # Cached: at most one mkdir (and one [MKDIR] line) per folder, even across workers.
+            dest_cache.ensure_dir(dst_file.parent, dry_run=dry_run, logf=logf)
+
+            # --- NEW: treat a 0-byte destination as corrupt, not a legitimate mismatch ---
+            # A MOVE-category destination is never legitimately empty when the source isn't,
+            # so replace it unconditionally (regardless of --overwrite) instead of letting it
+            # fall into the "kept src" mismatch skip below, which would leave it broken forever.
+            if dst_exists and do_move and src_size > 0 and entry.dst_size == 0:
+                if dry_run:
+                    logf(f"[DEL ] {dst_file} (empty destination, treated as corrupt, will re-copy)")
+                else:
                     try:
-                        ok = partial_hash_match(
-                            src_file, dst_file, rel_path_posix,
-                            blocks=sample_blocks, block_size=block_size
-                        )
+                        lp_unlink(dst_file)
+                        dest_cache.forget_file(dst_file)
+                        logf(f"[DEL ] {dst_file} (empty destination, treated as corrupt, will re-copy)")
+                        dst_exists = False
                     except Exception as e:
-                        logf(f"[ERROR] Partial-hash compare failed: {src_file} vs {dst_file} ({e})")
-                        errors += 1
-                        ok = False
+                        logf(f"[ERROR] Cannot delete empty dst: {dst_file} ({e})")
+                        c["errors"] += 1
+                        return c
+
+            # --- NEW: cleanup path BEFORE manifest skip ---
+            # If under current rules this file should be MOVED, but it already exists in target,
+            # then delete the source after verifying dst matches src (size + partial hash by
+            # default, or the --verify tier).
+            if dst_exists and (not overwrite) and do_move:
+                yield "hash"
+                try:
+                    ok = verify_existing(
+                        existing_tier, src_file, dst_file, rel_path_posix,
+                        blocks=sample_blocks, block_size=block_size,
+                        src_size=src_size, dst_size=entry.dst_size,
+                        src_mtime=src_mtime, dst_mtime=entry.dst_mtime,
+                        sampler=sampler,
+                    )
+                except Exception as e:
+                    logf(f"[ERROR] Compare ({existing_tier}) failed: {src_file} vs {dst_file} ({e})")
+                    c["errors"] += 1
+                    ok = False
+                yield None
+
+                if ok:
+                    if dry_run:
+                        logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, {VERIFY_LABELS[existing_tier]})")
+                    else:
+                        try:
+                            lp_unlink(src_file)
+                            logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, {VERIFY_LABELS[existing_tier]})")
+                        except Exception as e:
+                            logf(f"[ERROR] Cannot delete source: {src_file} ({e})")
+                            c["errors"] += 1
+                            # If we couldn't delete, keep going (do not treat as staged)
+                            ok = False
 
                     if ok:
+                        c["deleted_src"] += 1
+                        # Write a manifest record even if it already existed; it documents the cleanup event.
+                        record_transfer(
+                            rel_path_posix, src_size, src_mtime, "DEL-SRC",
+                            note=f"cleanup: dst existed; verified by {VERIFY_NOTES[existing_tier]}; "
+                                 f"deleted source under current move rules",
+                        )
+                        return c
+                else:
+                    # dst exists but mismatch -> do NOT delete source
+                    c["mismatched"] += 1
+                    logf(f"[SKIP] dst exists but does NOT match (kept src): {dst_file}")
+                    if has_all_zero_tail(dst_file, size=entry.dst_size):
+                        c["suspected_truncated"] += 1
+                        logf(
+                            f"[WARN] Possible truncated transfer - trailing "
+                            f"{TRAILING_ZERO_CHECK_BYTES} bytes of dst are all zero: {dst_file}"
+                        )
+                    return c
+
+            # --- Manifest-based skip (only for staging actions) ---
+            # If we already have a manifest entry for this file version, don't re-stage it.
+            # --overwrite bypasses this: the user explicitly wants to re-transfer regardless of
+            # what the manifest recorded (which may have been for a different target drive).
+            if not overwrite and manifest_has_entry(manifest_index, rel_path_posix, str(target_dir), src_size, src_mtime):
+                logf(f"[SKIP-MANIFEST] Already staged/archived per manifest: {rel_path_posix}")
+                c["skipped_manifest"] += 1
+                return c
+
+            # Handle existing destination file for COPY-category and MOVE-category.
+            if dst_exists:
+                if not do_move:
+                    # COPY-category: decide whether to skip or overwrite based on size / mtime.
+                    if overwrite:
+                        # --overwrite: skip only if size AND mtime match exactly (re-copying would be wasteful).
+                        if size_and_mtime_match(src_size, src_mtime, entry.dst_size, entry.dst_mtime):
+                            logf(f"[SKIP] dst identical (size+mtime match, --overwrite set): {dst_file}")
+                            c["skipped_existing"] += 1
+                            return c
+                        # Not identical — delete dst and fall through to copy.
                         if dry_run:
-                            logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, partial-hash match)")
+                            logf(f"[DEL ] {dst_file} (--overwrite, dst differs)")
                         else:
                             try:
-                                lp_unlink(src_file)
-                                logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, partial-hash match)")
+                                lp_unlink(dst_file)
+                                dest_cache.forget_file(dst_file)
+                                logf(f"[DEL ] {dst_file} (--overwrite, dst differs)")
                             except Exception as e:
-                                logf(f"[ERROR] Cannot delete source: {src_file} ({e})")
-                                errors += 1
-                                # If we couldn't delete, keep going (do not treat as staged)
-                                ok = False
-
-                        if ok:
-                            deleted_src += 1
-                            # Write a manifest record even if it already existed; it documents the cleanup event.
-                            rec = {
-                                "ts": datetime.now().isoformat(timespec="seconds"),
-                                "user": user_name,
-                                "source_root": str(source_dir),
-                                "target_root": str(target_dir),
-                                "relpath": rel_path_posix,
-                                "size": int(src_size),
-                                "mtime": float(src_mtime),
-                                "action": "DEL-SRC",
-                                "note": "cleanup: dst existed; verified by partial hash; deleted source under current move rules",
-                            }
-                            append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf)
-                            manifest_index[(rel_path_posix, str(target_dir))] = (int(src_size), float(src_mtime))
-                            continue
+                                logf(f"[ERROR] Cannot delete existing dst: {dst_file} ({e})")
+                                c["errors"] += 1
+                                return c
                     else:
-                        # dst exists but mismatch -> do NOT delete source
-                        mismatched += 1
-                        logf(f"[SKIP] dst exists but does NOT match (kept src): {dst_file}")
-                        if has_all_zero_tail(dst_file):
-                            suspected_truncated += 1
-                            logf(
-                                f"[WARN] Possible truncated transfer - trailing "
-                                f"{TRAILING_ZERO_CHECK_BYTES} bytes of dst are all zero: {dst_file}"
-                            )
-                        continue
-
-                # --- Manifest-based skip (only for staging actions) ---
-                # If we already have a manifest entry for this file version, don't re-stage it.
-                # --overwrite bypasses this: the user explicitly wants to re-transfer regardless of
-                # what the manifest recorded (which may have been for a different target drive).
-                if not overwrite and manifest_has_entry(manifest_index, rel_path_posix, str(target_dir), int(src_size), float(src_mtime)):
-                    logf(f"[SKIP-MANIFEST] Already staged/archived per manifest: {rel_path_posix}")
-                    skipped_manifest += 1
-                    continue
-
-                # Handle existing destination file for COPY-category and MOVE-category.
-                if lp_exists(dst_file):
-                    if not do_move:
-                        # COPY-category: decide whether to skip or overwrite based on size / mtime.
-                        if overwrite:
-                            # --overwrite: skip only if size AND mtime match exactly (re-copying would be wasteful).
-                            if same_file_size_and_mtime(src_file, dst_file):
-                                logf(f"[SKIP] dst identical (size+mtime match, --overwrite set): {dst_file}")
-                                skipped_existing += 1
-                                continue
-                            # Not identical — delete dst and fall through to copy.
-                            if dry_run:
-                                logf(f"[DEL ] {dst_file} (--overwrite, dst differs)")
+                        # No --overwrite: skip if dst is at least as large as src (intact or overshoot).
+                        # Re-copy if dst is smaller (partial write from a previous failed transfer).
+                        dst_size_bytes = entry.dst_size
+                        if verify in ("sample", "full") and dst_size_bytes == src_size:
+                            # Explicit --verify sample/full: check the content instead of trusting the size.
+                            yield "hash"
+                            try:
+                                same = verify_existing(
+                                    verify, src_file, dst_file, rel_path_posix,
+                                    blocks=sample_blocks, block_size=block_size,
+                                    src_size=src_size, dst_size=dst_size_bytes,
+                                    src_mtime=src_mtime, dst_mtime=entry.dst_mtime,
+                                    sampler=sampler,
+                                )
+                            except Exception as e:
+                                logf(f"[ERROR] Compare ({verify}) failed: {src_file} vs {dst_file} ({e})")
+                                c["errors"] += 1
+                                return c
+                            yield None
+                            if same:
+                                logf(f"[SKIP] dst exists ({VERIFY_LABELS[verify]}): {dst_file}")
+                                c["skipped_existing"] += 1
                             else:
-                                try:
-                                    lp_unlink(dst_file)
-                                    logf(f"[DEL ] {dst_file} (--overwrite, dst differs)")
-                                except Exception as e:
-                                    logf(f"[ERROR] Cannot delete existing dst: {dst_file} ({e})")
-                                    errors += 1
-                                    continue
+                                logf(f"[SKIP] dst exists but does NOT match (kept, use --overwrite to replace): {dst_file}")
+                                c["mismatched"] += 1
+                            return c
+                        if dst_size_bytes >= src_size:
+                            logf(f"[SKIP] dst exists and size >= src ({dst_size_bytes} >= {src_size}): {dst_file}")
+                            c["skipped_existing"] += 1
+                            return c
+                        # dst is smaller — fall through to re-copy (shutil.copy2 will truncate and overwrite).
+                        logf(f"[INFO] dst exists but smaller than src ({dst_size_bytes} < {src_size}), will re-copy: {dst_file}")
+                else:
+                    # MOVE-category with overwrite: delete dst and fall through to move.
+                    # (MOVE-category without overwrite is already handled above by the partial-hash block.)
+                    if overwrite:
+                        if dry_run:
+                            logf(f"[DEL ] {dst_file} (--overwrite, MOVE-category)")
                         else:
-                            # No --overwrite: skip if dst is at least as large as src (intact or overshoot).
-                            # Re-copy if dst is smaller (partial write from a previous failed transfer).
                             try:
-                                dst_size_bytes = lp_stat(dst_file).st_size
-                            except Exception:
-                                dst_size_bytes = 0
-                            if dst_size_bytes >= src_size:
-                                logf(f"[SKIP] dst exists and size >= src ({dst_size_bytes} >= {int(src_size)}): {dst_file}")
-                                skipped_existing += 1
-                                continue
-                            # dst is smaller — fall through to re-copy (shutil.copy2 will truncate and overwrite).
-                            logf(f"[INFO] dst exists but smaller than src ({dst_size_bytes} < {int(src_size)}), will re-copy: {dst_file}")
-                    else:
-                        # MOVE-category with overwrite: delete dst and fall through to move.
-                        # (MOVE-category without overwrite is already handled above by the partial-hash block.)
-                        if overwrite:
-                            if dry_run:
+                                lp_unlink(dst_file)
+                                dest_cache.forget_file(dst_file)
                                 logf(f"[DEL ] {dst_file} (--overwrite, MOVE-category)")
-                            else:
-                                try:
-                                    lp_unlink(dst_file)
-                                    logf(f"[DEL ] {dst_file} (--overwrite, MOVE-category)")
-                                except Exception as e:
-                                    logf(f"[ERROR] Cannot delete existing dst: {dst_file} ({e})")
-                                    errors += 1
-                                    continue
-
-                # Destination does not exist (or we deleted it due to overwrite)
-                if do_move:
-                    if dry_run:
-                        logf(f"[MOVE] {src_file} -> {dst_file} ({int(src_size) / 1024**3:.3f} GB)")
-                    else:
-                        exc = move_with_verify(
-                            src_file, dst_file,
-                            rel_path_str=rel_path_posix,
-                            retries=retries, retry_delay_s=retry_delay_s,
-                            sample_blocks=sample_blocks, block_size=block_size,
-                            logf=logf,
-                        )
-                        if exc is not None:
-                            logf(f"[ERROR] MOVE failed: {src_file} -> {dst_file} ({exc})")
-                            errors += 1
-                            continue
-                        logf(f"[MOVE] {src_file} -> {dst_file} ({int(src_size) / 1024**3:.3f} GB, verified)")
-                    moved += 1
-
-                    # Manifest record for MOVE
-                    rec = {
-                        "ts": datetime.now().isoformat(timespec="seconds"),
-                        "user": user_name,
-                        "source_root": str(source_dir),
-                        "target_root": str(target_dir),
-                        "relpath": rel_path_posix,
-                        "size": int(src_size),
-                        "mtime": float(src_mtime),
-                        "action": "MOVE",
-                    }
-                    append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf)
-                    manifest_index[(rel_path_posix, str(target_dir))] = (int(src_size), float(src_mtime))
-
+                            except Exception as e:
+                                logf(f"[ERROR] Cannot delete existing dst: {dst_file} ({e})")
+                                c["errors"] += 1
+                                return c
+
+            # Destination does not exist (or we deleted it due to overwrite)
+            copy_info: dict = {}
+            if do_move:
+                if dry_run:
+                    logf(f"[MOVE] {src_file} -> {dst_file} ({src_size / 1024**3:.3f} GB)")
                 else:
-                    if dry_run:
-                        logf(f"[COPY] {src_file} -> {dst_file} ({int(src_size) / 1024**2:.1f} MB)")
-                    else:
-                        exc = copy_with_retry(
-                            src_file, dst_file,
-                            retries=retries, retry_delay_s=retry_delay_s, logf=logf,
-                        )
-                        if exc is not None:
-                            logf(f"[ERROR] COPY failed: {src_file} -> {dst_file} ({exc})")
-                            errors += 1
-                            continue
-                        logf(f"[COPY] {src_file} -> {dst_file} ({int(src_size) / 1024**2:.1f} MB)")
-                    copied += 1
-
-                    # Manifest record for COPY
-                    rec = {
-                        "ts": datetime.now().isoformat(timespec="seconds"),
-                        "user": user_name,
-                        "source_root": str(source_dir),
-                        "target_root": str(target_dir),
-                        "relpath": rel_path_posix,
-                        "size": int(src_size),
-                        "mtime": float(src_mtime),
-                        "action": "COPY",
-                    }
-                    append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf)
-                    manifest_index[(rel_path_posix, str(target_dir))] = (int(src_size), float(src_mtime))
+                    # A rename moves no data, so it does not take one of the --async-bulk slots.
+                    if volumes.same(src_file.parent, dst_file.parent) is not True:
+                        yield "bulk"
+                    exc, copy_info = move_with_verify(
+                        src_file, dst_file,
+                        rel_path_str=rel_path_posix,
+                        retries=retries, retry_delay_s=retry_delay_s,
+                        sample_blocks=sample_blocks, block_size=block_size,
+                        logf=logf,
+                        streams=streams, stream_min_bytes=stream_min_bytes,
+                        verify=move_copy_verify, sampler=sampler, backend=copy_backend,
+                        large_io=large_file_io, large_min_bytes=large_min_bytes,
+                        volumes=volumes,
+                    )
+                    yield None
+                    if exc is not None:
+                        logf(f"[ERROR] MOVE failed: {src_file} -> {dst_file} ({exc})")
+                        c["errors"] += 1
+                        return c
+                    logf(f"[MOVE] {src_file} -> {dst_file} ({src_size / 1024**3:.3f} GB, verified, "
+                         f"{copy_note(copy_info)})")
+                    c["bytes_transferred"] += copy_info.get("bytes", 0)
+                    c["via " + copy_info["copied_by"]] += 1
+                    dest_cache.note_file(dst_file, src_size, src_mtime)
+                c["moved"] += 1
+
+                # Manifest record for MOVE
+                record_transfer(rel_path_posix, src_size, src_mtime, "MOVE", copy_info=copy_info)
+
+            else:
+                if dry_run:
+                    logf(f"[COPY] {src_file} -> {dst_file} ({src_size / 1024**2:.1f} MB)")
+                else:
+                    yield "bulk"
+                    exc, copy_info = copy_with_retry(
+                        src_file, dst_file,
+                        retries=retries, retry_delay_s=retry_delay_s, logf=logf,
+                        streams=streams, stream_min_bytes=stream_min_bytes,
+                        verify=copy_copy_verify,
+                        sample_blocks=sample_blocks, sample_block_size=block_size, sampler=sampler,
+                        backend=copy_backend, large_io=large_file_io, large_min_bytes=large_min_bytes,
+                    )
+                    yield None
+                    if exc is not None:
+                        logf(f"[ERROR] COPY failed: {src_file} -> {dst_file} ({exc})")
+                        c["errors"] += 1
+                        return c
+                    logf(f"[COPY] {src_file} -> {dst_file} ({src_size / 1024**2:.1f} MB, {copy_note(copy_info)})")
+                    c["bytes_transferred"] += copy_info.get("bytes", 0)
+                    c["via " + copy_info["copied_by"]] += 1
+                    dest_cache.note_file(dst_file, src_size, src_mtime)
+                c["copied"] += 1
+
+                # Manifest record for COPY
+                record_transfer(rel_path_posix, src_size, src_mtime, "COPY", copy_info=copy_info)
+
+            return c
+
+        # --- Scan phase: one listing per directory, one stat per file ---
+        # Directories are created lazily (see ensure_dir(dst_file.parent, ...) in process_entry()),
+        # only when a file actually needs to land in them. This avoids creating empty target
+        # folders for source directories that contain no files (directly or in any subfolder).
+        # Unchanged, fully manifest-covered directories are not listed at all (see DirSnapshot).
+        # --execute-plan skips the scan entirely: the plan file's entries are the work list.
+        snapshot = None
+        plan: List[PlanEntry] = []
+        scan_t0 = time.monotonic()
+        if plan_entries is None:
+            if not ignore_manifest:
+                snapshot = DirSnapshot.load(
+                    source_dir,
+                    snapshot_fingerprint(target_dir, include_exts, max_bytes, move_exts, move_keywords),
+                    use_for_skip=not (full_rescan or overwrite),
+                    max_age_s=snapshot_max_age_h * 3600,
+                    logf=logf,
+                )
+            plan, scan_errors = scan_tree(
+                source_dir, target_dir,
+                include_exts=include_exts,
+                max_bytes=max_bytes,
+                move_exts=move_exts,
+                move_keywords=move_keywords,
+                logf=logf,
+                dest_cache=dest_cache,
+                snapshot=snapshot,
+            )
+            totals["errors"] += scan_errors
+            if snapshot is not None and snapshot.skipped_dirs:
+                logf(f"[SNAPSHOT] {snapshot.skipped_dirs} unchanged director(ies) not listed, "
+                     f"{snapshot.skipped_files} file(s) already covered by the manifest (--full-rescan to list all)")
+                totals["skipped_manifest"] += snapshot.skipped_files
+            if snapshot is not None and snapshot.expired_dirs:
+                logf(f"[SNAPSHOT] {snapshot.expired_dirs} unchanged director(ies) listed again, "
+                     f"last listed over {snapshot_max_age_h:g} h ago (--snapshot-max-age-h)")
+            plan_bytes = sum(e.size for e in plan)
+            logf(f"[SCAN] {len(plan)} file(s), {plan_bytes / 1024**3:.3f} GB planned "
+                 f"(MOVE-category: {sum(1 for e in plan if e.category == 'MOVE')}, "
+                 f"dst exists: {sum(1 for e in plan if e.dst_size is not None)})")
+        else:
+            # --execute-plan: only entries whose source and destination still look exactly as
+            # they did when the plan was written are run; anything else is reported and left
+            # for the next normal run to pick up.
+            src_cache = DestDirCache()
+            for entry in plan_entries:
+                src_now = src_cache.lookup(source_dir.joinpath(*entry.relpath.split("/")))
+                dst_now = dest_cache.lookup(target_dir.joinpath(*entry.relpath.split("/")))
+                if (
+                    src_now is None
+                    or not size_and_mtime_match(entry.size, entry.mtime, *src_now)
+                    or (dst_now is None) != (entry.dst_size is None)
+                    or (dst_now is not None and not size_and_mtime_match(entry.dst_size, entry.dst_mtime, *dst_now))
+                ):
+                    logf(f"[PLAN][WARN] Changed since the plan was written, skipped: {entry.relpath}")
+                    totals["plan_stale"] += 1
+                    continue
+                plan.append(entry)
+            stale_note = f", {totals['plan_stale']} changed since the plan" if totals["plan_stale"] else ""
+            logf(f"[PLAN] Executing {len(plan)} of {len(plan_entries)} planned action(s){stale_note}")
+        run_stats.update(scan_s=round(time.monotonic() - scan_t0, 3), planned_files=len(plan),
+                         planned_bytes=sum(e.size for e in plan))
+
+        if plan_out is not None:
+            # --plan: classify from the scan metadata, write the file, and stop before any
+            # per-file work (no hashing, nothing copied or logged per file).
+            actions = [
+                (classify_entry(e, target_dir=target_dir, manifest_index=manifest_index,
+                                overwrite=overwrite, verify=verify), e)
+                for e in plan
+            ]
+            summary = write_plan_file(
+                plan_out, actions,
+                source_dir=source_dir, target_dir=target_dir, target_root=lock_file.parent,
+                settings={"overwrite": overwrite, "verify": verify, "maxSize_gb": max_size_gb,
+                          "move_ext": sorted(move_exts), "move_keyword": list(move_keywords),
+                          "include_ext": sorted(include_exts)},
+                unlisted_covered=snapshot.skipped_files if snapshot is not None else 0,
+            )
+            logf("-" * 110)
+            logf(f"[PLAN] Written: {plan_out}")
+            for action in PLAN_ACTIONS:
+                t = summary["totals"][action]
+                logf(f"[PLAN] {action:<14} {t['files']:>8} file(s) {t['bytes'] / 1024**3:>12.3f} GB")
+            est = summary["estimate"]
+            if est["seconds"] is not None:
+                logf(f"[PLAN] Estimated transfer time: {format_duration(est['seconds'])} for "
+                     f"{est['bytes'] / 1024**3:.3f} GB at {est['mb_s']} MB/s (measured {est['measured']}; "
+                     f"same-volume MOVEs are renames and faster)")
+            else:
+                logf("[PLAN] Estimated transfer time: unknown (no live run to this target measured yet)")
+            run_stats["status"] = "plan written"
+            return (0, 0, 0, 0, 0, 0, 0, totals["errors"], src_log_path, tgt_log_path)
+
+        # --- Execution phase ---
+        # Serial path (--workers 1) runs each entry inline. With --workers N, entries are handed
+        # to a bounded thread pool; at most MAX_PENDING_PER_WORKER * N files are in flight at
+        # once, so huge trees don't queue up one Future per file in memory.
+        def next_stage(stages) -> Tuple[bool, object]:
+            """Run process_entry() up to its next yield: (False, slot name or None) or (True, its Counter)."""
+            try:
+                return False, next(stages)
+            except StopIteration as stop:
+                return True, stop.value
+
+        def run_stages(stages) -> Counter:
+            while True:
+                done, value = next_stage(stages)
+                if done:
+                    return value
+
+        def finish_entry(entry: PlanEntry, c: Counter) -> Counter:
+            if snapshot is not None and c != SKIPPED_BY_MANIFEST:
+                snapshot.mark_dirty(entry.relpath.rpartition("/")[0] or ".")
+            progress.file_done(entry.size, copied=c["bytes_transferred"] > 0)
+            return c
+
+        def run_entry(entry: PlanEntry) -> Counter:
+            return finish_entry(entry, run_stages(process_entry(entry)))
+
+        if order == "auto":
+            schedule = DiskPressureSchedule(plan, source_dir, int(min_free_gb * 1024**3), logf)
+        else:
+            schedule = order_plan(plan, order)
+
+        async def run_plan_async() -> None:
+            # Each process_entry() step is its own to_thread() call. A file is admitted with one of
+            # --async-metadata slots and gives it back when it reaches its first hash or bulk stage,
+            # where it waits for an asyncio.Semaphore as a coroutine, holding no thread - so files
+            # queued behind copies never hold up the metadata-only files after them. Admitted but
+            # unfinished files are capped at MAX_PENDING_PER_WORKER * --async-metadata.
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(
+                max_workers=async_metadata + async_hash + async_bulk, thread_name_prefix="transfer-async"))
+            admit = asyncio.Semaphore(async_metadata)
+            room = asyncio.Semaphore(MAX_PENDING_PER_WORKER * async_metadata)
+            slots = {"hash": asyncio.Semaphore(async_hash), "bulk": asyncio.Semaphore(async_bulk)}
+            stopping = False
+            failed: List[BaseException] = []
+
+            async def run_entry_async(entry: PlanEntry) -> None:
+                stages = process_entry(entry)
+                admitted = True
+                try:
+                    slot = None
+                    while True:
+                        if slot is None:
+                            done, value = await asyncio.to_thread(next_stage, stages)
+                        else:
+                            if admitted:
+                                admit.release()
+                                admitted = False
+                            async with slot:
+                                if stopping or (cancel is not None and cancel.is_set()):
+                                    # Ctrl-C: a file still waiting for its hash/bulk slot stops here;
+                                    # the next run picks it up again.
+                                    stages.close()
+                                    finish_entry(entry, Counter())
+                                    return
+                                done, value = await asyncio.to_thread(next_stage, stages)
+                        if done:
+                            totals.update(finish_entry(entry, value))
+                            return
+                        slot = slots.get(value)
+                except BaseException as e:
+                    failed.append(e)
+                finally:
+                    if admitted:
+                        admit.release()
+                    room.release()
+
+            tasks: set = set()
+            try:
+                for entry in schedule:
+                    if (cancel is not None and cancel.is_set()) or failed:
+                        break
+                    await room.acquire()
+                    await admit.acquire()
+                    task = asyncio.ensure_future(run_entry_async(entry))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.wait(tasks)
+                if cancel is not None and cancel.is_set():
+                    raise KeyboardInterrupt
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                # Stop admitting; files already past their slots finish, those still waiting for
+                # one stop there, then Ctrl-C is passed on. (asyncio.wait, unlike gather, does
+                # not cancel the tasks when this coroutine is cancelled.)
+                stopping = True
+                if tasks:
+                    await asyncio.wait(tasks)
+                raise
+            if failed:
+                raise failed[0]
+
+        progress = TransferProgress(run_stats["planned_files"], run_stats["planned_bytes"],
+                                    interval_s=progress_s, logf=logf)
+        if engine == "asyncio":
+            pool = None   # a shared batch pool is for the threads engine only
+        own_pool = engine == "threads" and pool is None and workers > 1
+        if own_pool:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transfer")
+        pending: set = set()
+        exec_t0 = time.monotonic()
+        progress.start()
+        try:
+            if engine == "asyncio":
+                # Files already running finish before asyncio.run() returns or re-raises Ctrl-C.
+                asyncio.run(run_plan_async())
+            else:
+                for entry in schedule:
+                    if cancel is not None and cancel.is_set():
+                        raise KeyboardInterrupt
+                    if pool is None:
+                        totals.update(run_entry(entry))
+                        continue
+
+                    if len(pending) >= MAX_PENDING_PER_WORKER * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            totals.update(fut.result())
+                    pending.add(pool.submit(run_entry, entry))
+
+                for fut in as_completed(pending):
+                    totals.update(fut.result())
+                pending = set()
+        finally:
+            # On Ctrl-C or an unexpected error, drop files that haven't started yet; files
+            # already in a worker run to completion so none is left half-copied.
+            if own_pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+            elif pending:
+                # Shared pool (batch mode): only this run's files, and they must be done
+                # before the logger and manifest writer are closed below.
+                for fut in pending:
+                    fut.cancel()
+                wait(pending)
+            progress.stop()
+            run_stats["execute_s"] = round(time.monotonic() - exec_t0, 3)
+
+        # Measured copy throughput to this target root, for the duration estimate of later --plan runs.
+        exec_s = run_stats["execute_s"]
+        if not dry_run and totals["bytes_transferred"] >= THROUGHPUT_MIN_BYTES and exec_s > 0:
+            save_measured_throughput(lock_file.parent, totals["bytes_transferred"] / 1024**2 / exec_s, logf)
+
+        # Only after every planned file has run: an interrupted run must not mark directories covered.
+        if snapshot is not None and not dry_run:
+            snapshot.save(logf)
+
+        copied = totals["copied"]
+        moved = totals["moved"]
+        deleted_src = totals["deleted_src"]
+        skipped_manifest = totals["skipped_manifest"]
+        skipped_existing = totals["skipped_existing"]
+        mismatched = totals["mismatched"]
+        suspected_truncated = totals["suspected_truncated"]
+        errors = totals["errors"]
 
         logf("-" * 110)
         logf(f"[INFO] Done: {datetime.now().isoformat(timespec='seconds')}")
@@ -1094,20 +4552,344 @@ def transfer_tree(
         if suspected_truncated > 0:
             logf(f"[WARN] {suspected_truncated} of those mismatch(es) look like truncated transfers "
                  f"(all-zero tail) - review recommended.")
+        copy_paths = sorted((k[len("via "):], n) for k, n in totals.items() if k.startswith("via "))
+        if copy_paths:
+            logf("[INFO] Copy paths: " + " | ".join(f"{name}: {n}" for name, n in copy_paths))
+        if totals["plan_stale"]:
+            logf(f"[INFO] {totals['plan_stale']} planned file(s) changed since the plan was written and were skipped.")
+        if order == "auto" and schedule.promoted:
+            logf(f"[INFO] Order: {schedule.promoted} MOVE-category file(s) moved ahead under disk pressure")
+        if hash_cache is not None and (hash_cache.hits, hash_cache.misses) != hash_cache_counts:
+            logf(f"[INFO] Partial-hash cache: {hash_cache.hits - hash_cache_counts[0]} hit(s), "
+                 f"{hash_cache.misses - hash_cache_counts[1]} file(s) sampled")
+        if not dry_run:
+            logf(f"[INFO] Transferred: {totals['bytes_transferred'] / 1024**3:.3f} GB in "
+                 f"{format_duration(exec_s)} ({totals['bytes_transferred'] / 1024**2 / max(exec_s, 1e-6):.1f} MB/s)")
+        logf("[INFO] Phase times (s, summed over threads): "
+             + " | ".join(f"{phase}: {sec:.1f}"
+                          for phase, sec in PHASE_TIMES.seconds(since=phase_start).items()))
+        run_stats["status"] = "completed"
 
         return (copied, moved, deleted_src, skipped_manifest, skipped_existing,
                 mismatched, suspected_truncated, errors, src_log_path, tgt_log_path)
 
     finally:
+        if mwriter is not None:
+            # Writes the last buffered group, also on Ctrl-C (before the database is closed).
+            mwriter.close()
+        wall_s = time.monotonic() - run_t0
+        copied_bytes = COPY_METER.total - meter_start
+        written = write_run_summary(summary_paths, {
+            "tool": f"serverTransfer.py {__version__}",
+            "status": run_stats["status"],
+            "started": started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "source": str(source_dir),
+            "target": str(target_dir),
+            "user": user_name,
+            "dry_run": dry_run,
+            "workers": workers,
+            "engine": engine,
+            "order": order,
+            "wall_s": round(wall_s, 3),
+            "scan_s": run_stats["scan_s"],
+            "execute_s": run_stats["execute_s"],
+            "phases_s": PHASE_TIMES.seconds(since=phase_start),
+            "planned": {"files": run_stats["planned_files"], "bytes": run_stats["planned_bytes"]},
+            "bytes_copied": copied_bytes,
+            "mb_s": round(copied_bytes / 1024**2 / run_stats["execute_s"], 1) if run_stats["execute_s"] else None,
+            "counts": {k: n for k, n in totals.items() if not k.startswith("via ")},
+            "copy_paths": {k[len("via "):]: n for k, n in totals.items() if k.startswith("via ")},
+            "logs": [str(src_log_path)] + ([str(tgt_log_path)] if tgt_log_handle is not None else []),
+        })
+        if len(written) < len(summary_paths):
+            logf(f"[WARN] Run summary not written to: "
+                 f"{', '.join(str(p) for p in summary_paths if p not in written)}")
+        if mdb is not None:
+            # Commits the last partial batch, also on Ctrl-C.
+            try:
+                mdb.close()
+            except Exception as e:
+                logf(f"[MANIFEST][ERROR] Failed to close SQLite manifest ({e})")
+        # Drains the log queue; must come before the handles are closed.
+        logf.close()
         if src_log_handle:
             src_log_handle.close()
         if tgt_log_handle:
             tgt_log_handle.close()
 
 
+# ----------------------------
+# Batch mode (several sources / --sources-file)
+# ----------------------------
+# Many session folders in one process instead of one process each: the interpreter,
+# the hash cache and the file worker pool (--workers) are set up once and shared,
+# and up to --parallel-sources sources run at the same time. Every source still gets
+# its own logs, run summary and manifest; all of them carry the batch's timestamp.
+# transferBatch_<ts>.json has the per-source counts and exit codes.
+RESULT_COUNTS = ("copied", "moved", "deleted_src", "skipped_manifest", "skipped_existing",
+                 "mismatched", "suspected_truncated", "errors")
+DEFAULT_PARALLEL_SOURCES = 1
+
+
+class SourceJob(NamedTuple):
+    """One validated source -> target pair, ready for transfer_tree()."""
+    source: Path
+    target: Path
+    target_root: str      # as printed ("<explicit --target>" when the target was given directly)
+    lock_file: Path
+    forced_by_lock: bool
+    dry_run: bool
+
+
+def prepare_source(source: str, target: Optional[str], target_root: Optional[str], *, dry_run: bool) -> SourceJob:
+    """Map and validate one source; raises ValueError with the reason it can't run."""
+    src = Path(source)
+    if target:
+        tgt = Path(target)
+    elif target_root:
+        tgt = Path(str(compute_target_path_server(source, target_root)))
+    else:
+        raise ValueError(f"No target for {src}: provide --target-root or --target")
+
+    if not lp_exists(src):
+        raise ValueError(f"Source does not exist: {src}")
+    if not lp_isdir(src):
+        raise ValueError(f"Source is not a directory: {src}")
+
+    # Safety: forbid same path / nesting in either direction
+    validate_source_target_relationship(src, tgt)
+
+    # Lock check (optional, re-uses the same lock filename on the target root).
+    # With an explicit target, the target folder itself is the lock-check location.
+    target_root_path = tgt if target else Path(str(normalize_target_root(target_root)))
+    lock_file = target_root_path / LOCK_FILENAME
+    forced_by_lock = lp_exists(lock_file)
+    return SourceJob(
+        source=src,
+        target=tgt,
+        target_root=target_root if not target else "<explicit --target>",
+        lock_file=lock_file,
+        forced_by_lock=forced_by_lock,
+        dry_run=dry_run or forced_by_lock,
+    )
+
+
+def read_sources_file(path: Path) -> List[Tuple[str, Optional[str]]]:
+    """
+    One source folder per line, optionally followed by a tab and an explicit
+    target folder (as with --target). Blank lines and lines starting with # are
+    skipped; quotes around a path are removed.
+    """
+    pairs = []
+    with lp_open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = [p.strip().strip('"') for p in line.split("\t") if p.strip()]
+            if len(parts) > 2:
+                raise ValueError(f"more than one tab-separated target in line: {line}")
+            pairs.append((parts[0], parts[1] if len(parts) == 2 else None))
+    return pairs
+
+
+def batch_exit_code(codes: List[Optional[int]]) -> int:
+    """Worst per-source exit code: 2 (source could not run), 1 (errors), 3 (locked), else 0."""
+    for code in (2, 1, 3):
+        if code in codes:
+            return code
+    return 0
+
+
+# ----------------------------
+# Watch mode (--watch)
+# ----------------------------
+# A long-running alternative to triggering a transfer after every session. The
+# sources are acquisition roots; every folder --watch-depth levels below a root is
+# a session. Each poll lists the roots down to that depth (scandir only) and:
+#   - a session transferred before is only stat'ed directory by directory; if no
+#     directory mtime changed, nothing else is read,
+#   - any other session is walked for its file count, total size and newest mtime,
+#     so a file still growing in place counts as a change too.
+# A session is queued once nothing in it changed for --quiet-s seconds, and the
+# queued sessions of one poll run as one batch. Failed or locked sessions wait for
+# another quiet period before the next attempt. As with the directory snapshot, a
+# transferred session's files rewritten in place (no directory mtime change) are
+# not noticed. The state is kept in <root>/.server_transfer/watch_snapshot.json, so
+# a restarted watcher picks up where it stopped instead of re-walking every session.
+WATCH_SNAPSHOT_NAME = "watch_snapshot.json"
+DEFAULT_WATCH_DEPTH = 1
+DEFAULT_WATCH_INTERVAL_S = 60.0
+DEFAULT_QUIET_S = 600.0
+
+
+def watch_snapshot_path(root: Path) -> Path:
+    return manifest_dir(root) / WATCH_SNAPSHOT_NAME
+
+
+def list_session_dirs(root: Path, depth: int) -> List[Path]:
+    """Folders exactly `depth` levels below root (no symlinks, no .server_transfer)."""
+    level = [root]
+    for _ in range(depth):
+        below = []
+        for folder in level:
+            try:
+                with os.scandir(long_path(folder)) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir() and not entry.is_symlink() and entry.name != ".server_transfer":
+                                below.append(folder / entry.name)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        level = below
+    return sorted(level)
+
+
+def session_state(session: Path) -> dict:
+    """Directory mtimes plus file count, total size and newest mtime of one session folder."""
+    dirs: Dict[str, float] = {}
+    files = size = 0
+    newest = 0.0
+    stack = [session]
+    while stack:
+        folder = stack.pop()
+        mtime = _dir_mtime(folder)
+        if mtime is None:
+            continue
+        dirs[folder.relative_to(session).as_posix()] = mtime
+        newest = max(newest, mtime)
+        try:
+            with os.scandir(long_path(folder)) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink() and entry.name != ".server_transfer":
+                                stack.append(folder / entry.name)
+                        elif not is_control_file(entry.name):
+                            st = entry.stat()
+                            files += 1
+                            size += st.st_size
+                            newest = max(newest, st.st_mtime)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return {"dirs": dirs, "files": files, "bytes": size, "newest": newest}
+
+
+def dirs_unchanged(session: Path, dirs: Dict[str, float]) -> bool:
+    for rel, mtime in dirs.items():
+        if _dir_mtime(session / rel) != mtime:
+            return False
+    return True
+
+
+class SessionWatcher:
+    """
+    Watch state of one acquisition root: per session (path relative to the root)
+    its last seen session_state(), when it last changed ("changed_at", epoch
+    seconds) and the last transfer ("transferred_at", "exit_code"). State saved
+    for another target root or depth is discarded.
+    """
+
+    def __init__(self, root: Path, *, target_root: str, depth: int, quiet_s: float) -> None:
+        self.root = root
+        self.target_root = target_root
+        self.depth = depth
+        self.quiet_s = quiet_s
+        self.path = watch_snapshot_path(root)
+        self.sessions: Dict[str, dict] = {}
+
+    def load(self) -> None:
+        try:
+            with lp_open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[WATCH][WARN] Unreadable watch snapshot, starting over: {self.path} ({e})")
+            return
+        if (data.get("target_root"), data.get("depth")) == (self.target_root, self.depth):
+            self.sessions = data.get("sessions", {})
+
+    def save(self) -> None:
+        try:
+            lp_mkdir(self.path.parent)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with lp_open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "target_root": self.target_root, "depth": self.depth,
+                           "sessions": self.sessions}, f, separators=(",", ":"))
+            os.replace(long_path(tmp), long_path(self.path))
+        except Exception as e:
+            print(f"[WATCH][WARN] Could not save watch snapshot: {self.path} ({e})")
+
+    def poll(self, now: float) -> List[Path]:
+        """Sessions that have been quiet for quiet_s and need a transfer."""
+        ready = []
+        found = set()
+        for session in list_session_dirs(self.root, self.depth):
+            rel = session.relative_to(self.root).as_posix()
+            found.add(rel)
+            known = self.sessions.get(rel)
+            if known is not None and known.get("transferred_at") and dirs_unchanged(session, known["dirs"]):
+                continue
+            state = session_state(session)
+            if known is None:
+                # First sight: an old, finished session is quiet right away; one being written is not.
+                known = self.sessions[rel] = {**state, "changed_at": state["newest"],
+                                              "transferred_at": None, "exit_code": None}
+                print(f"[WATCH] New session: {session}")
+            elif (state["files"], state["bytes"], state["newest"]) != (known["files"], known["bytes"], known["newest"]):
+                known.update(state, changed_at=now, transferred_at=None)
+                print(f"[WATCH] Changed: {session} ({state['files']} file(s), {state['bytes'] / 1024**3:.3f} GB)")
+            else:
+                known["dirs"] = state["dirs"]
+            if not known["transferred_at"] and now - known["changed_at"] >= self.quiet_s:
+                ready.append(session)
+        for rel in set(self.sessions) - found:
+            print(f"[WATCH] Gone: {self.root / rel}")
+            del self.sessions[rel]
+        return ready
+
+    def mark_done(self, session: Path, exit_code: Optional[int], now: float) -> None:
+        """Record a finished transfer. The session's own state afterwards (logs, moved files) is the new baseline."""
+        rel = session.relative_to(self.root).as_posix()
+        known = self.sessions.setdefault(rel, {})
+        known.update(session_state(session), exit_code=exit_code, changed_at=now)
+        known["transferred_at"] = datetime.now().isoformat(timespec="seconds") if exit_code == 0 else None
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Mirror a source directory tree into a user-defined target root (serverTransfer).")
-    ap.add_argument("source", help="Source folder path (Windows path or UNC path).")
+    ap.add_argument("source", nargs="*",
+                    help="Source folder path (Windows path or UNC path). Several sources run as one batch, "
+                         "each mirrored under --target-root.")
+    ap.add_argument("--sources-file", default=None, metavar="PATH",
+                    help="Text file with one source folder per line (optionally a tab and an explicit target "
+                         "folder; # comments), run as one batch together with any positional sources. "
+                         "Default: <off>")
+    ap.add_argument("--parallel-sources", type=int, default=DEFAULT_PARALLEL_SOURCES,
+                    help="Batch mode: number of sources transferred at the same time. They share one pool of "
+                         f"--workers file workers. Default: {DEFAULT_PARALLEL_SOURCES}")
+    ap.add_argument("--watch", action="store_true",
+                    help="Keep running: the sources are acquisition roots, polled every --watch-interval-s; each "
+                         "session folder (--watch-depth levels down) is transferred, as a batch, once it had no "
+                         "changes for --quiet-s. State is kept in <root>/.server_transfer/watch_snapshot.json. "
+                         "Requires --target-root. Default: off")
+    ap.add_argument("--watch-depth", type=int, default=DEFAULT_WATCH_DEPTH,
+                    help=f"--watch: how many folder levels below a root the session folders are. "
+                         f"Default: {DEFAULT_WATCH_DEPTH}")
+    ap.add_argument("--watch-interval-s", type=float, default=DEFAULT_WATCH_INTERVAL_S,
+                    help=f"--watch: seconds between polls. Default: {DEFAULT_WATCH_INTERVAL_S:g}")
+    ap.add_argument("--quiet-s", type=float, default=DEFAULT_QUIET_S,
+                    help=f"--watch: a session is transferred once nothing in it changed for this many seconds. "
+                         f"Default: {DEFAULT_QUIET_S:g}")
+    ap.add_argument("--batch-summary", default=None, metavar="PATH",
+                    help="Batch mode: consolidated JSON summary (per-source counts, logs and exit codes). "
+                         "Default: transferBatch_<ts>.json in the current folder")
     ap.add_argument("--target-root", default=None, help=r"Target root (e.g. E:\ or \\naskampa\lts\). Preserves the source's relative path under this root.")
     ap.add_argument("--target", default=None, help=r"Explicit full target folder path, bypassing automatic path mapping (use when the destination structure doesn't mirror the source's relative path). Exactly one of --target-root/--target is required.")
 
@@ -1131,54 +4913,332 @@ def main() -> int:
     ap.add_argument("--sample-block-kb", type=int, default=DEFAULT_SAMPLE_BLOCK_KB,
                     help=f"Block size (KB) for partial hash. Default: {DEFAULT_SAMPLE_BLOCK_KB} (~1MB total)")
 
+    ap.add_argument("--sample-strategy", choices=SAMPLE_STRATEGIES, default=DEFAULT_SAMPLE_STRATEGY,
+                    help="Partial-hash sampling: random (--sample-blocks random blocks) or stratified (always head "
+                         "and tail, plus one block per 1 GB region, so large files get more blocks, capped by "
+                         f"--sample-budget-mb). Default: {DEFAULT_SAMPLE_STRATEGY}")
+    ap.add_argument("--sample-budget-mb", type=int, default=DEFAULT_SAMPLE_BUDGET_MB,
+                    help=f"Per-file read budget (MB) for --sample-strategy stratified. "
+                         f"Default: {DEFAULT_SAMPLE_BUDGET_MB}")
+
+    ap.add_argument("--hash-cache", default=None,
+                    help="Partial-hash cache database (results reused while a file's size and mtime are unchanged, "
+                         "also by verifiedDeleteExisting.py). Default: " + str(default_hash_cache_path()))
+    ap.add_argument("--no-hash-cache", action="store_true",
+                    help="Always re-sample files for the partial hash; don't read or write the cache.")
+    ap.add_argument("--hash-cache-max-entries", type=int, default=DEFAULT_HASH_CACHE_MAX_ENTRIES,
+                    help=f"Evict least-recently-used cache entries beyond this many. "
+                         f"Default: {DEFAULT_HASH_CACHE_MAX_ENTRIES}")
+
+    ap.add_argument("--full-rescan", action="store_true",
+                    help="List every source directory, including ones the directory snapshot "
+                         "(.server_transfer/dir_snapshot.json) reports as unchanged and fully covered by the manifest. "
+                         "Needed to pick up files rewritten in place, which don't change their directory's mtime.")
+    ap.add_argument("--snapshot-max-age-h", type=float, default=DEFAULT_SNAPSHOT_MAX_AGE_H,
+                    help="Skip an unchanged directory only if it was actually listed within this many hours; older "
+                         "snapshot entries are listed again, so a file rewritten in place is picked up within this "
+                         f"time. 0 lists every directory. Default: {DEFAULT_SNAPSHOT_MAX_AGE_H:g}")
+    ap.add_argument("--plan", default=None, metavar="PATH",
+                    help="Metadata-only dry run: scan, classify every file (COPY, MOVE, DEL-SRC, CHECK-EXISTING, "
+                         "SKIP-MANIFEST, SKIP-EXISTING) without hashing, and write the result as JSON with per-action "
+                         "totals and an estimated duration from the last measured throughput to this target. "
+                         "Default: <off>")
+    ap.add_argument("--execute-plan", default=None, metavar="PATH",
+                    help="Run the actions of a --plan file without rescanning the source. Entries whose source or "
+                         "destination changed since the plan was written are skipped. Uses the plan's --overwrite "
+                         "and --verify settings. Default: <off>")
     ap.add_argument("--ignore-manifest", action="store_true",
                     help="Ignore manifest and process files as if none were previously staged/archived.")
+    ap.add_argument("--manifest-db", action="store_true",
+                    help="Use the indexed SQLite manifest (.server_transfer/manifest.sqlite) instead of re-parsing "
+                         "manifest.ndjson on every start; existing NDJSON history is imported once. Once the database "
+                         "exists it is used automatically, with or without this flag.")
+
+    ap.add_argument("--manifest-fsync", choices=MANIFEST_FSYNC_POLICIES, default=DEFAULT_MANIFEST_FSYNC,
+                    help="When manifest writes are forced to disk: none (OS decides), batch (once per written "
+                         "group) or every (each record, slowest). Default: " + DEFAULT_MANIFEST_FSYNC)
+    ap.add_argument("--manifest-flush-records", type=int, default=DEFAULT_MANIFEST_FLUSH_RECORDS,
+                    help=f"Write buffered manifest records after this many. Default: {DEFAULT_MANIFEST_FLUSH_RECORDS}")
+    ap.add_argument("--manifest-flush-s", type=float, default=DEFAULT_MANIFEST_FLUSH_S,
+                    help=f"...or after this many seconds, whichever comes first. Default: {DEFAULT_MANIFEST_FLUSH_S}")
+
+    ap.add_argument("--verify", choices=VERIFY_TIERS, default=None,
+                    help="Verification tier for every source/destination check: size (size/mtime only), sample "
+                         "(partial hash) or full (full-content hash of both files, streamed in parallel). Applies to "
+                         "existing destinations before a source is deleted, to freshly copied files, and (sample/full) "
+                         "to existing COPY-category destinations. Default: per check - existing dst: sample, "
+                         "MOVE copy: full read-back, COPY copy: size + tail")
 
     ap.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
                     help=f"Number of retries after a failed copy/move before giving up. Default: {DEFAULT_RETRIES}")
     ap.add_argument("--retry-delay-s", type=float, default=DEFAULT_RETRY_DELAY_S,
                     help=f"Seconds to wait between retries. Default: {DEFAULT_RETRY_DELAY_S}")
 
+    ap.add_argument("--streams", type=int, default=DEFAULT_STREAMS,
+                    help="Copy single huge files as this many parallel ranged streams (see --stream-min-gb); each "
+                         "range is verified by read-back and retried on its own. Helps on high-latency links where "
+                         f"one stream can't fill the bandwidth. Default: {DEFAULT_STREAMS} (single stream)")
+    ap.add_argument("--stream-min-gb", type=float, default=DEFAULT_STREAM_MIN_GB,
+                    help=f"Minimum file size (GB) for the ranged copy with --streams. Default: {DEFAULT_STREAM_MIN_GB}")
+
+    ap.add_argument("--copy-backend", choices=COPY_BACKENDS, default=DEFAULT_COPY_BACKEND,
+                    help="auto: on Linux, copy new files in the kernel where possible (reflink, then copy_file_range, "
+                         "then sendfile) and fall back to the buffered copy; buffered: always copy through the "
+                         "streaming loop, which records an inline content hash for every copy. Each file's path is "
+                         f"logged. Default: {DEFAULT_COPY_BACKEND}")
+
+    ap.add_argument("--large-file-io", choices=LARGE_FILE_IO_MODES, default=DEFAULT_LARGE_FILE_IO,
+                    help="Page-cache handling for files >= --large-file-min-gb: fadvise (preallocate, sequential "
+                         "readahead, drop copied pages from the cache as it goes) or direct (O_DIRECT, bypassing "
+                         "the cache; falls back to fadvise where unsupported). Throughput and peak RSS of those "
+                         f"files are logged in every mode. Default: {DEFAULT_LARGE_FILE_IO}")
+    ap.add_argument("--large-file-min-gb", type=float, default=DEFAULT_LARGE_FILE_MIN_GB,
+                    help=f"Minimum file size (GB) for --large-file-io. Default: {DEFAULT_LARGE_FILE_MIN_GB}")
+
+    ap.add_argument("--console", choices=CONSOLE_MODES, default=DEFAULT_CONSOLE_MODE,
+                    help="Per-file lines ([COPY]/[MOVE]/[SKIP]/...) on the console: all, rate (rate-limited, see "
+                         "--console-rate) or quiet (log file only). Header, summary, warnings and errors are always "
+                         f"shown. The log files always get every line. Default: {DEFAULT_CONSOLE_MODE}")
+    ap.add_argument("--console-rate", type=int, default=DEFAULT_CONSOLE_RATE,
+                    help=f"Per-file console lines per second with --console rate. Default: {DEFAULT_CONSOLE_RATE}")
+
+    ap.add_argument("--progress-s", type=float, default=DEFAULT_PROGRESS_S,
+                    help="Log a [PROGRESS] line (rolling MB/s and files/s, bytes remaining, ETA) every this many "
+                         f"seconds; 0 = off. Default: {DEFAULT_PROGRESS_S:g}")
+
+    ap.add_argument("--profile", action="store_true",
+                    help="Profile the run (cProfile on all threads, plus call counts and wall-clock times of the lp_* "
+                         "helpers, verify_existing, partial_hash_match, full_hash, copy_with_retry, move_with_verify and "
+                         "append_manifest_record). "
+                         "Writes transferProfile_<ts>.txt (hot-path report) and .pstats next to the source "
+                         "transfer log. Slows the run down. Default: off")
+
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                    help=f"Number of files processed concurrently (thread pool; in batch mode shared by all "
+                         f"sources). Helps most with many small files on high-latency shares. "
+                         f"Default: {DEFAULT_WORKERS} (serial)")
+    ap.add_argument("--order", choices=ORDERS, default=DEFAULT_ORDER,
+                    help="Order in which planned files are processed: scan (as found), path (sorted by path, one "
+                         "folder at a time), largest-first, smallest-first, move-first (MOVE-category files "
+                         "first, largest first), or auto (scan order, but MOVE-category files first whenever "
+                         f"the source volume has less than --min-free-gb free). Default: {DEFAULT_ORDER}")
+    ap.add_argument("--min-free-gb", type=float, default=DEFAULT_MIN_FREE_GB,
+                    help=f"--order auto: free space (GB) on the source volume below which MOVE-category files "
+                         f"are promoted. Default: {DEFAULT_MIN_FREE_GB:g}")
+    ap.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                    help="threads: files run inline or on the --workers pool. asyncio: files run via "
+                         "asyncio.to_thread, many at a time for the cheap metadata calls, with separate limits "
+                         "for hashing and bulk copies (--async-metadata/--async-hash/--async-bulk); meant for "
+                         f"high-latency shares. Default: {DEFAULT_ENGINE}")
+    ap.add_argument("--async-metadata", type=int, default=DEFAULT_ASYNC_METADATA,
+                    help=f"--engine asyncio: files doing metadata calls (stat, exists, mkdir, rename) at once; "
+                         f"files waiting to hash or copy are not counted. Default: {DEFAULT_ASYNC_METADATA}")
+    ap.add_argument("--async-hash", type=int, default=DEFAULT_ASYNC_HASH,
+                    help=f"--engine asyncio: files hashed at once to compare an existing destination. "
+                         f"Default: {DEFAULT_ASYNC_HASH}")
+    ap.add_argument("--async-bulk", type=int, default=DEFAULT_ASYNC_BULK,
+                    help=f"--engine asyncio: copies/moves (with their verification) at once. "
+                         f"Default: {DEFAULT_ASYNC_BULK}")
+
     args = ap.parse_args()
 
-    if bool(args.target_root) == bool(args.target):
+    # Everything after argument parsing is profiled with --profile.
+    profiler = RunProfiler() if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        return _run(args, profiler)
+    finally:
+        if profiler is not None and profiler.log_path is None:
+            profiler.stop()   # stopped before a transfer started; nothing worth a report
+        elif profiler is not None:
+            try:
+                report_path, _ = profiler.write_report(
+                    profiler.log_path, title=f"serverTransfer.py {__version__} profile: {' '.join(sys.argv[1:])}")
+                print(f"Profile: {report_path}")
+            except Exception as e:
+                print(f"[WARN] Could not write the profile report ({e})")
+
+
+def _run(args, profiler: Optional[RunProfiler]) -> int:
+    if args.workers < 1:
+        print("[ERROR] --workers must be >= 1.")
+        return 2
+    if args.parallel_sources < 1:
+        print("[ERROR] --parallel-sources must be >= 1.")
+        return 2
+    if min(args.async_metadata, args.async_hash, args.async_bulk) < 1:
+        print("[ERROR] --async-metadata, --async-hash and --async-bulk must be >= 1.")
+        return 2
+    if args.manifest_flush_records < 1:
+        print("[ERROR] --manifest-flush-records must be >= 1.")
+        return 2
+    if args.console_rate < 1:
+        print("[ERROR] --console-rate must be >= 1.")
+        return 2
+    if args.streams < 1:
+        print("[ERROR] --streams must be >= 1.")
+        return 2
+    if args.progress_s < 0:
+        print("[ERROR] --progress-s must be >= 0.")
+        return 2
+    if args.snapshot_max_age_h < 0:
+        print("[ERROR] --snapshot-max-age-h must be >= 0.")
+        return 2
+    if args.sample_budget_mb * 1024 < 2 * args.sample_block_kb:
+        print("[ERROR] --sample-budget-mb must cover at least two sample blocks (head and tail).")
+        return 2
+    if args.plan and args.execute_plan:
+        print("[ERROR] Use either --plan or --execute-plan, not both.")
+        return 2
+    if args.target_root and args.target:
         print("[ERROR] Provide exactly one of --target-root or --target.")
         return 2
 
-    user_name = getpass.getuser()
+    pairs = [(source, args.target) for source in args.source]
+    if args.sources_file:
+        try:
+            pairs += read_sources_file(Path(args.sources_file))
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Cannot read --sources-file: {args.sources_file} ({e})")
+            return 2
+    if not pairs:
+        print("[ERROR] Provide a source folder or --sources-file.")
+        return 2
 
-    src_pw = PureWindowsPath(args.source)
-    src = Path(str(src_pw))
+    # Once per process: a --watch daemon keeps the same cache open across all its batches.
+    configure_hash_cache(
+        Path(args.hash_cache) if args.hash_cache else None,
+        enable=not args.no_hash_cache,
+        max_entries=args.hash_cache_max_entries,
+    )
+    if args.watch:
+        return _run_watch(args, profiler, pairs)
+    if len(pairs) == 1 and not args.sources_file:
+        if not (args.target_root or args.target):
+            print("[ERROR] Provide exactly one of --target-root or --target.")
+            return 2
+        return _run_single(args, profiler, pairs[0][0])
 
     if args.target:
-        tgt = Path(str(PureWindowsPath(args.target)))
-    else:
-        tgt_pw = compute_target_path_server(args.source, args.target_root)
-        tgt = Path(str(tgt_pw))
-
-    if not lp_exists(src):
-        print(f"[ERROR] Source does not exist: {src}")
+        print("[ERROR] --target names one destination folder; with several sources use --target-root, "
+              "or give each source its target in --sources-file.")
         return 2
-    if not lp_isdir(src):
-        print(f"[ERROR] Source is not a directory: {src}")
+    if args.plan or args.execute_plan:
+        print("[ERROR] --plan/--execute-plan work on a single source, not in batch mode.")
         return 2
+    return _run_batch(args, profiler, pairs)[0]
+
+
+def _print_settings(args, move_exts: set[str], move_keywords: list[str], include_exts: set[str]) -> None:
+    """Console header lines shared by single and batch runs."""
+    total_mb = (args.sample_blocks * args.sample_block_kb) / 1024.0
+    print(f"maxSize: {args.maxSize} GB")
+    print(f"move-ext: {sorted(move_exts) if move_exts else '<none>'}")
+    print(f"move-keyword: {move_keywords if move_keywords else '<none>'}")
+    print(f"include-ext: {sorted(include_exts) if include_exts else '<none>'}")
+    print(f"Partial-hash sampling: {args.sample_blocks} blocks x {args.sample_block_kb} KB (~{total_mb:.2f} MB/file)")
+    print(f"Retries: {args.retries} | Retry delay: {args.retry_delay_s}s")
+    print(f"Workers: {args.workers}")
+    print(f"Partial-hash cache: {_hash_cache.db_path if _hash_cache is not None else '<off>'}")
+
+
+def _transfer_source(
+    args,
+    job: SourceJob,
+    *,
+    user_name: str,
+    move_exts: set[str],
+    move_keywords: list[str],
+    include_exts: set[str],
+    log_ts: str,
+    plan_entries: Optional[List[PlanEntry]] = None,
+    pool: Optional[ThreadPoolExecutor] = None,
+    console_prefix: str = "",
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[int, int, int, int, int, int, int, int, Path, Path]:
+    return transfer_tree(
+        source_dir=job.source,
+        target_dir=job.target,
+        max_size_gb=args.maxSize,
+        move_exts=move_exts,
+        move_keywords=move_keywords,
+        include_exts=include_exts,
+        overwrite=args.overwrite,
+        dry_run=job.dry_run,
+        sample_blocks=args.sample_blocks,
+        sample_block_kb=args.sample_block_kb,
+        forced_by_lock=job.forced_by_lock,
+        lock_file=job.lock_file,
+        user_name=user_name,
+        ignore_manifest=args.ignore_manifest,
+        retries=args.retries,
+        retry_delay_s=args.retry_delay_s,
+        workers=args.workers,
+        manifest_db=args.manifest_db,
+        manifest_fsync=args.manifest_fsync,
+        manifest_flush_records=args.manifest_flush_records,
+        manifest_flush_s=args.manifest_flush_s,
+        console=args.console,
+        console_rate=args.console_rate,
+        streams=args.streams,
+        stream_min_gb=args.stream_min_gb,
+        verify=args.verify,
+        sample_strategy=args.sample_strategy,
+        sample_budget_mb=args.sample_budget_mb,
+        copy_backend=args.copy_backend,
+        large_file_io=args.large_file_io,
+        large_file_min_gb=args.large_file_min_gb,
+        full_rescan=args.full_rescan,
+        snapshot_max_age_h=args.snapshot_max_age_h,
+        plan_out=Path(args.plan) if args.plan else None,
+        plan_entries=plan_entries,
+        progress_s=args.progress_s,
+        log_ts=log_ts,
+        pool=pool,
+        console_prefix=console_prefix,
+        cancel=cancel,
+        engine=args.engine,
+        async_metadata=args.async_metadata,
+        async_hash=args.async_hash,
+        async_bulk=args.async_bulk,
+        order=args.order,
+        min_free_gb=args.min_free_gb,
+    )
+
+
+def _run_single(args, profiler: Optional[RunProfiler], source: str) -> int:
+    user_name = getpass.getuser()
+    if args.plan:
+        args.dry_run = True
 
-    # Safety: forbid same path / nesting in either direction
     try:
-        validate_source_target_relationship(src, tgt)
+        job = prepare_source(source, args.target, args.target_root, dry_run=args.dry_run)
     except ValueError as e:
         print(f"[ERROR] {e}")
         return 2
+    src, tgt = job.source, job.target
 
-    # Lock check (optional, re-uses the same lock filename on the target root).
-    # With an explicit --target, the target folder itself is the lock-check location.
-    target_root_path = tgt if args.target else Path(str(normalize_target_root(args.target_root)))
-    lock_file = target_root_path / LOCK_FILENAME
-    forced_by_lock = False
-    if lp_exists(lock_file):
-        forced_by_lock = True
-        args.dry_run = True
-        print(f"[LOCK] Found lock file: {lock_file}")
+    plan_entries = None
+    if args.execute_plan:
+        try:
+            plan_doc = load_plan_file(Path(args.execute_plan))
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Cannot read plan: {args.execute_plan} ({e})")
+            return 2
+        if (plan_doc["source"], plan_doc["target"]) != (str(src), str(tgt)):
+            print(f"[ERROR] Plan was written for {plan_doc['source']} -> {plan_doc['target']}, not {src} -> {tgt}")
+            return 2
+        plan_settings = plan_doc["settings"]
+        if (args.overwrite, args.verify) != (plan_settings["overwrite"], plan_settings["verify"]):
+            print(f"NOTE: using the plan's settings (overwrite: {plan_settings['overwrite']}, "
+                  f"verify: {plan_settings['verify']})")
+        args.overwrite = plan_settings["overwrite"]
+        args.verify = plan_settings["verify"]
+        plan_entries = plan_entries_to_execute(plan_doc)
+
+    if job.forced_by_lock:
+        print(f"[LOCK] Found lock file: {job.lock_file}")
         print("[LOCK] Target root is locked (transfer in progress).")
         print("[LOCK] No data will be copied/moved/deleted. Running in DRY RUN mode.\n")
 
@@ -1186,42 +5246,30 @@ def main() -> int:
     include_exts = normalize_exts(args.include_ext)
     move_keywords = normalize_keywords(args.move_keyword)
 
-    total_mb = (args.sample_blocks * args.sample_block_kb) / 1024.0
-
     print(f"User: {user_name}")
     print(f"Source: {src}")
-    print(f"Target root: {args.target_root if args.target_root else '<explicit --target>'}")
+    print(f"Target root: {job.target_root}")
     print(f"Target: {tgt}")
-    print(f"Mode: {'DRY RUN' if args.dry_run else 'LIVE'} | Overwrite: {args.overwrite}")
-    if forced_by_lock:
+    print(f"Mode: {'DRY RUN' if job.dry_run else 'LIVE'} | Overwrite: {args.overwrite}")
+    if job.forced_by_lock:
         print(f"NOTE: DRY RUN was forced due to {LOCK_FILENAME} in target root")
-    print(f"maxSize: {args.maxSize} GB")
-    print(f"move-ext: {sorted(move_exts) if move_exts else '<none>'}")
-    print(f"move-keyword: {move_keywords if move_keywords else '<none>'}")
-    print(f"include-ext: {sorted(include_exts) if include_exts else '<none>'}")
-    print(f"Partial-hash sampling: {args.sample_blocks} blocks x {args.sample_block_kb} KB (~{total_mb:.2f} MB/file)")
-    print(f"Retries: {args.retries} | Retry delay: {args.retry_delay_s}s")
+    _print_settings(args, move_exts, move_keywords, include_exts)
     print(f"Manifest: {manifest_path(src)} ({'ignored' if args.ignore_manifest else 'active'})")
     print("-" * 110)
 
+    log_ts = timestamp_for_log()
+    if profiler is not None:
+        profiler.log_path = src / default_log_filename(log_ts)
+
     (copied, moved, deleted_src, skipped_manifest, skipped_existing,
-     mismatched, suspected_truncated, errors, src_log_path, tgt_log_path) = transfer_tree(
-        source_dir=src,
-        target_dir=tgt,
-        max_size_gb=args.maxSize,
+     mismatched, suspected_truncated, errors, src_log_path, tgt_log_path) = _transfer_source(
+        args, job,
+        user_name=user_name,
         move_exts=move_exts,
         move_keywords=move_keywords,
         include_exts=include_exts,
-        overwrite=args.overwrite,
-        dry_run=args.dry_run,
-        sample_blocks=args.sample_blocks,
-        sample_block_kb=args.sample_block_kb,
-        forced_by_lock=forced_by_lock,
-        lock_file=lock_file,
-        user_name=user_name,
-        ignore_manifest=args.ignore_manifest,
-        retries=args.retries,
-        retry_delay_s=args.retry_delay_s,
+        log_ts=log_ts,
+        plan_entries=plan_entries,
     )
 
     print("-" * 110)
@@ -1234,13 +5282,206 @@ def main() -> int:
         print(f"{suspected_truncated} of those mismatch(es) look like truncated transfers (all-zero tail) - review recommended.")
     print(f"Source log: {src_log_path}")
     print(f"Target log: {tgt_log_path} (may not exist in dry-run if target folder doesn't exist)")
+    print(f"Run summary: {summary_path_for_log(src_log_path)}")
     print(f"Manifest: {manifest_path(src)}")
+    if args.plan:
+        print(f"Plan written: {args.plan}")
 
     # If we were blocked by lock, return a distinct code (useful for automation)
-    if forced_by_lock:
+    if job.forced_by_lock:
         return 3
     return 0 if errors == 0 else 1
 
 
+def _run_batch(args, profiler: Optional[RunProfiler],
+               pairs: List[Tuple[str, Optional[str]]]) -> Tuple[int, List[dict]]:
+    """Transfer every source of `pairs`; returns the batch exit code and the per-source results."""
+    user_name = getpass.getuser()
+    n = len(pairs)
+    move_exts = normalize_exts(args.move_ext)
+    include_exts = normalize_exts(args.include_ext)
+    move_keywords = normalize_keywords(args.move_keyword)
+
+    print(f"User: {user_name}")
+    print(f"Batch: {n} source(s) | Target root: {args.target_root or '<per-source target>'} | "
+          f"Parallel sources: {args.parallel_sources}")
+    print(f"Mode: {'DRY RUN' if args.dry_run else 'LIVE'} | Overwrite: {args.overwrite}")
+    _print_settings(args, move_exts, move_keywords, include_exts)
+    print("-" * 110)
+
+    # Per source: SourceJob, or the reason it can't run (exit code 2, the batch goes on).
+    jobs: List[Optional[SourceJob]] = []
+    results: List[dict] = []
+    for i, (source, target) in enumerate(pairs, 1):
+        try:
+            job = prepare_source(source, target, args.target_root, dry_run=args.dry_run)
+            for other in jobs:
+                # Two runs on the same or nested sources would move files out from under each other.
+                if other is not None:
+                    try:
+                        validate_source_target_relationship(job.source, other.source)
+                    except ValueError:
+                        raise ValueError(f"Source overlaps another source of this batch ({other.source})")
+        except ValueError as e:
+            print(f"[{i}/{n}] [ERROR] {e}")
+            jobs.append(None)
+            results.append({"source": source, "target": target, "status": "invalid", "exit_code": 2,
+                            "error": str(e)})
+            continue
+        lock_note = f" | [LOCK] {job.lock_file} found, DRY RUN" if job.forced_by_lock else ""
+        print(f"[{i}/{n}] {job.source} -> {job.target}{lock_note}")
+        jobs.append(job)
+        results.append({"source": str(job.source), "target": str(job.target), "status": "not started",
+                        "exit_code": None, "forced_by_lock": job.forced_by_lock})
+    print("-" * 110)
+
+    batch_ts = timestamp_for_log()
+    summary_path = Path(args.batch_summary) if args.batch_summary else Path(f"transferBatch_{batch_ts}.json")
+    if profiler is not None:
+        profiler.log_path = summary_path.with_name(default_log_filename(batch_ts))
+
+    cancel = threading.Event()
+    file_pool = (ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="transfer")
+                 if args.workers > 1 and args.engine == "threads" else None)
+
+    def run_job(i: int, job: SourceJob) -> None:
+        result = results[i - 1]
+        result["status"] = "running"
+        try:
+            counts = _transfer_source(
+                args, job,
+                user_name=user_name,
+                move_exts=move_exts,
+                move_keywords=move_keywords,
+                include_exts=include_exts,
+                log_ts=batch_ts,
+                pool=file_pool,
+                console_prefix=f"[{i}/{n}] ",
+                cancel=cancel,
+            )
+        except KeyboardInterrupt:
+            result["status"] = "interrupted"
+            return
+        except Exception as e:
+            # One broken source (share gone, permissions) must not take the rest of the batch down.
+            print(f"[{i}/{n}] [ERROR] Transfer failed: {e}")
+            result.update(status="failed", exit_code=1, error=str(e))
+            return
+        result["counts"] = dict(zip(RESULT_COUNTS, counts[:len(RESULT_COUNTS)]))
+        result["logs"] = [str(counts[-2]), str(counts[-1])]
+        result["run_summary"] = str(summary_path_for_log(counts[-2]))
+        result["status"] = "completed"
+        result["exit_code"] = 3 if job.forced_by_lock else (0 if result["counts"]["errors"] == 0 else 1)
+
+    started = datetime.now()
+    t0 = time.monotonic()
+    status = "interrupted"
+    try:
+        todo = [(i, job) for i, job in enumerate(jobs, 1) if job is not None]
+        if args.parallel_sources == 1:
+            # Sources one after the other on the main thread, so Ctrl-C behaves as in a single run.
+            for i, job in todo:
+                run_job(i, job)
+                if results[i - 1]["status"] == "interrupted":
+                    raise KeyboardInterrupt
+        else:
+            with ThreadPoolExecutor(max_workers=args.parallel_sources, thread_name_prefix="source") as source_pool:
+                futures = [source_pool.submit(run_job, i, job) for i, job in todo]
+                try:
+                    for fut in as_completed(futures):
+                        fut.result()
+                except KeyboardInterrupt:
+                    # Running sources stop before their next file; sources not started are dropped.
+                    cancel.set()
+                    for fut in futures:
+                        fut.cancel()
+                    raise
+        status = "completed"
+    finally:
+        if file_pool is not None:
+            file_pool.shutdown(wait=True, cancel_futures=True)
+        codes = [r["exit_code"] for r in results]
+        exit_code = batch_exit_code(codes)
+        summary = {
+            "tool": f"serverTransfer.py {__version__}",
+            "status": status,
+            "started": started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "user": user_name,
+            "dry_run": args.dry_run,
+            "parallel_sources": args.parallel_sources,
+            "workers": args.workers,
+            "wall_s": round(time.monotonic() - t0, 3),
+            "exit_code": exit_code if status == "completed" else None,
+            "totals": {k: sum(r.get("counts", {}).get(k, 0) for r in results) for k in RESULT_COUNTS},
+            "sources": results,
+        }
+        try:
+            with lp_open(summary_path, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=1)
+        except OSError as e:
+            print(f"[WARN] Batch summary not written: {summary_path} ({e})")
+
+    print("-" * 110)
+    print(f"Batch done: {n} source(s) in {format_duration(summary['wall_s'])} | "
+          + " | ".join(f"{label}: {codes.count(code)}"
+                       for label, code in (("OK", 0), ("Errors", 1), ("Not run", 2), ("Locked", 3))))
+    for i, r in enumerate(results, 1):
+        c = r.get("counts")
+        detail = (f"Copied: {c['copied']} | Moved: {c['moved']} | Deleted-src: {c['deleted_src']} | "
+                  f"Skipped(manifest): {c['skipped_manifest']} | Mismatched: {c['mismatched']} | "
+                  f"Errors: {c['errors']}") if c else r.get("error", r["status"])
+        print(f"[{i}/{n}] exit {r['exit_code']} | {detail} | {r['source']}")
+    print(f"Batch summary: {summary_path}")
+    return exit_code, results
+
+
+def _run_watch(args, profiler: Optional[RunProfiler], pairs: List[Tuple[str, Optional[str]]]) -> int:
+    if not args.target_root or args.target or any(target for _, target in pairs):
+        print("[ERROR] --watch maps every session under --target-root; --target and per-source targets "
+              "are not supported.")
+        return 2
+    if args.plan or args.execute_plan:
+        print("[ERROR] --plan/--execute-plan can't be combined with --watch.")
+        return 2
+    if args.watch_depth < 1 or args.watch_interval_s <= 0 or args.quiet_s < 0:
+        print("[ERROR] --watch-depth must be >= 1, --watch-interval-s > 0 and --quiet-s >= 0.")
+        return 2
+
+    watchers = []
+    for source, _ in pairs:
+        root = Path(source)
+        if not lp_isdir(root):
+            print(f"[ERROR] Watch root is not a directory: {root}")
+            return 2
+        watcher = SessionWatcher(root, target_root=args.target_root, depth=args.watch_depth, quiet_s=args.quiet_s)
+        watcher.load()
+        watchers.append(watcher)
+
+    print(f"[WATCH] Watching {len(watchers)} root(s) every {args.watch_interval_s:g}s: sessions are the folders "
+          f"{args.watch_depth} level(s) down, transferred to {args.target_root} after {args.quiet_s:g}s "
+          f"without changes. Ctrl-C stops.")
+    for watcher in watchers:
+        print(f"[WATCH] {watcher.root} ({len(watcher.sessions)} session(s) known from {watcher.path})")
+    try:
+        while True:
+            now = time.time()
+            ready = [(watcher, session) for watcher in watchers for session in watcher.poll(now)]
+            if ready:
+                print(f"[WATCH] {len(ready)} quiet session(s) to transfer")
+                _, results = _run_batch(args, profiler, [(str(session), None) for _, session in ready])
+                done = time.time()
+                for (watcher, session), result in zip(ready, results):
+                    watcher.mark_done(session, result["exit_code"], done)
+            for watcher in watchers:
+                watcher.save()
+            time.sleep(args.watch_interval_s)
+    except KeyboardInterrupt:
+        for watcher in watchers:
+            watcher.save()
+        print("[WATCH] Stopped.")
+        return 0
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -164,26 +164,105 @@ inline log lines that are easy to miss in a long transfer log. Added "Mismatched
 call-to-action line whenever either count is nonzero. Ported from serverTransfer.py 1.1.0. MINOR,
 not PATCH: changes the fixed set of fields present in the summary line on every run - see that
 changelog entry for the rationale.
+1.1.1 (2026-10-18): Added DestDirCache (ported from serverTransfer.py 1.3.1). transfer_tree() used to call
+ensure_dir() - a filesystem existence check - for every walked directory, each of its subdirectories
+and again before every file, plus separate exists()/stat() calls per file on the destination. Each
+target directory is now listed once with os.scandir() into a {name: (size, mtime)} map and directories
+that exist (or that this run created) are remembered, so those checks and the lazy mkdirs become
+dictionary lookups - roughly one listing per directory instead of ~4 metadata calls per file.
+partial_hash_match()/partial_hash()/has_all_zero_tail() accept already-known sizes, as in serverTransfer.
+In dry-run, a folder that would be created is now logged as [MKDIR] once.
+1.2.0 (2026-10-18): Optional SQLite manifest (--manifest-db), ported from serverTransfer.py 1.6.0:
+.tape_transfer/manifest.sqlite, indexed on (relpath, target_root), batched inserts in WAL mode, one-time
+(incremental) import of the existing manifest.ndjson. The database stands in for the in-memory index,
+so manifest_has_entry() is an indexed query per file instead of re-parsing the full NDJSON history on
+every start. Once manifest.sqlite exists it is used automatically - also by append_manifest_record()
+and by tapeTransferOrphanCleanup.py, which now queries it directly.
+1.3.0 (2026-10-18): Group-commit manifest writes (ManifestWriter), ported from serverTransfer.py 1.7.0:
+records are buffered and written every --manifest-flush-records records or --manifest-flush-s seconds
+through one open handle, with --manifest-fsync none/batch/every, and flushed on exit and Ctrl-C. A crash
+loses at most one group; those files are re-verified against TAPE_TRANSFER on the next run.
+1.4.0 (2026-10-18): Background, batched transfer logging (TransferLogger), ported from serverTransfer.py
+1.8.0: log files are written by one writer thread through a bounded queue instead of a synchronous
+write + flush to both logs per line; per-file lines are flushed every few seconds, [INFO]/[WARN]/[ERROR]
+lines right away. --console all/rate/quiet (with --console-rate) controls per-file console output.
+1.5.0 (2026-10-18): Concurrent sampled-block reads in partial_hash()/partial_hash_match(), ported from
+serverTransfer.py 1.11.0: the 16 sampled blocks of both files are read at the same time (os.pread from a
+small thread pool where available) instead of ~32 sequential round trips; blocks are still hashed in
+sorted offset order, so digests are unchanged.
+1.6.0 (2026-10-18): Selectable verification tiers, --verify {size,sample,full}, ported from
+serverTransfer.py 1.12.0. One tier then applies to existing MOVE-category destinations before the source
+is deleted, to move_with_verify()'s cross-volume fallback, and to plain COPYs (which are otherwise not
+verified at all). The full tier hashes source and destination in parallel. Without --verify, behavior is
+unchanged.
+1.7.0 (2026-10-18): Size-adaptive stratified partial-hash sampling, --sample-strategy stratified (with
+--sample-budget-mb), ported from serverTransfer.py 1.13.0. It always takes the first and last block, plus
+one block per 1 GB region, within a per-file read budget. It stays deterministic per relpath and size, and
+the default stays random.
+1.8.0 (2026-10-18): Kernel copy paths on Linux (--copy-backend, default auto), ported from serverTransfer.py
+1.14.0. Copies, and the cross-volume fallback in move_with_verify(), try a FICLONE reflink first. Since
+TAPE_TRANSFER sits on the source volume, on btrfs/XFS that stages a file without copying data or using
+extra space. After that they try copy_file_range, then sendfile, then shutil.copy2 as before. Each
+[COPY]/[MOVE] line says which path was taken, and the summary counts them.
+1.9.0 (2026-10-18): Incremental scan, ported from serverTransfer.py 1.16.0. Directories whose files were
+all already covered by the manifest are recorded in .tape_transfer/dir_snapshot.json, and later runs don't
+list them while their mtime is unchanged (walk_source() replaces os.walk()). --full-rescan (also implied by
+--overwrite) lists everything and flags files rewritten in place.
+1.10.0 (2026-10-18): --profile, ported from serverTransfer.py 1.19.0: cProfile over all threads plus call
+counts and wall-clock times of partial_hash, full_hash, copy_file, move_with_verify, append_manifest_record
+and the stat/listing helpers. transferProfile_<ts>.txt and .pstats are written next to the source transfer
+log, and are never staged themselves.
+1.10.1 (2026-10-18): Fix: partial_hash_match() no longer leaks the source's file handle when starting the
+destination's read fails (destination vanished, access denied). The source reads are always collected
+first.
+1.10.2 (2026-10-18): Fix: the source is parsed as a platform path (PurePath) instead of always as a
+Windows path, so the tool runs on Linux, where the kernel copy paths of 1.8.0 apply. There, TAPE_TRANSFER
+is created at the mount point holding the source (the Linux counterpart of the drive or share root),
+keeping moves on one volume.
+1.10.3 (2026-10-18): Fix: KERNEL_COPY_FALLBACK_ERRNOS is limited to "not supported" errnos (EXDEV, EINVAL,
+ENOSYS, EOPNOTSUPP, ENOTTY), as in serverTransfer.py 1.24.4. EPERM and EBADF are real errors and are now
+raised instead of falling through to the next copy method.
+1.10.4 (2026-10-18): Fix: --snapshot-max-age-h (default 24), as in serverTransfer.py 1.24.6. An unchanged
+directory is only skipped if the snapshot listed it within that many hours. So a file rewritten in place,
+which leaves its directory's mtime alone, is staged again within that time instead of never.
+1.10.5 (2026-10-18): Fix: --profile times verify_existing and partial_hash_match instead of partial_hash,
+which partial_hash_match() no longer calls, so sampled hash verification shows up in the call-timer table.
 """
 
 from __future__ import annotations
 
-__version__ = "1.1.0"
+__version__ = "1.10.5"
 __author__  = "Simon Musall"
 __email__   = "s.musall@fz-juelich.de"
 
 import argparse
+import cProfile
+import errno
+import functools
 import getpass
 import hashlib
+import io
 import json
 import os
+import pstats
+import queue
 import random
 import re
 import shutil
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from pathlib import PureWindowsPath, Path
+from pathlib import PurePath, Path
 from typing import Dict, Iterable, Optional, Tuple
 
+try:
+    import fcntl  # POSIX only; used for FICLONE reflinks
+except ImportError:
+    fcntl = None
+
 
 # Default partial-hash sampling (~1 MB total)
 DEFAULT_SAMPLE_BLOCKS = 16
@@ -223,29 +302,43 @@ def normalize_unc_root(path_str: str) -> str:
 # ----------------------------
 # Path mapping
 # ----------------------------
-def compute_target_path(source: str) -> PureWindowsPath:
-    p = PureWindowsPath(source)
+# Paths are parsed with PurePath: Windows paths (drive letters, UNC shares) on Windows,
+# POSIX paths elsewhere. Off Windows a volume's "root" is the mount point holding the
+# source rather than "/", so TAPE_TRANSFER stays on the source's filesystem there too.
+def _mount_point(path: Path) -> Path:
+    path = Path(os.path.abspath(path))
+    while not os.path.ismount(path) and path != path.parent:
+        path = path.parent
+    return path
+
+
+def compute_target_path(source: str) -> PurePath:
+    p = PurePath(source)
     parts = list(p.parts)
     if not parts:
         raise ValueError("Empty source path.")
 
+    if os.name != "nt":
+        mount = _mount_point(Path(source))
+        return PurePath(mount, "TAPE_TRANSFER", Path(os.path.abspath(source)).relative_to(mount))
+
     # Rule 1: O:\Massive Data Imaging\...
     if len(parts) >= 2 and parts[0].lower() == "o:\\" and parts[1].lower() == "massive data imaging":
-        return PureWindowsPath(parts[0], parts[1], "TAPE_TRANSFER", *parts[2:])
+        return PurePath(parts[0], parts[1], "TAPE_TRANSFER", *parts[2:])
 
     # Rule 2: insert right after the root (drive root or UNC share root)
-    return PureWindowsPath(parts[0], "TAPE_TRANSFER", *parts[1:])
+    return PurePath(parts[0], "TAPE_TRANSFER", *parts[1:])
 
 
-def path_contains_tape_transfer(p: PureWindowsPath) -> bool:
+def path_contains_tape_transfer(p: PurePath) -> bool:
     return any(part.lower() == "tape_transfer" for part in p.parts)
 
 
 def tape_transfer_root(p: Path) -> Path:
-    parts = list(PureWindowsPath(str(p)).parts)
+    parts = list(p.parts)
     for i, part in enumerate(parts):
         if part.lower() == "tape_transfer":
-            return Path(str(PureWindowsPath(*parts[: i + 1])))
+            return Path(*parts[: i + 1])
     return p
 
 
@@ -355,6 +448,92 @@ def safe_stat_size_mtime(p: Path) -> Tuple[Optional[int], Optional[float]]:
         return None, None
 
 
+def list_dir_file_stats(dir_path: Path) -> Optional[Dict[str, Tuple[int, float]]]:
+    """
+    One scandir() listing of dir_path: {file name: (size, mtime)} for the
+    regular files in it, or None if the directory does not exist.
+    """
+    out: Dict[str, Tuple[int, float]] = {}
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        out[entry.name] = (st.st_size, st.st_mtime)
+                except OSError:
+                    continue
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return out
+
+
+class DestDirCache:
+    """
+    Per-run cache of destination directory state, so every destination lookup
+    and every ensure_dir() is a dictionary lookup instead of a filesystem call.
+    Ported from serverTransfer.py 1.3.1.
+
+    Each destination directory is listed at most once into a {name: (size,
+    mtime)} map; a directory whose listing succeeded, or that this run created,
+    is remembered as existing. transfer_tree() keeps the cache in step with its
+    own changes (note_file()/forget_file()), so it never needs to re-list.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._listings: Dict[Path, Optional[Dict[str, Tuple[int, float]]]] = {}
+        self._known_dirs: set[Path] = set()
+
+    def _listing(self, dir_path: Path) -> Optional[Dict[str, Tuple[int, float]]]:
+        with self._lock:
+            if dir_path in self._listings:
+                return self._listings[dir_path]
+        listing = list_dir_file_stats(dir_path)
+        with self._lock:
+            return self._listings.setdefault(dir_path, listing)
+
+    def files(self, dir_path: Path) -> Dict[str, Tuple[int, float]]:
+        """{name: (size, mtime)} of the files in dir_path ({} if it does not exist)."""
+        return self._listing(dir_path) or {}
+
+    def lookup(self, file_path: Path) -> Optional[Tuple[int, float]]:
+        """(size, mtime) of file_path, or None if it does not exist."""
+        return self.files(file_path.parent).get(file_path.name)
+
+    def dir_exists(self, dir_path: Path) -> bool:
+        with self._lock:
+            if dir_path in self._known_dirs:
+                return True
+        return self._listing(dir_path) is not None
+
+    def ensure_dir(self, dir_path: Path, dry_run: bool, logf) -> None:
+        """Cached equivalent of ensure_dir(): creates dir_path (and parents) on first use only."""
+        if self.dir_exists(dir_path):
+            return
+        with self._lock:
+            if dir_path in self._known_dirs:
+                return
+            if not dry_run:
+                dir_path.mkdir(parents=True, exist_ok=True)
+            # In dry-run the folder is only "created" in the cache, so [MKDIR] is logged once.
+            self._known_dirs.update((dir_path, *dir_path.parents))
+            self._listings[dir_path] = {}
+        logf(f"[MKDIR] {dir_path}")
+
+    def note_file(self, file_path: Path, size: int, mtime: float) -> None:
+        with self._lock:
+            listing = self._listings.get(file_path.parent)
+            if listing is not None:
+                listing[file_path.name] = (size, mtime)
+
+    def forget_file(self, file_path: Path) -> None:
+        with self._lock:
+            listing = self._listings.get(file_path.parent)
+            if listing is not None:
+                listing.pop(file_path.name, None)
+
+
 def same_file_size_and_mtime(src: Path, dst: Path, mtime_tolerance_s: float = 2.0) -> bool:
     if not dst.exists():
         return False
@@ -370,6 +549,18 @@ def same_file_size_and_mtime(src: Path, dst: Path, mtime_tolerance_s: float = 2.
 # ----------------------------
 # Move/copy decision
 # ----------------------------
+# Files this tool writes into the source folder itself; never transferred.
+CONTROL_FILES = (
+    ("transferLog_", ".log"),
+    ("transferProfile_", ".txt"),
+    ("transferProfile_", ".pstats"),
+)
+
+
+def is_control_file(fname: str) -> bool:
+    return any(fname.startswith(prefix) and fname.endswith(suffix) for prefix, suffix in CONTROL_FILES)
+
+
 def should_process_by_include_ext(src_file: Path, include_exts: set[str]) -> bool:
     if not include_exts:
         return True
@@ -394,6 +585,172 @@ def should_move(
     return False
 
 
+# ----------------------------
+# Incremental scan (directory snapshot)
+# ----------------------------
+# Ported from serverTransfer.py 1.16.0. A source directory whose files were all already
+# covered by the manifest (all [SKIP-MANIFEST]) is recorded in
+# .tape_transfer/dir_snapshot.json (mtime, entry count, digest of its files' size/mtime,
+# subdirectory names). On the next run it is not listed if its mtime is unchanged - only
+# its subdirectories are stat'ed and walked - and its files count as Skipped(manifest).
+# Files rewritten in place don't change a directory's mtime, so a directory is only
+# skipped if it was really listed within --snapshot-max-age-h hours (default 24); older
+# entries are listed again and such directories reported. --full-rescan lists
+# everything. Kept per settings fingerprint (target root, --include-ext, move rules).
+DIR_SNAPSHOT_NAME = "dir_snapshot.json"
+DEFAULT_SNAPSHOT_MAX_AGE_H = 24.0
+
+
+def dir_snapshot_path(source_root: Path) -> Path:
+    return manifest_dir(source_root) / DIR_SNAPSHOT_NAME
+
+
+def snapshot_fingerprint(target_dir: Path, include_exts: set[str], max_bytes: int,
+                         move_exts: set[str], move_keywords: list[str]) -> str:
+    settings = [str(target_dir), sorted(include_exts), int(max_bytes), sorted(move_exts), list(move_keywords)]
+    return hashlib.blake2b(json.dumps(settings).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def files_digest(files: list) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for name, stat in sorted(files, key=lambda f: f[0]):
+        h.update(f"{name}\0{stat}\n".encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+class DirSnapshot:
+    """
+    dir_snapshot.json entries of one settings fingerprint: {relative dir:
+    {"mtime", "entries", "digest", "subdirs", "covered", "listed"}} from the last
+    run, and the entries this run will save. use_for_skip=False (--full-rescan,
+    --overwrite) skips nothing but still refreshes the snapshot; entries listed
+    more than max_age_s ago are not skipped either.
+    """
+
+    def __init__(self, path: Path, fingerprint: str, previous: Dict[str, dict], *, use_for_skip: bool,
+                 max_age_s: float = DEFAULT_SNAPSHOT_MAX_AGE_H * 3600) -> None:
+        self.path = path
+        self.fingerprint = fingerprint
+        self.previous = previous
+        self.use_for_skip = use_for_skip
+        self.max_age_s = max_age_s
+        self.now = time.time()
+        self._current: Dict[str, dict] = {}
+        self.skipped_dirs = 0
+        self.skipped_files = 0
+        self.stale_dirs = 0
+        self.expired_dirs = 0
+
+    @classmethod
+    def load(cls, source_root: Path, fingerprint: str, *, use_for_skip: bool,
+             max_age_s: float = DEFAULT_SNAPSHOT_MAX_AGE_H * 3600, logf) -> "DirSnapshot":
+        path = dir_snapshot_path(source_root)
+        previous: Dict[str, dict] = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("snapshots", {}).get(fingerprint, {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logf(f"[SNAPSHOT][WARN] Unreadable directory snapshot, doing a full scan: {path} ({e})")
+        return cls(path, fingerprint, previous, use_for_skip=use_for_skip, max_age_s=max_age_s)
+
+    def unchanged(self, rel_dir: str, dir_mtime: Optional[float]) -> Optional[dict]:
+        """The previous entry of rel_dir if it can be skipped (carried over into this run's snapshot)."""
+        prev = self.previous.get(rel_dir)
+        if not self.use_for_skip or prev is None or dir_mtime is None or prev["mtime"] != dir_mtime:
+            return None
+        if self.now - prev.get("listed", 0.0) >= self.max_age_s:
+            self.expired_dirs += 1
+            return None
+        self._current[rel_dir] = prev
+        self.skipped_dirs += 1
+        self.skipped_files += prev["covered"]
+        return prev
+
+    def observe(self, rel_dir: str, dir_mtime: Optional[float], n_entries: int, files: list,
+                subdirs: list, logf, *, covered: bool) -> None:
+        """
+        A listed directory and its candidate `files` ((name, (size, mtime))); recorded
+        only if all of them were covered by the manifest.
+        """
+        if dir_mtime is None:
+            return
+        digest = files_digest(files)
+        prev = self.previous.get(rel_dir)
+        if prev is not None and prev["mtime"] == dir_mtime and prev["digest"] != digest:
+            self.stale_dirs += 1
+            logf(f"[SNAPSHOT][WARN] Files changed without a directory mtime change: {rel_dir} "
+                 f"(missed by runs that skipped it as unchanged)")
+        if covered:
+            self._current[rel_dir] = {"mtime": dir_mtime, "entries": n_entries, "digest": digest,
+                                      "subdirs": list(subdirs), "covered": len(files), "listed": self.now}
+
+    def save(self, logf) -> None:
+        try:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                data = {}
+            data["version"] = 1
+            data.setdefault("snapshots", {})[self.fingerprint] = self._current
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logf(f"[SNAPSHOT][WARN] Could not save directory snapshot: {self.path} ({e})")
+
+
+def _dir_mtime(path: Path, entry: Optional[os.DirEntry] = None) -> Optional[float]:
+    try:
+        return (entry.stat() if entry is not None else path.stat()).st_mtime
+    except OSError:
+        return None
+
+
+def walk_source(source_dir: Path, snapshot: Optional[DirSnapshot], logf):
+    """
+    os.walk(source_dir) (top-down, same order), yielding (root_path, dirs, files,
+    dir_mtime, skipped): directories the snapshot reports unchanged are not
+    listed and come back with skipped=True, no files and their remembered
+    subdirectories.
+    """
+    stack = [(source_dir, _dir_mtime(source_dir) if snapshot else None)]
+    while stack:
+        root_path, dir_mtime = stack.pop()
+        prev = None
+        if snapshot is not None:
+            prev = snapshot.unchanged(root_path.relative_to(source_dir).as_posix(), dir_mtime)
+        if prev is not None:
+            logf(f"[SNAPSHOT] Unchanged, {prev['covered']} file(s) covered by manifest: {root_path}")
+            subdirs = [(root_path / name, _dir_mtime(root_path / name)) for name in prev["subdirs"]]
+            yield root_path, list(prev["subdirs"]), [], dir_mtime, True
+        else:
+            dirs: list = []
+            files: list = []
+            subdirs = []
+            try:
+                with os.scandir(root_path) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if is_dir:
+                            dirs.append(entry.name)
+                            if not entry.is_symlink():
+                                subdirs.append((root_path / entry.name, _dir_mtime(None, entry) if snapshot else None))
+                        else:
+                            files.append(entry.name)
+            except OSError:
+                continue  # like os.walk(): unlistable directories are skipped silently
+            yield root_path, dirs, files, dir_mtime, False
+        stack.extend(reversed(subdirs))
+
+
 # ----------------------------
 # Partial hashing for safety
 # ----------------------------
@@ -405,26 +762,27 @@ def deterministic_seed(rel_path_str: str, size_bytes: int) -> int:
     return int.from_bytes(h.digest(), byteorder="big", signed=False)
 
 
-def partial_hash(file_path: Path, rel_path_str: str, *, blocks: int, block_size: int) -> str:
-    size, _ = safe_stat_size_mtime(file_path)
-    if size is None:
-        raise OSError(f"Cannot stat {file_path}")
+# Ported from serverTransfer.py 1.11.0. Sampled blocks are read concurrently (a small
+# shared thread pool; os.pread on one
+# descriptor where available, otherwise one handle per stripe of offsets on
+# Windows), since on SMB each block is a full round trip. The blocks are still hashed in sorted
+# offset order, so digests are identical to the sequential version.
+SAMPLE_READ_THREADS = 16
 
-    total_sample = blocks * block_size
-    h = hashlib.blake2b(digest_size=32)
-    h.update(str(size).encode("ascii"))
-    h.update(b"|")
+_sample_pool: Optional[ThreadPoolExecutor] = None
+_sample_pool_lock = threading.Lock()
 
-    # Small file: hash full content
-    if size <= total_sample or size <= block_size:
-        with open(file_path, "rb") as f:
-            while True:
-                chunk = f.read(1024 * 1024)
-                if not chunk:
-                    break
-                h.update(chunk)
-        return h.hexdigest()
 
+def _sample_read_pool() -> ThreadPoolExecutor:
+    global _sample_pool
+    with _sample_pool_lock:
+        if _sample_pool is None:
+            _sample_pool = ThreadPoolExecutor(max_workers=SAMPLE_READ_THREADS, thread_name_prefix="sample-read")
+        return _sample_pool
+
+
+def _sample_offsets(rel_path_str: str, size: int, blocks: int, block_size: int) -> list:
+    """Sorted, deterministic (per relpath + size) block offsets for a file larger than the sample."""
     rng = random.Random(deterministic_seed(rel_path_str, size))
     max_start = size - block_size
 
@@ -444,18 +802,156 @@ def partial_hash(file_path: Path, rel_path_str: str, *, blocks: int, block_size:
         for i in range(blocks):
             offsets.add(min(i * step, max_start))
 
-    with open(file_path, "rb") as f:
-        for off in sorted(offsets):
-            f.seek(off)
-            h.update(f.read(block_size))
+    return sorted(offsets)
 
-    return h.hexdigest()
+
+# Sampling strategies, ported from serverTransfer.py 1.13.0 (same sampler strings, so
+# digests agree between the two tools):
+#   random              - `blocks` random 4 KB-aligned blocks anywhere in the file
+#   stratified/<N>M     - first and last block, plus one random 4 KB-aligned block per
+#                         STRATIFIED_REGION_BYTES region; at least `blocks`, at most N MB
+SAMPLE_STRATEGIES = ("random", "stratified")
+DEFAULT_SAMPLE_STRATEGY = "random"
+SAMPLER_RANDOM = "random"
+STRATIFIED_REGION_BYTES = 1024**3
+DEFAULT_SAMPLE_BUDGET_MB = 32
+
+
+def make_sampler(strategy: str, budget_mb: int = DEFAULT_SAMPLE_BUDGET_MB) -> str:
+    if strategy == "random":
+        return SAMPLER_RANDOM
+    if strategy == "stratified":
+        return f"stratified/{int(budget_mb)}M"
+    raise ValueError(f"Unknown sampling strategy: {strategy}")
+
+
+def _stratified_offsets(rel_path_str: str, size: int, blocks: int, block_size: int, budget_bytes: int) -> list:
+    max_start = size - block_size
+    n = max(blocks, -(-size // STRATIFIED_REGION_BYTES))
+    n = max(2, min(n, budget_bytes // block_size))
+    rng = random.Random(deterministic_seed(rel_path_str, size))
+
+    offsets = {0, max_start}
+    strata = n - 2
+    for i in range(strata):
+        lo = (max_start * i) // strata
+        hi = (max_start * (i + 1)) // strata
+        off = rng.randint(lo, max(lo, hi - 1))
+        offsets.add(min((off // 4096) * 4096, max_start))
+    return sorted(offsets)
+
+
+def _sampler_offsets(sampler: str, rel_path_str: str, size: int, blocks: int, block_size: int) -> list:
+    if sampler == SAMPLER_RANDOM:
+        return _sample_offsets(rel_path_str, size, blocks, block_size)
+    if sampler.startswith("stratified/") and sampler.endswith("M"):
+        budget_bytes = int(sampler[len("stratified/"):-1]) * 1024 * 1024
+        return _stratified_offsets(rel_path_str, size, blocks, block_size, budget_bytes)
+    raise ValueError(f"Unknown sampler: {sampler}")
+
+
+def _start_block_reads(file_path: Path, offsets: list, block_size: int):
+    """Submit the reads of `offsets` to the sample pool; returns collect() -> blocks in offset order."""
+    pool = _sample_read_pool()
+    if hasattr(os, "pread"):
+        fd = os.open(file_path, os.O_RDONLY)
+        futs = [pool.submit(os.pread, fd, block_size, off) for off in offsets]
+
+        def collect() -> list:
+            wait(futs)
+            os.close(fd)
+            return [f.result() for f in futs]
+
+        return collect
+
+    def read_stripe(stripe: list) -> list:
+        out = []
+        with open(file_path, "rb") as f:
+            for off in stripe:
+                f.seek(off)
+                out.append(f.read(block_size))
+        return out
+
+    n = max(1, min(SAMPLE_READ_THREADS, len(offsets)))
+    futs = [pool.submit(read_stripe, offsets[i::n]) for i in range(n)]
+
+    def collect() -> list:
+        wait(futs)
+        out: list = [b""] * len(offsets)
+        for i, f in enumerate(futs):
+            out[i::n] = f.result()
+        return out
+
+    return collect
+
+
+def _start_partial_hash(
+    file_path: Path,
+    rel_path_str: str,
+    *,
+    blocks: int,
+    block_size: int,
+    size: Optional[int] = None,
+    sampler: str = SAMPLER_RANDOM,
+):
+    """Start partial_hash() of one file without waiting for its reads; returns finish() -> digest."""
+    # `size` may be passed in when the caller already knows it, saving a stat call.
+    if size is None:
+        size, _ = safe_stat_size_mtime(file_path)
+    if size is None:
+        raise OSError(f"Cannot stat {file_path}")
+
+    total_sample = blocks * block_size
+    h = hashlib.blake2b(digest_size=32)
+    h.update(str(size).encode("ascii"))
+    h.update(b"|")
+
+    # Small file: hash full content
+    if size <= total_sample or size <= block_size:
+        def hash_whole_file() -> str:
+            with open(file_path, "rb") as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+            return h.hexdigest()
+
+        fut = _sample_read_pool().submit(hash_whole_file)
+        return fut.result
+
+    offsets = _sampler_offsets(sampler, rel_path_str, size, blocks, block_size)
+    collect = _start_block_reads(file_path, offsets, block_size)
+
+    def finish() -> str:
+        for block in collect():
+            h.update(block)
+        return h.hexdigest()
+
+    return finish
+
+
+def partial_hash(
+    file_path: Path,
+    rel_path_str: str,
+    *,
+    blocks: int,
+    block_size: int,
+    size: Optional[int] = None,
+    sampler: str = SAMPLER_RANDOM,
+) -> str:
+    return _start_partial_hash(file_path, rel_path_str, blocks=blocks, block_size=block_size, size=size,
+                               sampler=sampler)()
 
 
 TRAILING_ZERO_CHECK_BYTES = 1_048_576  # 1 MiB
 
 
-def has_all_zero_tail(path: Path, check_bytes: int = TRAILING_ZERO_CHECK_BYTES) -> bool:
+def has_all_zero_tail(
+    path: Path,
+    check_bytes: int = TRAILING_ZERO_CHECK_BYTES,
+    size: Optional[int] = None,
+) -> bool:
     """
     Heuristic check for a pre-allocated-but-never-fully-written file: reads up to
     `check_bytes` from the END of the file and reports whether every byte in that
@@ -467,10 +963,11 @@ def has_all_zero_tail(path: Path, check_bytes: int = TRAILING_ZERO_CHECK_BYTES)
     so this is only ever surfaced as a warning for manual review, never used to
     auto-delete/auto-repair (unlike the whole-file-empty case above).
     """
-    try:
-        size = path.stat().st_size
-    except Exception:
-        return False
+    if size is None:
+        try:
+            size = path.stat().st_size
+        except Exception:
+            return False
     if size == 0:
         return False  # whole-file-empty case is handled separately, not here
     n = min(check_bytes, size)
@@ -483,14 +980,119 @@ def has_all_zero_tail(path: Path, check_bytes: int = TRAILING_ZERO_CHECK_BYTES)
     return len(tail) == n and tail.count(0) == n
 
 
-def partial_hash_match(src: Path, dst: Path, rel_path_str: str, blocks: int, block_size: int) -> bool:
-    ss, _ = safe_stat_size_mtime(src)
-    ds, _ = safe_stat_size_mtime(dst)
+def partial_hash_match(
+    src: Path,
+    dst: Path,
+    rel_path_str: str,
+    blocks: int,
+    block_size: int,
+    src_size: Optional[int] = None,
+    dst_size: Optional[int] = None,
+    sampler: str = SAMPLER_RANDOM,
+) -> bool:
+    """
+    Size check + partial-hash comparison of src vs dst. Sizes already known to
+    the caller (src_size/dst_size) are used as-is instead of being re-stat'ed.
+    """
+    ss = src_size if src_size is not None else safe_stat_size_mtime(src)[0]
+    ds = dst_size if dst_size is not None else safe_stat_size_mtime(dst)[0]
     if ss is None or ds is None or ss != ds:
         return False
-    return partial_hash(src, rel_path_str, blocks=blocks, block_size=block_size) == partial_hash(
-        dst, rel_path_str, blocks=blocks, block_size=block_size
-    )
+    # Both files' block reads are issued before either is waited for. If starting dst fails
+    # (vanished, access denied), src's reads are still collected, closing its fd.
+    finishers = []
+    first_exc: Optional[BaseException] = None
+    try:
+        for path, size in ((src, ss), (dst, ds)):
+            finishers.append(_start_partial_hash(path, rel_path_str, blocks=blocks, block_size=block_size,
+                                                 size=size, sampler=sampler))
+    except BaseException as e:
+        first_exc = e
+    digests = []
+    for finish in finishers:
+        try:
+            digests.append(finish())   # always wait for both, even if one failed
+        except Exception as e:
+            first_exc = first_exc or e
+    if first_exc is not None:
+        raise first_exc
+    return digests[0] == digests[1]
+
+
+# ----------------------------
+# Verification tiers (--verify)
+# ----------------------------
+# Ported from serverTransfer.py 1.12.0 (same idea as nvcompTIF.py's tiers):
+#   size   - size (and, for an already existing dst, mtime) only
+#   sample - partial hash of sampled blocks (partial_hash_match())
+#   full   - full-content hash of both files, streamed in parallel
+# Without --verify each check keeps its own default: an existing dst before DEL-SRC and
+# the cross-volume fallback in move_with_verify() are sampled; plain COPYs are not verified.
+VERIFY_TIERS = ("size", "sample", "full")
+VERIFY_LABELS = {"size": "size+mtime match", "sample": "partial-hash match", "full": "full-hash match"}
+VERIFY_NOTES = {"size": "size and mtime", "sample": "partial hash", "full": "full-content hash"}
+FULL_HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def full_hash(file_path: Path, block_bytes: int = FULL_HASH_BLOCK_BYTES) -> str:
+    h = hashlib.blake2b(digest_size=32)
+    buf = bytearray(block_bytes)
+    mv = memoryview(buf)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(mv)
+            if not n:
+                break
+            h.update(mv[:n])
+    return h.hexdigest()
+
+
+def full_hash_match(
+    src: Path,
+    dst: Path,
+    src_size: Optional[int] = None,
+    dst_size: Optional[int] = None,
+) -> bool:
+    """Size check + full-content hash of src and dst, both files streamed at the same time."""
+    ss = src_size if src_size is not None else safe_stat_size_mtime(src)[0]
+    ds = dst_size if dst_size is not None else safe_stat_size_mtime(dst)[0]
+    if ss is None or ds is None or ss != ds:
+        return False
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="full-hash") as ex:
+        src_digest = ex.submit(full_hash, src)
+        dst_digest = full_hash(dst)
+        return src_digest.result() == dst_digest
+
+
+def verify_existing(
+    tier: str,
+    src: Path,
+    dst: Path,
+    rel_path_str: str,
+    *,
+    blocks: int,
+    block_size: int,
+    src_size: Optional[int] = None,
+    dst_size: Optional[int] = None,
+    src_mtime: Optional[float] = None,
+    dst_mtime: Optional[float] = None,
+    sampler: str = SAMPLER_RANDOM,
+) -> bool:
+    """Does dst match src at verification tier `tier` (see VERIFY_TIERS)? Unknown sizes/mtimes are stat'ed."""
+    if tier == "size":
+        if src_size is None or src_mtime is None:
+            src_size, src_mtime = safe_stat_size_mtime(src)
+        if dst_size is None or dst_mtime is None:
+            dst_size, dst_mtime = safe_stat_size_mtime(dst)
+        if None in (src_size, dst_size, src_mtime, dst_mtime) or src_size != dst_size:
+            return False
+        return abs(src_mtime - dst_mtime) <= 2.0
+    if tier == "sample":
+        return partial_hash_match(src, dst, rel_path_str, blocks=blocks, block_size=block_size,
+                                  src_size=src_size, dst_size=dst_size, sampler=sampler)
+    if tier == "full":
+        return full_hash_match(src, dst, src_size=src_size, dst_size=dst_size)
+    raise ValueError(f"Unknown verification tier: {tier}")
 
 
 # ----------------------------
@@ -568,7 +1170,14 @@ def append_manifest_record(
     *,
     dry_run: bool,
     logf,
+    manifest_db: Optional["SqliteManifest"] = None,
+    writer: Optional["ManifestWriter"] = None,
 ) -> None:
+    """
+    Append one JSON record as a line to manifest.ndjson (unless dry_run), or
+    to the SQLite manifest if one is passed in / exists (see SqliteManifest).
+    With a ManifestWriter, the record is buffered and written with its group.
+    """
     mdir = manifest_dir(source_root)
     mpath = manifest_path(source_root)
 
@@ -577,6 +1186,23 @@ def append_manifest_record(
         return
 
     try:
+        if writer is not None:
+            writer.append(record)
+            logf(f"[MANIFEST] Appended: {record.get('action')} {record.get('relpath')}")
+            return
+        if manifest_db is None and manifest_db_path(source_root).exists():
+            # One-off append (e.g. from tapeTransferOrphanCleanup.py): open, insert, close.
+            db = SqliteManifest(manifest_db_path(source_root), logf=logf)
+            try:
+                db.append(record)
+            finally:
+                db.close()
+            logf(f"[MANIFEST] Appended: {record.get('action')} {record.get('relpath')}")
+            return
+        if manifest_db is not None:
+            manifest_db.append(record)
+            logf(f"[MANIFEST] Appended: {record.get('action')} {record.get('relpath')}")
+            return
         mdir.mkdir(parents=True, exist_ok=True)
         with open(mpath, "a", encoding="utf-8", newline="\n") as f:
             f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -585,6 +1211,420 @@ def append_manifest_record(
         logf(f"[MANIFEST][ERROR] Failed to append manifest record ({e})")
 
 
+# ----------------------------
+# Manifest (SQLite, optional)
+# ----------------------------
+# Ported from serverTransfer.py 1.6.0. Long-lived source roots accumulate millions of
+# manifest lines; parsing the whole NDJSON with json.loads on every start takes minutes
+# and the in-memory index grows with history. The SQLite manifest keeps the same records
+# in an indexed table and answers per-file lookups with one indexed query instead.
+# Enabled with --manifest-db, and used automatically from then on whenever
+# manifest.sqlite exists - by tapeTransfer.py and by tapeTransferOrphanCleanup.py.
+MANIFEST_DB_BATCH = 500  # records per INSERT transaction
+
+
+def manifest_db_path(source_root: Path) -> Path:
+    return manifest_dir(source_root) / "manifest.sqlite"
+
+
+def _manifest_record_row(record: dict) -> tuple:
+    size = record.get("size")
+    mtime = record.get("mtime")
+    return (
+        record.get("relpath"),
+        record.get("target_root", ""),
+        size if isinstance(size, int) else None,
+        float(mtime) if isinstance(mtime, (int, float)) else None,
+        record.get("action"),
+        record.get("ts"),
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+class SqliteManifest:
+    """
+    SQLite-backed manifest. Also serves as the relpath -> (size, mtime) index
+    that load_manifest_index() returns: it supports `in`, `[]` and `[]=` like
+    that dict, so manifest_has_entry() works unchanged - but each lookup is an
+    indexed query for the most recent valid record ("last line wins", as in the
+    NDJSON loader) rather than a scan of the whole history.
+
+    Records are inserted in batches of MANIFEST_DB_BATCH (one transaction each)
+    and flushed on close(). The database runs in WAL mode; on UNC (network)
+    sources, where SQLite's WAL shared memory is not supported, it falls back
+    to the default rollback journal.
+
+    On open, any NDJSON lines not yet imported are imported once (the imported
+    byte offset is kept in the meta table), so switching an existing source
+    root over loses no history.
+    """
+
+    def __init__(self, db_path: Path, *, ndjson_path: Optional[Path] = None, readonly: bool = False, logf=print) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending: list = []
+        self._overlay: Dict[str, Tuple[int, float]] = {}
+        self._readonly = readonly
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True, check_same_thread=False)
+            return
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        if not str(db_path).startswith("\\\\"):
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                relpath TEXT NOT NULL,
+                target_root TEXT NOT NULL,
+                size INTEGER,
+                mtime REAL,
+                action TEXT,
+                ts TEXT,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_records_relpath_target ON records (relpath, target_root);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self._conn.commit()
+        if ndjson_path is not None:
+            self.import_ndjson(ndjson_path, logf=logf)
+
+    def import_ndjson(self, ndjson_path: Path, *, logf=print) -> int:
+        """Import NDJSON lines appended since the last import. Returns the number of records imported."""
+        if not ndjson_path.exists():
+            return 0
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'ndjson_offset'").fetchone()
+        offset = int(row[0]) if row else 0
+        if ndjson_path.stat().st_size <= offset:
+            return 0
+
+        imported = bad_lines = 0
+        batch: list = []
+        with open(ndjson_path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # incomplete last line (writer still busy) - pick it up next time
+                offset += len(raw)
+                line = raw.decode("utf-8", errors="replace").strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    bad_lines += 1
+                    continue
+                if not isinstance(rec, dict) or not isinstance(rec.get("relpath"), str):
+                    bad_lines += 1
+                    continue
+                batch.append(_manifest_record_row(rec))
+                imported += 1
+                if len(batch) >= 10 * MANIFEST_DB_BATCH:
+                    self._insert_rows(batch)
+                    batch = []
+        self._insert_rows(batch)
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('ndjson_offset', ?)", (str(offset),))
+        self._conn.commit()
+        logf(f"[MANIFEST] Imported {imported} NDJSON record(s) into {self.db_path} (bad_lines={bad_lines})")
+        return imported
+
+    def _insert_rows(self, rows: list) -> None:
+        if rows:
+            self._conn.executemany(
+                "INSERT INTO records (relpath, target_root, size, mtime, action, ts, record) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def record_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def relpath_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT relpath) FROM records").fetchone()[0]
+
+    def lookup(self, key: str) -> Optional[Tuple[int, float]]:
+        """Most recent (size, mtime) recorded for relpath `key`, or None."""
+        with self._lock:
+            if key in self._overlay:
+                return self._overlay[key]
+            row = self._conn.execute(
+                "SELECT size, mtime FROM records WHERE relpath = ? "
+                "AND size IS NOT NULL AND mtime IS NOT NULL ORDER BY id DESC LIMIT 1",
+                (key,),
+            ).fetchone()
+        return (int(row[0]), float(row[1])) if row else None
+
+    def latest_record(self, relpath: str, target_root: Optional[str] = None) -> Optional[dict]:
+        """Most recent full record for relpath (optionally for one target_root), or None."""
+        sql = "SELECT record FROM records WHERE relpath = ?"
+        params: tuple = (relpath,)
+        if target_root is not None:
+            sql += " AND target_root = ?"
+            params += (target_root,)
+        with self._lock:
+            row = self._conn.execute(sql + " ORDER BY id DESC LIMIT 1", params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __contains__(self, key) -> bool:
+        return self.lookup(key) is not None
+
+    def __getitem__(self, key) -> Tuple[int, float]:
+        value = self.lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        # Callers update the index right after appending the matching record; keep it in
+        # memory so the lookup is answered even before the batch is committed.
+        with self._lock:
+            self._overlay[key] = value
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            self._pending.append(_manifest_record_row(record))
+            if len(self._pending) >= MANIFEST_DB_BATCH:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._pending and not self._readonly:
+            self._insert_rows(self._pending)
+            self._conn.commit()
+        self._pending = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def set_synchronous(self, mode: str) -> None:
+        """PRAGMA synchronous (OFF / NORMAL / FULL); see ManifestWriter's fsync policy."""
+        if not self._readonly:
+            with self._lock:
+                self._conn.execute(f"PRAGMA synchronous={mode}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+def open_manifest_db(source_root: Path, *, enable: bool, dry_run: bool, logf) -> Optional[SqliteManifest]:
+    """
+    Open the SQLite manifest if --manifest-db was given or manifest.sqlite already
+    exists; otherwise None (NDJSON mode). In dry-run an existing database is
+    opened read-only and a missing one is not created.
+    """
+    db_path = manifest_db_path(source_root)
+    exists = db_path.exists()
+    if not (enable or exists):
+        return None
+    if dry_run:
+        if not exists:
+            logf(f"[MANIFEST][DRY] Would create SQLite manifest: {db_path}")
+            return None
+        return SqliteManifest(db_path, readonly=True, logf=logf)
+    return SqliteManifest(db_path, ndjson_path=manifest_path(source_root), logf=logf)
+
+
+# ----------------------------
+# Manifest writer (group commit)
+# ----------------------------
+# Ported from serverTransfer.py 1.7.0. append_manifest_record() opens, writes and closes
+# manifest.ndjson for every record; on a network source root that is several round trips
+# per transferred file. During a run, transfer_tree() instead keeps one ManifestWriter open
+# that buffers records and writes them in groups. A crash loses at most the last unflushed group, which is safe:
+# those files simply get re-verified (partial hash) instead of skipped on the next run.
+DEFAULT_MANIFEST_FLUSH_RECORDS = 200
+DEFAULT_MANIFEST_FLUSH_S = 5.0
+MANIFEST_FSYNC_POLICIES = ("none", "batch", "every")
+DEFAULT_MANIFEST_FSYNC = "batch"
+
+
+class ManifestWriter:
+    """
+    Long-lived, thread-safe manifest appender for one source root.
+
+    Records are buffered and written every `flush_records` records or every
+    `flush_s` seconds (background flusher thread), whichever comes first, and
+    on close() - which transfer_tree() calls from its finally block, so Ctrl-C
+    still flushes. Goes to the SQLite manifest if `manifest_db` is given,
+    otherwise to manifest.ndjson through a single open handle.
+
+    fsync policy:
+      none  - leave durability to the OS (fastest, a power loss can drop recent groups)
+      batch - fsync once per written group (default)
+      every - write and fsync each record immediately (old per-record durability)
+    For SQLite, none maps to synchronous=OFF and batch/every to synchronous=FULL.
+    """
+
+    def __init__(
+        self,
+        source_root: Path,
+        *,
+        manifest_db: Optional[SqliteManifest] = None,
+        flush_records: int = DEFAULT_MANIFEST_FLUSH_RECORDS,
+        flush_s: float = DEFAULT_MANIFEST_FLUSH_S,
+        fsync: str = DEFAULT_MANIFEST_FSYNC,
+        logf=print,
+    ) -> None:
+        if fsync not in MANIFEST_FSYNC_POLICIES:
+            raise ValueError(f"Unknown manifest fsync policy: {fsync}")
+        self.source_root = source_root
+        self.manifest_db = manifest_db
+        self.flush_records = 1 if fsync == "every" else max(1, int(flush_records))
+        self.flush_s = float(flush_s)
+        self.fsync = fsync
+        self.logf = logf
+        self.written = 0
+        self._pending: list = []
+        self._handle = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        if manifest_db is not None:
+            manifest_db.set_synchronous("OFF" if fsync == "none" else "FULL")
+        if self.flush_records > 1 and self.flush_s > 0:
+            self._thread = threading.Thread(target=self._flush_loop, name="manifest-writer", daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_s):
+            self.flush()
+
+    def append(self, record: dict) -> None:
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.flush_records:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        batch = self._pending
+        try:
+            if self.manifest_db is not None:
+                for rec in batch:
+                    self.manifest_db.append(rec)
+                self.manifest_db.flush()
+            else:
+                if self._handle is None:
+                    manifest_dir(self.source_root).mkdir(parents=True, exist_ok=True)
+                    self._handle = open(manifest_path(self.source_root), "a", encoding="utf-8", newline="\n")
+                self._handle.write("".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in batch))
+                self._handle.flush()
+                if self.fsync != "none":
+                    os.fsync(self._handle.fileno())
+        except Exception as e:
+            # Keep the records and try again with the next group; the transfer itself goes on.
+            self.logf(f"[MANIFEST][ERROR] Failed to write {len(batch)} manifest record(s), will retry ({e})")
+            return
+        self.written += len(batch)
+        self._pending = []
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self._flush_locked()
+            if self._pending:
+                self.logf(f"[MANIFEST][ERROR] {len(self._pending)} manifest record(s) could not be written; "
+                          f"those files will be re-verified on the next run.")
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+# ----------------------------
+# Kernel copy paths (Linux)
+# ----------------------------
+# Ported from serverTransfer.py 1.14.0. The TAPE_TRANSFER tree always sits on the source
+# volume, so on btrfs/XFS a FICLONE reflink stages a file without copying any data or
+# using extra space. copy_file() tries, in order:
+#   reflink          - ioctl(FICLONE), extents shared with the source
+#   copy_file_range  - in-kernel copy (server-side on NFS 4.2 / SMB3 mounts)
+#   sendfile         - in-kernel copy between any two regular files
+#   copy2            - shutil.copy2(), as before (other filesystems and other OSes)
+# A method that fails with one of KERNEL_COPY_FALLBACK_ERRNOS is skipped for the next one.
+# The method used is reported per file ("via ...").
+COPY_BACKENDS = ("auto", "copy2")
+DEFAULT_COPY_BACKEND = "auto"
+KERNEL_COPY_CHUNK_BYTES = 1024 * 1024 * 1024
+FICLONE = 0x40049409                          # _IOW(0x94, 9, int), linux/fs.h
+# Only "not supported for this pair of files" errnos: a real permission or descriptor
+# error (EPERM, EBADF, ...) is raised, not retried down the chain and by the buffered copy.
+KERNEL_COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY}
+
+
+def kernel_copy_methods() -> list:
+    """Kernel copy methods usable on this host, in the order kernel_copy() tries them."""
+    if not sys.platform.startswith("linux"):
+        return []
+    methods = []
+    if fcntl is not None:
+        methods.append("reflink")
+    if hasattr(os, "copy_file_range"):
+        methods.append("copy_file_range")
+    if hasattr(os, "sendfile"):
+        methods.append("sendfile")
+    return methods
+
+
+def _kernel_copy_fd(fd_src: int, fd_dst: int, size: int, method: str) -> None:
+    if method == "reflink":
+        fcntl.ioctl(fd_dst, FICLONE, fd_src)
+        return
+    offset = 0
+    while offset < size:
+        n = min(KERNEL_COPY_CHUNK_BYTES, size - offset)
+        if method == "copy_file_range":
+            done = os.copy_file_range(fd_src, fd_dst, n, offset, offset)
+        else:
+            os.lseek(fd_dst, offset, os.SEEK_SET)
+            done = os.sendfile(fd_dst, fd_src, offset, n)
+        if done == 0:
+            raise OSError(errno.EIO, f"Source ended at byte {offset} of {size} during {method}")
+        offset += done
+
+
+def kernel_copy(src: Path, dst: Path) -> Optional[str]:
+    """Copy src onto dst in the kernel; returns the method used, or None if none applies."""
+    methods = kernel_copy_methods()
+    if not methods:
+        return None
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "wb", buffering=0) as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        for method in methods:
+            try:
+                _kernel_copy_fd(fsrc.fileno(), fdst.fileno(), size, method)
+                return method
+            except OSError as e:
+                if e.errno not in KERNEL_COPY_FALLBACK_ERRNOS:
+                    raise
+                os.ftruncate(fdst.fileno(), 0)
+    return None
+
+
+def copy_file(src: Path, dst: Path, backend: str = DEFAULT_COPY_BACKEND) -> str:
+    """shutil.copy2() replacement (data + timestamps/permissions); returns the copy method used."""
+    method = kernel_copy(src, dst) if backend == "auto" else None
+    if method is None:
+        shutil.copy2(str(src), str(dst))
+        return "copy2"
+    shutil.copystat(str(src), str(dst))
+    return method
+
+
 # ----------------------------
 # Safe move
 # ----------------------------
@@ -596,7 +1636,10 @@ def move_with_verify(
     sample_blocks: int,
     block_size: int,
     logf,
-) -> Optional[Exception]:
+    verify: str = "sample",
+    sampler: str = SAMPLER_RANDOM,
+    backend: str = DEFAULT_COPY_BACKEND,
+) -> Tuple[Optional[Exception], str]:
     """
     Move src to dst safely.
 
@@ -612,30 +1655,35 @@ def move_with_verify(
     destination is an independent, user-supplied root.
 
     Cross-volume fallback: copy, then hash-verify the copy against the source
-    before deleting anything - shutil.copy2() completing without raising is
+    before deleting anything - copy_file() completing without raising is
     not on its own proof of a correct copy, only that no exception was
     raised. On a verification mismatch, retry ONCE (delete the bad copy, copy
     again, verify again); a second consecutive mismatch is treated as a real
     problem worth surfacing rather than something to retry indefinitely.
+    `verify` is the tier used for that check (see VERIFY_TIERS), `sampler` the
+    partial-hash sampling for the sample tier, `backend` the copy path (see
+    copy_file()).
 
-    Returns None on success (source has been deleted), or an Exception
-    describing the failure (source is left intact in every failure case).
+    Returns (None, method) on success (source has been deleted; method is
+    "rename" or the copy_file() method), or (Exception, "") describing the
+    failure (source is left intact in every failure case).
     """
     try:
         os.rename(str(src), str(dst))
-        return None
+        return None, "rename"
     except OSError:
         pass  # cross-device (or other rename failure) - fall through to copy+verify+delete
 
     for attempt in (1, 2):
         try:
-            shutil.copy2(str(src), str(dst))
+            method = copy_file(src, dst, backend)
         except Exception as e:
-            return e
+            return e, ""
 
-        if partial_hash_match(src, dst, rel_path_str, blocks=sample_blocks, block_size=block_size):
+        if verify_existing(verify, src, dst, rel_path_str, blocks=sample_blocks, block_size=block_size,
+                           sampler=sampler):
             src.unlink()
-            return None
+            return None, method
 
         logf(f"[WARN] Verification mismatch after copy (attempt {attempt}/2): {src} -> {dst}")
         try:
@@ -647,7 +1695,7 @@ def move_with_verify(
     return RuntimeError(
         f"Copy succeeded but failed content verification twice in a row - "
         f"source kept, destination removed: {src}"
-    )
+    ), ""
 
 
 # ----------------------------
@@ -685,6 +1733,292 @@ def open_log_files(
     return src_handle, tgt_handle, src_log_path, tgt_log_path
 
 
+# ----------------------------
+# Profiling (--profile)
+# ----------------------------
+# Ported from serverTransfer.py 1.19.0. For diagnosing a slow run from its artifacts
+# alone: RunProfiler runs cProfile on the main thread and on every thread started
+# while it is active, and swaps the PROFILED_FUNCTIONS module globals for wrappers
+# that record calls and wall-clock time (nothing is wrapped without --profile). The
+# report and the merged pstats file land next to the source transfer log. Hash
+# verification is timed at verify_existing()/partial_hash_match()/full_hash(), the
+# functions the transfer code really calls.
+PROFILED_FUNCTIONS = (
+    "safe_stat_size_mtime", "list_dir_file_stats", "verify_existing", "partial_hash_match", "full_hash",
+    "copy_file", "move_with_verify", "append_manifest_record",
+)
+PROFILE_TOP_N = 40
+
+
+class CallTimers:
+    """Calls and wall-clock seconds (inclusive, all threads) per wrapped function."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stats: Dict[str, list] = {}   # name -> [calls, total s, max s]
+        self._originals: Dict[str, object] = {}
+
+    def _wrap(self, name: str, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - t0
+                with self._lock:
+                    st = self.stats.setdefault(name, [0, 0.0, 0.0])
+                    st[0] += 1
+                    st[1] += elapsed
+                    st[2] = max(st[2], elapsed)
+        return timed
+
+    def install(self, namespace: dict, names: Iterable[str]) -> None:
+        for name in names:
+            self._originals[name] = namespace[name]
+            namespace[name] = self._wrap(name, namespace[name])
+
+    def uninstall(self, namespace: dict) -> None:
+        namespace.update(self._originals)
+        self._originals = {}
+
+    def report_lines(self) -> list:
+        lines = [f"{'function':<24} {'calls':>10} {'total s':>10} {'mean ms':>10} {'max ms':>10}"]
+        for name, (calls, total, peak) in sorted(self.stats.items(), key=lambda kv: -kv[1][1]):
+            lines.append(f"{name:<24} {calls:>10} {total:>10.2f} {1000 * total / calls:>10.2f} {1000 * peak:>10.1f}")
+        return lines
+
+
+class RunProfiler:
+    def __init__(self) -> None:
+        self.timers = CallTimers()
+        self._lock = threading.Lock()
+        self._profiles: list = []
+        self._main: Optional[cProfile.Profile] = None
+        self._t0 = 0.0
+        self.log_path: Optional[Path] = None   # the run's source transfer log, once known
+
+    def _thread_hook(self, frame, event, arg) -> None:
+        # Installed for new threads by threading.setprofile(); replaces itself with a
+        # cProfile.Profile of that thread on the thread's first event.
+        sys.setprofile(None)
+        prof = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(prof)
+        prof.enable()
+
+    def start(self) -> None:
+        self._t0 = time.monotonic()
+        self.timers.install(globals(), PROFILED_FUNCTIONS)
+        threading.setprofile(self._thread_hook)
+        self._main = cProfile.Profile()
+        self._main.enable()
+
+    def stop(self) -> pstats.Stats:
+        self._main.disable()
+        threading.setprofile(None)
+        self.timers.uninstall(globals())
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            profiles = list(self._profiles)
+        for prof in profiles:
+            try:
+                stats.add(prof)
+            except Exception:
+                continue   # a thread still running its profile; its numbers are left out
+        self.threads = 1 + len(profiles)
+        self.wall_s = time.monotonic() - self._t0
+        return stats
+
+    def write_report(self, log_path: Path, *, title: str) -> Tuple[Path, Path]:
+        """Stop profiling; write transferProfile_<ts>.txt/.pstats next to `log_path`. Returns both paths."""
+        stats = self.stop()
+        base = log_path.with_name(f"transferProfile_{log_path.stem[len('transferLog_'):]}")
+        pstats_path = base.with_suffix(".pstats")
+        report_path = base.with_suffix(".txt")
+        stats.dump_stats(str(pstats_path))
+        out = io.StringIO()
+        out.write(f"{title}\n")
+        out.write(f"Wall: {self.wall_s:.1f}s | profiled threads: {self.threads} | pstats: {pstats_path.name}\n\n")
+        out.write("Call timers (wall-clock, inclusive, summed over threads):\n")
+        out.write("\n".join(self.timers.report_lines()) + "\n\n")
+        stats.stream = out
+        stats.strip_dirs()   # after dump_stats(), so the .pstats file keeps full paths
+        for key, label in (("cumulative", "cumulative time"), ("tottime", "own time")):
+            out.write(f"Hot paths by {label} (top {PROFILE_TOP_N}):\n")
+            stats.sort_stats(key).print_stats(PROFILE_TOP_N)
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        return report_path, pstats_path
+
+
+# ----------------------------
+# Transfer logger (background writer)
+# ----------------------------
+# Ported from serverTransfer.py 1.8.0. Every log line used to be printed and then
+# written + flushed to both the source log and the target log on the calling thread; the target log lives on the TAPE_TRANSFER share, so each
+# logged file cost synchronous network writes. TransferLogger keeps the console output
+# on the calling thread but hands file writes to one background thread that writes in
+# batches. Per-file lines are flushed every LOG_FLUSH_S seconds; [INFO]/[WARN]/[ERROR]
+# lines (header, summary, errors) are flushed as soon as the writer picks them up.
+LOG_LEVEL_DETAIL = 10   # per-file actions: [COPY], [MOVE], [SKIP], [DEL ], ...
+LOG_LEVEL_INFO = 20
+LOG_LEVEL_WARN = 30
+LOG_LEVEL_ERROR = 40
+
+DETAIL_LOG_PREFIXES = (
+    "[COPY]", "[MOVE]", "[SKIP]", "[SKIP-MANIFEST]", "[DEL ]", "[DEL-SRC]", "[MKDIR]",
+    "[CLEANUP]", "[MANIFEST] Appended", "[MANIFEST][DRY]",
+)
+_LOG_TAGS_RE = re.compile(r"^((?:\[[^\]]*\])*)")
+
+CONSOLE_MODES = ("all", "rate", "quiet")
+DEFAULT_CONSOLE_MODE = "all"
+DEFAULT_CONSOLE_RATE = 20   # per-file lines per second on the console with --console rate
+LOG_FLUSH_S = 2.0
+LOG_QUEUE_MAX = 10_000      # callers block (back-pressure) if the writer falls this far behind
+
+
+def log_level(msg: str) -> int:
+    """Level of a log line, from its leading [TAG] prefix(es)."""
+    tags = _LOG_TAGS_RE.match(msg).group(1)
+    if "ERROR" in tags:
+        return LOG_LEVEL_ERROR
+    if "WARN" in tags or tags.startswith("[LOCK]"):
+        return LOG_LEVEL_WARN
+    if msg.startswith(DETAIL_LOG_PREFIXES):
+        return LOG_LEVEL_DETAIL
+    return LOG_LEVEL_INFO
+
+
+class TransferLogger:
+    """
+    Drop-in replacement for the old logf closure: call it with one line.
+
+    Console (calling thread):
+      all   - every line (previous behavior)
+      rate  - per-file lines limited to `console_rate` per second, with a note
+              how many were left out; all other lines always shown
+      quiet - per-file lines go to the log files only
+    Log files always receive every line, in order, via a bounded queue and one
+    writer thread. close() drains the queue and flushes; the caller still owns
+    (and closes) the file handles.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        handles: Iterable[Optional[object]],
+        *,
+        console: str = DEFAULT_CONSOLE_MODE,
+        console_rate: int = DEFAULT_CONSOLE_RATE,
+        flush_s: float = LOG_FLUSH_S,
+        queue_max: int = LOG_QUEUE_MAX,
+    ) -> None:
+        if console not in CONSOLE_MODES:
+            raise ValueError(f"Unknown console mode: {console}")
+        self.console = console
+        self.console_rate = max(1, int(console_rate))
+        self.flush_s = float(flush_s)
+        self._handles = [h for h in handles if h]
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self._lock = threading.Lock()
+        self._window_start = 0.0
+        self._window_count = 0
+        self._suppressed = 0
+        self._write_failed = False
+        self._thread = threading.Thread(target=self._run, name="transfer-logger", daemon=True)
+        self._thread.start()
+
+    def __call__(self, msg: str) -> None:
+        level = log_level(msg)
+        # One lock for console and queue, so console order and file order are the same
+        # and lines from concurrent workers never interleave mid-line.
+        with self._lock:
+            if self._show_on_console(level):
+                print(msg)
+            self._queue.put((msg, level >= LOG_LEVEL_INFO))
+
+    def _show_on_console(self, level: int) -> bool:
+        if level >= LOG_LEVEL_INFO or self.console == "all":
+            return True
+        if self.console == "quiet":
+            return False
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._report_suppressed()
+            self._window_start = now
+            self._window_count = 0
+        if self._window_count < self.console_rate:
+            self._window_count += 1
+            return True
+        self._suppressed += 1
+        return False
+
+    def _report_suppressed(self) -> None:
+        if self._suppressed:
+            print(f"[INFO] ... {self._suppressed} per-file line(s) not shown on console (see log)")
+            self._suppressed = 0
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        dirty = False
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_s)
+            except queue.Empty:
+                item = None
+            lines: list = []
+            urgent = stop = False
+            while item is not None:
+                if item is self._STOP:
+                    stop = True
+                    break
+                lines.append(item[0])
+                urgent = urgent or item[1]
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if lines:
+                self._write("".join(line + "\n" for line in lines))
+                dirty = True
+            now = time.monotonic()
+            if dirty and (urgent or stop or now - last_flush >= self.flush_s):
+                self._flush()
+                last_flush = now
+                dirty = False
+            if stop:
+                return
+
+    def _write(self, text: str) -> None:
+        for h in self._handles:
+            try:
+                h.write(text)
+            except Exception as e:
+                self._write_error(e)
+
+    def _flush(self) -> None:
+        for h in self._handles:
+            try:
+                h.flush()
+            except Exception as e:
+                self._write_error(e)
+
+    def _write_error(self, e: Exception) -> None:
+        # The console still has every [INFO]/[WARN]/[ERROR] line; report a broken log file once.
+        if not self._write_failed:
+            self._write_failed = True
+            print(f"[WARN] Writing the transfer log failed ({e}); console output continues.")
+
+    def close(self) -> None:
+        with self._lock:
+            self._report_suppressed()
+        self._queue.put(self._STOP)
+        self._thread.join()
+
+
 # ----------------------------
 # Main transfer routine
 # ----------------------------
@@ -704,14 +2038,31 @@ def transfer_tree(
     lock_file: Path,
     user_name: str,
     ignore_manifest: bool,
+    manifest_db: bool = False,
+    manifest_fsync: str = DEFAULT_MANIFEST_FSYNC,
+    manifest_flush_records: int = DEFAULT_MANIFEST_FLUSH_RECORDS,
+    manifest_flush_s: float = DEFAULT_MANIFEST_FLUSH_S,
+    console: str = DEFAULT_CONSOLE_MODE,
+    console_rate: int = DEFAULT_CONSOLE_RATE,
+    verify: Optional[str] = None,
+    sample_strategy: str = DEFAULT_SAMPLE_STRATEGY,
+    sample_budget_mb: int = DEFAULT_SAMPLE_BUDGET_MB,
+    copy_backend: str = DEFAULT_COPY_BACKEND,
+    full_rescan: bool = False,
+    snapshot_max_age_h: float = DEFAULT_SNAPSHOT_MAX_AGE_H,
+    log_ts: Optional[str] = None,
 ) -> Tuple[int, int, int, int, int, int, int, Path, Path]:
     max_bytes = int(max_size_gb * 1024**3)
     block_size = sample_block_kb * 1024
+    sampler = make_sampler(sample_strategy, sample_budget_mb)
+    # --verify applies one tier everywhere; without it each check keeps its default.
+    existing_tier = verify or "sample"
 
     copied = moved = deleted_src = skipped_manifest = errors = 0
+    copy_paths: Dict[str, int] = {}
     mismatched = suspected_truncated = 0
 
-    ts = timestamp_for_log()
+    ts = log_ts or timestamp_for_log()
     src_log_handle, tgt_log_handle, src_log_path, tgt_log_path = open_log_files(
         source_root=source_dir,
         target_root=target_dir,
@@ -719,14 +2070,7 @@ def transfer_tree(
         ts=ts,
     )
 
-    def logf(msg: str) -> None:
-        print(msg)
-        if src_log_handle:
-            src_log_handle.write(msg + "\n")
-            src_log_handle.flush()
-        if tgt_log_handle:
-            tgt_log_handle.write(msg + "\n")
-            tgt_log_handle.flush()
+    logf = TransferLogger((src_log_handle, tgt_log_handle), console=console, console_rate=console_rate)
 
     if dry_run and tgt_log_handle is None:
         logf(f"[WARN] Dry-run: target folder does not exist, so target log was not written: {tgt_log_path}")
@@ -735,6 +2079,8 @@ def transfer_tree(
     # Timestamp suffix makes each run's lock file unique so parallel runs don't interfere.
     copy_lock_path = tape_transfer_root(target_dir) / f"{COPY_LOCK_PREFIX}_{ts}.lock"
 
+    mdb: Optional[SqliteManifest] = None
+    mwriter: Optional[ManifestWriter] = None
     try:
         total_mb = (sample_blocks * sample_block_kb) / 1024.0
 
@@ -747,7 +2093,13 @@ def transfer_tree(
             f"[INFO] Target: {target_dir}",
             f"[INFO] Mode: {'DRY RUN' if dry_run else 'LIVE'} | Overwrite: {overwrite}",
             f"[INFO] maxSizeGB: {max_size_gb}",
-            f"[INFO] Partial-hash sampling: {sample_blocks} blocks x {sample_block_kb} KB (~{total_mb:.2f} MB/file)",
+            f"[INFO] Partial-hash sampling: {sample_blocks} blocks x {sample_block_kb} KB (~{total_mb:.2f} MB/file)"
+            if sampler == SAMPLER_RANDOM else
+            f"[INFO] Partial-hash sampling: stratified - head + tail + 1 block per "
+            f"{STRATIFIED_REGION_BYTES // 1024**3} GB region, >= {sample_blocks} blocks x {sample_block_kb} KB, "
+            f"<= {sample_budget_mb} MB/file",
+            f"[INFO] Copy path: "
+            + (" -> ".join(kernel_copy_methods() + ["copy2"]) if copy_backend == "auto" else "copy2"),
         ]
         header_text = "\n".join(header_lines)
 
@@ -782,26 +2134,73 @@ def transfer_tree(
 
         logf(f"[INFO] Manifest: {manifest_path(source_dir)}")
         logf(f"[INFO] Manifest mode: {'IGNORED' if ignore_manifest else 'ACTIVE'}")
+        snapshot_mode = ("off (--ignore-manifest)" if ignore_manifest
+                         else "full rescan" if full_rescan or overwrite
+                         else f"skip unchanged covered directories listed within {snapshot_max_age_h:g} h")
+        logf(f"[INFO] Directory snapshot: {snapshot_mode}")
+        logf(f"[INFO] Manifest writes: grouped every {manifest_flush_records} record(s) or {manifest_flush_s}s | "
+             f"fsync: {manifest_fsync}")
         logf("[INFO] Default: COPY everything; MOVE only if > maxSize or matches --move-ext/--move-keyword")
-        logf("[INFO] MOVE-category + dst exists (no --overwrite): delete source ONLY if size + partial-hash match")
+        logf(f"[INFO] MOVE-category + dst exists (no --overwrite): delete source ONLY if "
+             f"{VERIFY_LABELS[existing_tier]}")
+        if verify:
+            logf(f"[INFO] Verification tier: {verify} (--verify) for existing, moved and copied files")
         logf("-" * 110)
 
-        manifest_index = load_manifest_index(source_dir, logf=logf, ignore_manifest=ignore_manifest)
+        # With the SQLite manifest, the database itself is the index (per-file indexed queries).
+        mdb = open_manifest_db(source_dir, enable=manifest_db, dry_run=dry_run, logf=logf)
+        if mdb is not None:
+            logf(f"[MANIFEST] Using SQLite manifest: {mdb.db_path} ({mdb.record_count()} records)")
+        if ignore_manifest:
+            manifest_index = load_manifest_index(source_dir, logf=logf, ignore_manifest=True)
+        elif mdb is not None:
+            manifest_index = mdb
+        else:
+            manifest_index = load_manifest_index(source_dir, logf=logf, ignore_manifest=False)
 
         if not dry_run:
+            mwriter = ManifestWriter(
+                source_dir,
+                manifest_db=mdb,
+                flush_records=manifest_flush_records,
+                flush_s=manifest_flush_s,
+                fsync=manifest_fsync,
+                logf=logf,
+            )
             target_dir.mkdir(parents=True, exist_ok=True)
 
-        for root, dirs, files in os.walk(source_dir):
-            root_path = Path(root)
+        # Every target directory is listed once; the ensure_dir() calls and all dst
+        # existence/size lookups below are dictionary lookups against that listing.
+        dest_cache = DestDirCache()
+
+        # Unchanged, fully manifest-covered directories are not listed at all (see DirSnapshot).
+        snapshot = None
+        if not ignore_manifest:
+            snapshot = DirSnapshot.load(
+                source_dir,
+                snapshot_fingerprint(target_dir, include_exts, max_bytes, move_exts, move_keywords),
+                use_for_skip=not (full_rescan or overwrite),
+                max_age_s=snapshot_max_age_h * 3600,
+                logf=logf,
+            )
+
+        for root_path, dirs, files, dir_mtime, snapshot_skipped in walk_source(source_dir, snapshot, logf):
             rel_dir = root_path.relative_to(source_dir)
             out_root = target_dir / rel_dir
+            if snapshot_skipped:
+                # Transferred on an earlier run, so its target folders exist already.
+                continue
 
-            ensure_dir(out_root, dry_run=dry_run, logf=logf)
+            dest_cache.ensure_dir(out_root, dry_run=dry_run, logf=logf)
             for d in dirs:
-                ensure_dir(out_root / d, dry_run=dry_run, logf=logf)
+                dest_cache.ensure_dir(out_root / d, dry_run=dry_run, logf=logf)
 
+            # The directory goes into the snapshot only if every candidate file in it was
+            # already covered by the manifest.
+            considered = covered = 0
+            seen_files: list = []
             for fname in files:
-                if fname.startswith("transferLog_") and fname.endswith(".log"):
+                if is_control_file(fname):
                     continue
 
                 src_file = root_path / fname
@@ -812,6 +2211,7 @@ def transfer_tree(
                 if not should_process_by_include_ext(src_file, include_exts):
                     logf(f"[SKIP] Not in --include-ext: {src_file}")
                     continue
+                considered += 1
 
                 dst_file = out_root / fname
 
@@ -821,7 +2221,8 @@ def transfer_tree(
                     errors += 1
                     continue
 
-                ensure_dir(dst_file.parent, dry_run=dry_run, logf=logf)
+                dest_cache.ensure_dir(dst_file.parent, dry_run=dry_run, logf=logf)
+                dst_stat = dest_cache.lookup(dst_file)  # (size, mtime) or None
 
                 src_size, src_mtime = safe_stat_size_mtime(src_file)
                 if src_size is None or src_mtime is None:
@@ -830,6 +2231,7 @@ def transfer_tree(
                     continue
 
                 rel_path_posix = str((rel_dir / fname).as_posix())
+                seen_files.append((fname, (int(src_size), float(src_mtime))))
 
                 do_move = should_move(
                     src_file=src_file,
@@ -843,41 +2245,42 @@ def transfer_tree(
                 # A MOVE-category destination is never legitimately empty when the source isn't,
                 # so replace it unconditionally (regardless of --overwrite) instead of letting it
                 # fall into the "kept src" mismatch skip below, which would leave it broken forever.
-                if dst_file.exists() and do_move and int(src_size) > 0:
-                    try:
-                        dst_size_for_empty_check = dst_file.stat().st_size
-                    except Exception:
-                        dst_size_for_empty_check = None
-                    if dst_size_for_empty_check == 0:
+                if dst_stat is not None and do_move and int(src_size) > 0:
+                    if dst_stat[0] == 0:
                         if dry_run:
                             logf(f"[DEL ] {dst_file} (empty destination, treated as corrupt, will re-copy)")
                         else:
                             try:
                                 dst_file.unlink()
+                                dest_cache.forget_file(dst_file)
+                                dst_stat = None
                                 logf(f"[DEL ] {dst_file} (empty destination, treated as corrupt, will re-copy)")
                             except Exception as e:
                                 logf(f"[ERROR] Cannot delete empty dst: {dst_file} ({e})")
                                 errors += 1
                                 continue
 
-                if dst_file.exists() and (not overwrite) and do_move:
+                if dst_stat is not None and (not overwrite) and do_move:
                     try:
-                        ok = partial_hash_match(
-                            src_file, dst_file, rel_path_posix,
-                            blocks=sample_blocks, block_size=block_size
+                        ok = verify_existing(
+                            existing_tier, src_file, dst_file, rel_path_posix,
+                            blocks=sample_blocks, block_size=block_size,
+                            src_size=int(src_size), dst_size=dst_stat[0],
+                            src_mtime=float(src_mtime), dst_mtime=dst_stat[1],
+                            sampler=sampler,
                         )
                     except Exception as e:
-                        logf(f"[ERROR] Partial-hash compare failed: {src_file} vs {dst_file} ({e})")
+                        logf(f"[ERROR] Compare ({existing_tier}) failed: {src_file} vs {dst_file} ({e})")
                         errors += 1
                         ok = False
 
                     if ok:
                         if dry_run:
-                            logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, partial-hash match)")
+                            logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, {VERIFY_LABELS[existing_tier]})")
                         else:
                             try:
                                 src_file.unlink()
-                                logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, partial-hash match)")
+                                logf(f"[DEL-SRC] {src_file} (dst exists, MOVE-category, {VERIFY_LABELS[existing_tier]})")
                             except Exception as e:
                                 logf(f"[ERROR] Cannot delete source: {src_file} ({e})")
                                 errors += 1
@@ -894,15 +2297,16 @@ def transfer_tree(
                                 "size": int(src_size),
                                 "mtime": float(src_mtime),
                                 "action": "DEL-SRC",
-                                "note": "cleanup: dst existed; verified by partial hash; deleted source under current move rules",
+                                "note": (f"cleanup: dst existed; verified by {VERIFY_NOTES[existing_tier]}; "
+                                         f"deleted source under current move rules"),
                             }
-                            append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf)
+                            append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf, writer=mwriter)
                             manifest_index[rel_path_posix] = (int(src_size), float(src_mtime))
                             continue
                     else:
                         mismatched += 1
                         logf(f"[SKIP] dst exists but does NOT match (kept src): {dst_file}")
-                        if has_all_zero_tail(dst_file):
+                        if has_all_zero_tail(dst_file, size=dst_stat[0]):
                             suspected_truncated += 1
                             logf(
                                 f"[WARN] Possible truncated transfer - trailing "
@@ -913,14 +2317,16 @@ def transfer_tree(
                 if manifest_has_entry(manifest_index, rel_path_posix, int(src_size), float(src_mtime)):
                     logf(f"[SKIP-MANIFEST] Already staged/archived per manifest: {rel_path_posix}")
                     skipped_manifest += 1
+                    covered += 1
                     continue
 
-                if dst_file.exists() and overwrite:
+                if dst_stat is not None and overwrite:
                     if dry_run:
                         logf(f"[DEL ] {dst_file}")
                     else:
                         try:
                             dst_file.unlink()
+                            dest_cache.forget_file(dst_file)
                             logf(f"[DEL ] {dst_file}")
                         except Exception as e:
                             logf(f"[ERROR] Cannot delete existing dst: {dst_file} ({e})")
@@ -931,17 +2337,21 @@ def transfer_tree(
                     if dry_run:
                         logf(f"[MOVE] {src_file} -> {dst_file} ({int(src_size) / 1024**3:.3f} GB)")
                     else:
-                        exc = move_with_verify(
+                        exc, method = move_with_verify(
                             src_file, dst_file,
                             rel_path_str=rel_path_posix,
                             sample_blocks=sample_blocks, block_size=block_size,
                             logf=logf,
+                            verify=existing_tier, sampler=sampler, backend=copy_backend,
                         )
                         if exc is not None:
                             logf(f"[ERROR] MOVE failed: {src_file} -> {dst_file} ({exc})")
                             errors += 1
                             continue
-                        logf(f"[MOVE] {src_file} -> {dst_file} ({int(src_size) / 1024**3:.3f} GB, verified)")
+                        logf(f"[MOVE] {src_file} -> {dst_file} ({int(src_size) / 1024**3:.3f} GB, verified, "
+                             f"via {method})")
+                        copy_paths[method] = copy_paths.get(method, 0) + 1
+                        dest_cache.note_file(dst_file, int(src_size), float(src_mtime))
                     moved += 1
 
                     rec = {
@@ -954,7 +2364,7 @@ def transfer_tree(
                         "mtime": float(src_mtime),
                         "action": "MOVE",
                     }
-                    append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf)
+                    append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf, writer=mwriter)
                     manifest_index[rel_path_posix] = (int(src_size), float(src_mtime))
 
                 else:
@@ -962,8 +2372,22 @@ def transfer_tree(
                         logf(f"[COPY] {src_file} -> {dst_file} ({int(src_size) / 1024**2:.1f} MB)")
                     else:
                         try:
-                            shutil.copy2(str(src_file), str(dst_file))
-                            logf(f"[COPY] {src_file} -> {dst_file} ({int(src_size) / 1024**2:.1f} MB)")
+                            method = copy_file(src_file, dst_file, copy_backend)
+                            # Plain COPYs are only checked with an explicit --verify tier.
+                            if verify and not verify_existing(
+                                verify, src_file, dst_file, rel_path_posix,
+                                blocks=sample_blocks, block_size=block_size,
+                                src_size=int(src_size), src_mtime=float(src_mtime),
+                                sampler=sampler,
+                            ):
+                                try:
+                                    dst_file.unlink()
+                                except Exception as ce:
+                                    logf(f"[WARN] Could not remove mismatched destination: {dst_file} ({ce})")
+                                raise RuntimeError(f"copy failed verification ({verify})")
+                            logf(f"[COPY] {src_file} -> {dst_file} ({int(src_size) / 1024**2:.1f} MB, via {method})")
+                            copy_paths[method] = copy_paths.get(method, 0) + 1
+                            dest_cache.note_file(dst_file, int(src_size), float(src_mtime))
                         except Exception as e:
                             logf(f"[ERROR] COPY failed: {src_file} -> {dst_file} ({e})")
                             errors += 1
@@ -980,14 +2404,33 @@ def transfer_tree(
                         "mtime": float(src_mtime),
                         "action": "COPY",
                     }
-                    append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf)
+                    append_manifest_record(source_dir, rec, dry_run=dry_run, logf=logf, writer=mwriter)
                     manifest_index[rel_path_posix] = (int(src_size), float(src_mtime))
 
+            if snapshot is not None:
+                snapshot.observe(rel_dir.as_posix(), dir_mtime, len(files), seen_files,
+                                 [d for d in dirs if not (root_path / d).is_symlink()], logf,
+                                 covered=considered == covered)
+
+        if snapshot is not None:
+            if snapshot.skipped_dirs:
+                logf(f"[SNAPSHOT] {snapshot.skipped_dirs} unchanged director(ies) not listed, "
+                     f"{snapshot.skipped_files} file(s) already covered by the manifest (--full-rescan to list all)")
+                skipped_manifest += snapshot.skipped_files
+            if snapshot.expired_dirs:
+                logf(f"[SNAPSHOT] {snapshot.expired_dirs} unchanged director(ies) listed again, "
+                     f"last listed over {snapshot_max_age_h:g} h ago (--snapshot-max-age-h)")
+            # Only after the whole walk: an interrupted run must not mark directories covered.
+            if not dry_run:
+                snapshot.save(logf)
+
         logf("-" * 110)
         logf(f"[INFO] Done: {datetime.now().isoformat(timespec='seconds')}")
         logf(f"[INFO] Copied: {copied} | Moved: {moved} | Deleted-src: {deleted_src} | "
              f"Skipped(manifest): {skipped_manifest} | Mismatched: {mismatched} | "
              f"Suspected-truncated: {suspected_truncated} | Errors: {errors}")
+        if copy_paths:
+            logf("[INFO] Copy paths: " + " | ".join(f"{name}: {n}" for name, n in sorted(copy_paths.items())))
         # Counts alone are easy to skim past in a long log - a mismatch or suspected-truncation is
         # worth an explicit call-to-action line, not just a number next to "Errors: 0".
         if mismatched > 0:
@@ -1000,12 +2443,24 @@ def transfer_tree(
                 mismatched, suspected_truncated, errors, src_log_path, tgt_log_path)
 
     finally:
+        if mwriter is not None:
+            # Writes the last buffered group, also on Ctrl-C (before the database is closed).
+            mwriter.close()
+        if mdb is not None:
+            # Commits the last partial batch, also on Ctrl-C.
+            try:
+                mdb.close()
+            except Exception as e:
+                logf(f"[MANIFEST][ERROR] Failed to close SQLite manifest ({e})")
+
         # Always attempt to remove our copy-lock at the end (best effort)
         try:
             remove_lock_file(copy_lock_path, dry_run=dry_run, logf=logf)
         except Exception:
             pass
 
+        # Drains the log queue; must come before the handles are closed.
+        logf.close()
         if src_log_handle:
             src_log_handle.close()
         if tgt_log_handle:
@@ -1037,15 +2492,96 @@ def main() -> int:
                     help=f"Number of blocks to sample for partial hash. Default: {DEFAULT_SAMPLE_BLOCKS}")
     ap.add_argument("--sample-block-kb", type=int, default=DEFAULT_SAMPLE_BLOCK_KB,
                     help=f"Block size (KB) for partial hash. Default: {DEFAULT_SAMPLE_BLOCK_KB} (~1MB total)")
-
+    ap.add_argument("--sample-strategy", choices=SAMPLE_STRATEGIES, default=DEFAULT_SAMPLE_STRATEGY,
+                    help="Partial-hash sampling: random (--sample-blocks random blocks) or stratified (always head "
+                         "and tail, plus one block per 1 GB region, so large files get more blocks, capped by "
+                         f"--sample-budget-mb). Default: {DEFAULT_SAMPLE_STRATEGY}")
+    ap.add_argument("--sample-budget-mb", type=int, default=DEFAULT_SAMPLE_BUDGET_MB,
+                    help=f"Per-file read budget (MB) for --sample-strategy stratified. "
+                         f"Default: {DEFAULT_SAMPLE_BUDGET_MB}")
+
+    ap.add_argument("--full-rescan", action="store_true",
+                    help="List every source directory, including ones the directory snapshot "
+                         "(.tape_transfer/dir_snapshot.json) reports as unchanged and fully covered by the manifest. "
+                         "Needed to pick up files rewritten in place, which don't change their directory's mtime.")
+    ap.add_argument("--snapshot-max-age-h", type=float, default=DEFAULT_SNAPSHOT_MAX_AGE_H,
+                    help="Skip an unchanged directory only if it was actually listed within this many hours; older "
+                         "snapshot entries are listed again, so a file rewritten in place is picked up within this "
+                         f"time. 0 lists every directory. Default: {DEFAULT_SNAPSHOT_MAX_AGE_H:g}")
     ap.add_argument("--ignore-manifest", action="store_true",
                     help="Ignore manifest and process files as if none were previously staged/archived.")
+    ap.add_argument("--verify", choices=VERIFY_TIERS, default=None,
+                    help="Verification tier for every source/destination check: size (size/mtime only), sample "
+                         "(partial hash) or full (full-content hash of both files, streamed in parallel). Applies to "
+                         "existing destinations before a source is deleted, to cross-volume moves and to copies. "
+                         "Default: sample for existing destinations and moves, no check for copies")
+    ap.add_argument("--manifest-db", action="store_true",
+                    help="Use the indexed SQLite manifest (.tape_transfer/manifest.sqlite) instead of re-parsing "
+                         "manifest.ndjson on every start; existing NDJSON history is imported once. Once the database "
+                         "exists it is used automatically, with or without this flag.")
+    ap.add_argument("--copy-backend", choices=COPY_BACKENDS, default=DEFAULT_COPY_BACKEND,
+                    help="auto: on Linux, copy in the kernel where possible (reflink, then copy_file_range, then "
+                         "sendfile) before falling back to shutil.copy2; copy2: always shutil.copy2. Each file's "
+                         f"path is logged. Default: {DEFAULT_COPY_BACKEND}")
+    ap.add_argument("--console", choices=CONSOLE_MODES, default=DEFAULT_CONSOLE_MODE,
+                    help="Per-file lines ([COPY]/[MOVE]/[SKIP]/...) on the console: all, rate (rate-limited, see "
+                         "--console-rate) or quiet (log file only). Header, summary, warnings and errors are always "
+                         f"shown. The log files always get every line. Default: {DEFAULT_CONSOLE_MODE}")
+    ap.add_argument("--console-rate", type=int, default=DEFAULT_CONSOLE_RATE,
+                    help=f"Per-file console lines per second with --console rate. Default: {DEFAULT_CONSOLE_RATE}")
+
+    ap.add_argument("--manifest-fsync", choices=MANIFEST_FSYNC_POLICIES, default=DEFAULT_MANIFEST_FSYNC,
+                    help="When manifest writes are forced to disk: none (OS decides), batch (once per written "
+                         "group) or every (each record, slowest). Default: " + DEFAULT_MANIFEST_FSYNC)
+    ap.add_argument("--manifest-flush-records", type=int, default=DEFAULT_MANIFEST_FLUSH_RECORDS,
+                    help=f"Write buffered manifest records after this many. Default: {DEFAULT_MANIFEST_FLUSH_RECORDS}")
+    ap.add_argument("--manifest-flush-s", type=float, default=DEFAULT_MANIFEST_FLUSH_S,
+                    help=f"...or after this many seconds, whichever comes first. Default: {DEFAULT_MANIFEST_FLUSH_S}")
+
+    ap.add_argument("--profile", action="store_true",
+                    help="Profile the run (cProfile on all threads, plus call counts and wall-clock times of "
+                         "verify_existing, partial_hash_match, full_hash, copy_file, move_with_verify, "
+                         "append_manifest_record and the stat/"
+                         "listing helpers). Writes transferProfile_<ts>.txt (hot-path report) and .pstats next to "
+                         "the source transfer log. Slows the run down. Default: off")
 
     args = ap.parse_args()
 
+    # Everything after argument parsing is profiled with --profile.
+    profiler = RunProfiler() if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    try:
+        return _run(args, profiler)
+    finally:
+        if profiler is not None and profiler.log_path is None:
+            profiler.stop()   # stopped before a transfer started; nothing worth a report
+        elif profiler is not None:
+            try:
+                report_path, _ = profiler.write_report(
+                    profiler.log_path, title=f"tapeTransfer.py {__version__} profile: {' '.join(sys.argv[1:])}")
+                print(f"Profile: {report_path}")
+            except Exception as e:
+                print(f"[WARN] Could not write the profile report ({e})")
+
+
+def _run(args, profiler: Optional[RunProfiler]) -> int:
+    if args.manifest_flush_records < 1:
+        print("[ERROR] --manifest-flush-records must be >= 1.")
+        return 2
+    if args.console_rate < 1:
+        print("[ERROR] --console-rate must be >= 1.")
+        return 2
+    if args.snapshot_max_age_h < 0:
+        print("[ERROR] --snapshot-max-age-h must be >= 0.")
+        return 2
+    if args.sample_budget_mb * 1024 < 2 * args.sample_block_kb:
+        print("[ERROR] --sample-budget-mb must cover at least two sample blocks (head and tail).")
+        return 2
+
     user_name = getpass.getuser()
 
-    src_pw = PureWindowsPath(args.source)
+    src_pw = PurePath(args.source)
     if path_contains_tape_transfer(src_pw) and not args.allow_source_in_tape_transfer:
         print("[ERROR] Source path contains 'TAPE_TRANSFER'. Refusing by default to avoid modifying staged data.")
         print("        If you really need to run anyway, pass --allow-source-in-tape-transfer.")
@@ -1104,6 +2640,10 @@ def main() -> int:
     print(f"Manifest: {manifest_path(src)} ({'ignored' if args.ignore_manifest else 'active'})")
     print("-" * 110)
 
+    log_ts = timestamp_for_log()
+    if profiler is not None:
+        profiler.log_path = src / default_log_filename(log_ts)
+
     (copied, moved, deleted_src, skipped_manifest,
      mismatched, suspected_truncated, errors, src_log_path, tgt_log_path) = transfer_tree(
         source_dir=src,
@@ -1120,6 +2660,19 @@ def main() -> int:
         lock_file=tape_process_lock,
         user_name=user_name,
         ignore_manifest=args.ignore_manifest,
+        manifest_db=args.manifest_db,
+        manifest_fsync=args.manifest_fsync,
+        manifest_flush_records=args.manifest_flush_records,
+        manifest_flush_s=args.manifest_flush_s,
+        console=args.console,
+        console_rate=args.console_rate,
+        verify=args.verify,
+        sample_strategy=args.sample_strategy,
+        sample_budget_mb=args.sample_budget_mb,
+        copy_backend=args.copy_backend,
+        full_rescan=args.full_rescan,
+        snapshot_max_age_h=args.snapshot_max_age_h,
+        log_ts=log_ts,
     )
 
     print("-" * 110)
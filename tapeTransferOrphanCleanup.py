@@ -61,12 +61,17 @@ tapeTransfer.py, with action "DEL-SRC-ORPHAN".
 
 Version history
 ----------------
+1.1.0 (2026-10-18): Reads the SQLite manifest (.tape_transfer/manifest.sqlite, tapeTransfer.py 1.2.0)
+directly when it exists: one indexed query per candidate file instead of loading the full manifest history
+into memory. Without it, manifest.ndjson is parsed as before.
+1.1.1 (2026-10-18): Fix: the read-only SQLite manifest (and the log file) are closed in a finally block,
+so an exception in the candidate/delete loop no longer leaks the connection.
 
 """
 
 from __future__ import annotations
 
-__version__ = "1.0.0"
+__version__ = "1.1.1"
 __author__  = "Simon Musall"
 __email__   = "s.musall@fz-juelich.de"
 
@@ -76,7 +81,7 @@ import json
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 from tapeTransfer import (
     LOCK_FILENAME,
@@ -84,6 +89,8 @@ from tapeTransfer import (
     compute_target_path,
     tape_transfer_root,
     manifest_path,
+    manifest_db_path,
+    SqliteManifest,
     append_manifest_record,
     normalize_exts,
     normalize_keywords,
@@ -116,6 +123,32 @@ def load_manifest_full(source_root: Path) -> Dict[str, dict]:
     return index
 
 
+class ManifestDbIndex:
+    """
+    relpath -> most recent manifest record, answered by the SQLite manifest one
+    indexed query at a time. Supports the .get() and len() that main() uses on
+    the dict from load_manifest_full().
+    """
+
+    def __init__(self, db: SqliteManifest):
+        self.db = db
+
+    def get(self, relpath: str, default: Optional[dict] = None) -> Optional[dict]:
+        rec = self.db.latest_record(relpath)
+        return rec if rec is not None else default
+
+    def __len__(self) -> int:
+        return self.db.relpath_count()
+
+
+def load_manifest_db(source_root: Path) -> Optional[ManifestDbIndex]:
+    """Read-only view of .tape_transfer/manifest.sqlite, or None if it does not exist."""
+    db_path = manifest_db_path(source_root)
+    if not db_path.exists():
+        return None
+    return ManifestDbIndex(SqliteManifest(db_path, readonly=True))
+
+
 def manifest_record_matches(rec: dict, size: int, mtime: float) -> bool:
     rsize = rec.get("size")
     rmtime = rec.get("mtime")
@@ -204,106 +237,115 @@ def main() -> int:
         logf(f"[LOCK] Found lock at {tape_root}; forced DRY RUN regardless of --delete.")
     logf("-" * 110)
 
-    manifest_index = load_manifest_full(src)
-    logf(f"[MANIFEST] Loaded {len(manifest_index)} entries from {manifest_path(src)}")
-
-    candidates = []  # (relpath, src_file, size, rec)
-    checked = 0
-
-    for root, dirs, files in os.walk(src):
-        root_path = Path(root)
-        rel_dir = root_path.relative_to(src)
-
-        for fname in files:
-            if fname.startswith(("transferLog_", "orphanCandidates_", "orphanCleanupLog_")):
-                continue
-            src_file = root_path / fname
-            if ".tape_transfer" in src_file.parts:
-                continue
-
-            checked += 1
-            src_size, src_mtime = safe_stat_size_mtime(src_file)
-            if src_size is None or src_mtime is None:
-                continue
-
-            rel_path_posix = str((rel_dir / fname).as_posix())
-            rec = manifest_index.get(rel_path_posix)
-            if rec is None or not manifest_record_matches(rec, int(src_size), float(src_mtime)):
-                continue
-
-            if not should_move(src_file, int(src_size), max_bytes, move_exts, include_keywords):
-                continue  # COPY-category files are meant to stay in source forever
-
-            dst_file = target_root / rel_dir / fname
-            if dst_file.exists():
-                continue  # not orphaned - tapeTransfer.py's own DEL-SRC verification path covers this
-
-            candidates.append((rel_path_posix, src_file, int(src_size), rec))
-
-    logf(f"[INFO] Files checked: {checked} | Orphan candidates found: {len(candidates)}")
-    logf("-" * 110)
-
-    now = datetime.now()
-    eligible_count = 0
-    deleted = 0
-    errors = 0
-
-    with open(report_path, "w", encoding="utf-8", newline="\n") as rpt:
-        rpt.write(f"# orphan candidates for {src}\n")
-        rpt.write(f"# generated {now.isoformat(timespec='seconds')} by {user_name}\n")
-        rpt.write(f"# min-age-days={args.min_age_days} maxSize={args.maxSize}GB move-ext={sorted(move_exts)} move-keyword={include_keywords}\n")
-        rpt.write("# relpath | size_GB | manifest_action | manifest_ts | age_days | eligible | source_path\n")
-
-        for rel_path_posix, src_file, size, rec in candidates:
-            action = rec.get("action", "?")
-            rec_ts = rec.get("ts")
-            try:
-                age_days = (now - datetime.fromisoformat(rec_ts)).total_seconds() / 86400.0
-            except Exception:
-                age_days = None
-
-            eligible = age_days is not None and age_days >= args.min_age_days
-            if eligible:
-                eligible_count += 1
-
-            size_gb = size / 1024**3
-            line = (f"{rel_path_posix} | {size_gb:.3f} GB | {action} | {rec_ts} | "
-                    f"{'?' if age_days is None else f'{age_days:.1f}'} | "
-                    f"{'ELIGIBLE' if eligible else 'TOO_RECENT'} | {src_file}")
-            rpt.write(line + "\n")
-            logf(f"[CANDIDATE] {line}")
-
-            if not dry_run and eligible:
+    manifest_db = load_manifest_db(src)
+    try:
+        if manifest_db is not None:
+            manifest_index = manifest_db
+            logf(f"[MANIFEST] Using SQLite manifest: {manifest_db_path(src)} ({len(manifest_index)} entries)")
+        else:
+            manifest_index = load_manifest_full(src)
+            logf(f"[MANIFEST] Loaded {len(manifest_index)} entries from {manifest_path(src)}")
+
+        candidates = []  # (relpath, src_file, size, rec)
+        checked = 0
+
+        for root, dirs, files in os.walk(src):
+            root_path = Path(root)
+            rel_dir = root_path.relative_to(src)
+
+            for fname in files:
+                if fname.startswith(("transferLog_", "orphanCandidates_", "orphanCleanupLog_")):
+                    continue
+                src_file = root_path / fname
+                if ".tape_transfer" in src_file.parts:
+                    continue
+
+                checked += 1
+                src_size, src_mtime = safe_stat_size_mtime(src_file)
+                if src_size is None or src_mtime is None:
+                    continue
+
+                rel_path_posix = str((rel_dir / fname).as_posix())
+                rec = manifest_index.get(rel_path_posix)
+                if rec is None or not manifest_record_matches(rec, int(src_size), float(src_mtime)):
+                    continue
+
+                if not should_move(src_file, int(src_size), max_bytes, move_exts, include_keywords):
+                    continue  # COPY-category files are meant to stay in source forever
+
+                dst_file = target_root / rel_dir / fname
+                if dst_file.exists():
+                    continue  # not orphaned - tapeTransfer.py's own DEL-SRC verification path covers this
+
+                candidates.append((rel_path_posix, src_file, int(src_size), rec))
+
+        logf(f"[INFO] Files checked: {checked} | Orphan candidates found: {len(candidates)}")
+        logf("-" * 110)
+
+        now = datetime.now()
+        eligible_count = 0
+        deleted = 0
+        errors = 0
+
+        with open(report_path, "w", encoding="utf-8", newline="\n") as rpt:
+            rpt.write(f"# orphan candidates for {src}\n")
+            rpt.write(f"# generated {now.isoformat(timespec='seconds')} by {user_name}\n")
+            rpt.write(f"# min-age-days={args.min_age_days} maxSize={args.maxSize}GB move-ext={sorted(move_exts)} move-keyword={include_keywords}\n")
+            rpt.write("# relpath | size_GB | manifest_action | manifest_ts | age_days | eligible | source_path\n")
+
+            for rel_path_posix, src_file, size, rec in candidates:
+                action = rec.get("action", "?")
+                rec_ts = rec.get("ts")
                 try:
-                    src_file.unlink()
-                    logf(f"[DEL-SRC-ORPHAN] {src_file}")
-                    deleted += 1
-                    del_rec = {
-                        "ts": datetime.now().isoformat(timespec="seconds"),
-                        "user": user_name,
-                        "source_root": str(src),
-                        "target_root": str(target_root),
-                        "relpath": rel_path_posix,
-                        "size": size,
-                        "mtime": rec.get("mtime"),
-                        "action": "DEL-SRC-ORPHAN",
-                        "note": (f"orphan cleanup: dst missing under TAPE_TRANSFER (assumed archived to tape); "
-                                 f"size+mtime matched manifest entry from {rec_ts} (action={action}); "
-                                 f"no live hash verification possible; age_days={age_days:.1f} >= min_age_days={args.min_age_days}"),
-                    }
-                    append_manifest_record(src, del_rec, dry_run=False, logf=logf)
-                except Exception as e:
-                    logf(f"[ERROR] Cannot delete source: {src_file} ({e})")
-                    errors += 1
-
-    logf("-" * 110)
-    logf(f"[INFO] Done: {datetime.now().isoformat(timespec='seconds')}")
-    logf(f"[INFO] Candidates: {len(candidates)} | Eligible: {eligible_count} | "
-         f"Deleted: {deleted} | Errors: {errors}")
-    logf(f"[INFO] Report: {report_path}")
-    logf(f"[INFO] Log: {log_path}")
-
-    log_handle.close()
+                    age_days = (now - datetime.fromisoformat(rec_ts)).total_seconds() / 86400.0
+                except Exception:
+                    age_days = None
+
+                eligible = age_days is not None and age_days >= args.min_age_days
+                if eligible:
+                    eligible_count += 1
+
+                size_gb = size / 1024**3
+                line = (f"{rel_path_posix} | {size_gb:.3f} GB | {action} | {rec_ts} | "
+                        f"{'?' if age_days is None else f'{age_days:.1f}'} | "
+                        f"{'ELIGIBLE' if eligible else 'TOO_RECENT'} | {src_file}")
+                rpt.write(line + "\n")
+                logf(f"[CANDIDATE] {line}")
+
+                if not dry_run and eligible:
+                    try:
+                        src_file.unlink()
+                        logf(f"[DEL-SRC-ORPHAN] {src_file}")
+                        deleted += 1
+                        del_rec = {
+                            "ts": datetime.now().isoformat(timespec="seconds"),
+                            "user": user_name,
+                            "source_root": str(src),
+                            "target_root": str(target_root),
+                            "relpath": rel_path_posix,
+                            "size": size,
+                            "mtime": rec.get("mtime"),
+                            "action": "DEL-SRC-ORPHAN",
+                            "note": (f"orphan cleanup: dst missing under TAPE_TRANSFER (assumed archived to tape); "
+                                     f"size+mtime matched manifest entry from {rec_ts} (action={action}); "
+                                     f"no live hash verification possible; age_days={age_days:.1f} >= min_age_days={args.min_age_days}"),
+                        }
+                        append_manifest_record(src, del_rec, dry_run=False, logf=logf)
+                    except Exception as e:
+                        logf(f"[ERROR] Cannot delete source: {src_file} ({e})")
+                        errors += 1
+
+        logf("-" * 110)
+        logf(f"[INFO] Done: {datetime.now().isoformat(timespec='seconds')}")
+        logf(f"[INFO] Candidates: {len(candidates)} | Eligible: {eligible_count} | "
+             f"Deleted: {deleted} | Errors: {errors}")
+        logf(f"[INFO] Report: {report_path}")
+        logf(f"[INFO] Log: {log_path}")
+    finally:
+        # Read-only; closed on every path, also when the candidate/delete loop raises.
+        if manifest_db is not None:
+            manifest_db.db.close()
+        log_handle.close()
 
     return 0 if errors == 0 else 1
 
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+
+"""
+transferBenchmark.py
+
+Benchmark for the serverTransfer.py / tapeTransfer.py transfer engines, so a
+change to either can be measured instead of guessed at. Generates reproducible
+synthetic trees under a work directory (a temp directory by default) and runs
+the engine's transfer_tree() on them in several scenarios, reporting files/s,
+MB/s and file-system metadata calls per file. Results are written as JSON and
+can be compared against an earlier results file with --baseline.
+
+Trees (same --seed, same names, sizes, contents and mtimes):
+  bpod - many tiny Bpod-like session .mat files (a few KB to ~100 KB each),
+         <animal>/<protocol>/Session Data/<animal>_<protocol>_<date>_Session<k>.mat
+  phy  - deep phy/Kilosort output trees: per recording a handful of .npy/.tsv
+         files a few directories down, plus small .phy/ cache folders below that
+  bin  - a few multi-GB .bin files (raw ephys/imaging-like). Each file is created
+         sparse at its final size, then filled with data block by block, so it
+         has real (non-hole) content like a file written by an acquisition PC
+
+Scenarios (each starts from a fresh copy of the generated source tree; the copy
+is made with hard links where the file system allows, so it costs no data I/O):
+  copy    - everything COPY-category into an empty destination
+  move    - everything MOVE-category (--maxSize 0); renames when the destination
+            is on the same volume, verified copy + delete otherwise (--target-dir)
+  rerun   - a second run after "copy" (untimed), answered from the manifest
+  cleanup - destination already holds identical copies (made untimed) and
+            everything is MOVE-category: verify by partial hash, delete source
+
+Metadata calls are os.stat/os.lstat calls plus the os.scandir, os.listdir,
+os.mkdir, os.remove, os.rmdir, os.rename/os.replace, os.utime and os.chmod audit
+events during the timed run, from all threads. File opens are counted
+separately. DirEntry.stat() is not counted (free on Windows, where scandir
+returns it with the listing). Source files are usually in the page cache after
+generation, so MB/s reflects warm-cache reads unless --target-dir points at a
+slower volume.
+
+Without --keep, everything is removed afterwards: the temp directory, or, with a
+given --work-dir, only what this run created in it (pristine/<tree> trees it
+generated, src/ and dst/); the directory itself and anything else in it stay.
+
+Usage
+-----
+python transferBenchmark.py
+python transferBenchmark.py --scale medium --out bench_before.json
+python transferBenchmark.py --scale medium --out bench_after.json --baseline bench_before.json
+python transferBenchmark.py --tool tape --trees bpod phy --scenarios copy rerun
+python transferBenchmark.py --work-dir D:\\bench --target-dir \\\\naskampa.kampa-10g\\data\\bench --workers 8
+
+Version history
+---------------
+1.0.1 (2026-10-18): Fix: a given --work-dir is no longer deleted as a whole after the run, only the
+trees and folders the benchmark created in it.
+"""
+
+import argparse
+import contextlib
+import importlib
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+__version__ = "1.0.1"
+
+
+# ----------------------------
+# Synthetic trees
+# ----------------------------
+TREES = ("bpod", "phy", "bin")
+SCENARIOS = ("copy", "move", "rerun", "cleanup")
+TOOLS = {"server": "serverTransfer", "tape": "tapeTransfer"}
+
+# Per --scale: bpod files, phy recordings, number of .bin files, GB per .bin file.
+SCALES = {
+    "small": {"bpod_files": 2_000, "phy_recordings": 20, "bin_files": 2, "bin_gb": 0.25},
+    "medium": {"bpod_files": 20_000, "phy_recordings": 100, "bin_files": 2, "bin_gb": 2.0},
+    "large": {"bpod_files": 100_000, "phy_recordings": 400, "bin_files": 3, "bin_gb": 8.0},
+}
+DEFAULT_SCALE = "small"
+
+BASE_MTIME = 1_700_000_000.0          # fixed mtimes keep manifest decisions reproducible
+FILL_BLOCK_BYTES = 16 * 1024 * 1024   # .bin files are filled in blocks of this size
+
+BPOD_PROTOCOLS = ("SpatialDisc", "Detection", "Habituation", "AudioTask")
+PHY_FILES = (
+    ("spike_times.npy", 400_000), ("spike_clusters.npy", 200_000), ("spike_templates.npy", 200_000),
+    ("amplitudes.npy", 200_000), ("templates.npy", 2_000_000), ("channel_map.npy", 3_000),
+    ("channel_positions.npy", 6_000), ("whitening_mat.npy", 600_000), ("similar_templates.npy", 150_000),
+    ("cluster_group.tsv", 4_000), ("cluster_KSLabel.tsv", 4_000), ("cluster_info.tsv", 40_000),
+    ("params.py", 300),
+)
+
+
+def _payload(rng: random.Random, size: int) -> bytes:
+    return rng.randbytes(size)
+
+
+def _set_mtime(path: Path, k: int) -> None:
+    t = BASE_MTIME + k
+    os.utime(path, (t, t))
+
+
+def generate_bpod(root: Path, rng: random.Random, n_files: int) -> None:
+    animals = [f"mSM{60 + i}" for i in range(max(1, n_files // 500))]
+    for k in range(n_files):
+        animal = animals[k % len(animals)]
+        protocol = BPOD_PROTOCOLS[(k // len(animals)) % len(BPOD_PROTOCOLS)]
+        day = k // (len(animals) * len(BPOD_PROTOCOLS))
+        folder = root / animal / protocol / "Session Data"
+        folder.mkdir(parents=True, exist_ok=True)
+        date = datetime.fromtimestamp(BASE_MTIME + 86_400 * day).strftime("%b%d_%Y")
+        path = folder / f"{animal}_{protocol}_{date}_Session{k}.mat"
+        path.write_bytes(_payload(rng, rng.randint(2_000, 100_000)))
+        _set_mtime(path, k)
+
+
+def generate_phy(root: Path, rng: random.Random, n_recordings: int) -> None:
+    k = 0
+    for rec in range(n_recordings):
+        rec_dir = root / f"mSM{80 + rec % 7}" / f"2024-{1 + rec % 12:02d}-{1 + rec % 28:02d}_{rec}" / "ephys"
+        for probe in range(2):
+            ks_dir = rec_dir / f"catgt_run{rec}_g0" / f"run{rec}_g0_imec{probe}" / "kilosort4"
+            cache_dir = ks_dir / ".phy" / "spikes_per_cluster"
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            for name, size in PHY_FILES:
+                path = ks_dir / name
+                path.write_bytes(_payload(rng, size))
+                _set_mtime(path, k)
+                k += 1
+            for cluster in range(8):
+                path = cache_dir / f"spikes_{cluster}.npy"
+                path.write_bytes(_payload(rng, 4_000))
+                _set_mtime(path, k)
+                k += 1
+
+
+def generate_bin(root: Path, rng: random.Random, n_files: int, gb: float) -> None:
+    """Sparse at full size first, then filled block by block with non-repeating data."""
+    root.mkdir(parents=True, exist_ok=True)
+    size = int(gb * 1024**3)
+    block = bytearray(_payload(rng, FILL_BLOCK_BYTES))
+    for i in range(n_files):
+        path = root / f"run{i}_g0_t0.imec0.ap.bin"
+        with open(path, "wb") as f:
+            f.truncate(size)
+            pos = 0
+            while pos < size:
+                # Stamp file and block number into each block, so no two blocks are equal
+                # (partial-hash samples and dedup-capable storage see distinct data).
+                block[:16] = i.to_bytes(8, "little") + pos.to_bytes(8, "little")
+                f.write(block[:min(len(block), size - pos)])
+                pos += len(block)
+        _set_mtime(path, i)
+
+
+def generate_tree(kind: str, root: Path, *, scale: dict, seed: int) -> None:
+    rng = random.Random(f"{seed}:{kind}")
+    if kind == "bpod":
+        generate_bpod(root, rng, scale["bpod_files"])
+    elif kind == "phy":
+        generate_phy(root, rng, scale["phy_recordings"])
+    elif kind == "bin":
+        generate_bin(root, rng, scale["bin_files"], scale["bin_gb"])
+    else:
+        raise ValueError(f"Unknown tree: {kind}")
+
+
+def tree_totals(root: Path) -> tuple:
+    files = size = 0
+    for dirpath, _dirs, names in os.walk(root):
+        for name in names:
+            files += 1
+            size += os.stat(os.path.join(dirpath, name)).st_size
+    return files, size
+
+
+def clone_tree(src: Path, dst: Path) -> None:
+    """Copy of src at dst, by hard links where possible (no data I/O), else shutil.copy2."""
+    def link_or_copy(a, b):
+        try:
+            os.link(a, b)
+        except OSError:
+            shutil.copy2(a, b)
+    shutil.copytree(src, dst, copy_function=link_or_copy)
+
+
+# ----------------------------
+# Metadata call counting
+# ----------------------------
+# os.stat/os.lstat have no audit event, so they are wrapped for the timed run; the
+# other calls are counted from audit events (an audit hook can't be removed again,
+# so it stays installed and only counts while a MetadataCounter is active).
+METADATA_AUDIT_EVENTS = {
+    "os.scandir": "scandir", "os.listdir": "listdir", "os.mkdir": "mkdir", "os.remove": "remove",
+    "os.rmdir": "rmdir", "os.rename": "rename", "os.utime": "utime", "os.chmod": "chmod",
+    "open": "open",
+}
+_active_counter = None
+
+
+def _audit_hook(event: str, args) -> None:
+    counter = _active_counter
+    if counter is not None and event in METADATA_AUDIT_EVENTS:
+        counter.add(METADATA_AUDIT_EVENTS[event])
+
+
+class MetadataCounter:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self._originals = {}
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+
+    def _wrap(self, name: str, func):
+        def counted(*args, **kwargs):
+            self.add(name)
+            return func(*args, **kwargs)
+        return counted
+
+    def __enter__(self) -> "MetadataCounter":
+        global _active_counter
+        for name in ("stat", "lstat"):
+            self._originals[name] = getattr(os, name)
+            setattr(os, name, self._wrap(name, self._originals[name]))
+        _active_counter = self
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global _active_counter
+        _active_counter = None
+        for name, func in self._originals.items():
+            setattr(os, name, func)
+
+    @property
+    def metadata_calls(self) -> int:
+        return sum(n for name, n in self.calls.items() if name != "open")
+
+
+sys.addaudithook(_audit_hook)
+
+
+# ----------------------------
+# Scenarios
+# ----------------------------
+# Return tuples of the two engines' transfer_tree(), by name (log paths dropped).
+RESULT_FIELDS = {
+    "server": ("copied", "moved", "deleted_src", "skipped_manifest", "skipped_existing",
+               "mismatched", "suspected_truncated", "errors"),
+    "tape": ("copied", "moved", "deleted_src", "skipped_manifest",
+             "mismatched", "suspected_truncated", "errors"),
+}
+
+
+def run_transfer(engine, tool: str, src: Path, dst: Path, *, move_all: bool, workers: int) -> dict:
+    params = dict(
+        source_dir=src, target_dir=dst,
+        max_size_gb=0.0 if move_all else 1e6,
+        move_exts=set(), move_keywords=[], include_exts=set(),
+        overwrite=False, dry_run=False,
+        sample_blocks=engine.DEFAULT_SAMPLE_BLOCKS, sample_block_kb=engine.DEFAULT_SAMPLE_BLOCK_KB,
+        forced_by_lock=False, lock_file=dst.parent / "benchmark.lock", user_name="benchmark",
+        ignore_manifest=False, retries=0, retry_delay_s=0.0,
+        workers=workers, console="quiet", progress_s=0,
+    )
+    accepted = inspect.signature(engine.transfer_tree).parameters
+    params = {k: v for k, v in params.items() if k in accepted}
+    # The engine's header/summary lines would drown the benchmark table; its log files still get them.
+    # Synthetic runs must not replace the throughput measured on real transfers (--plan estimates).
+    saved_throughput = getattr(engine, "save_measured_throughput", None)
+    if saved_throughput is not None:
+        engine.save_measured_throughput = lambda *a, **k: None
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = engine.transfer_tree(**params)
+    finally:
+        if saved_throughput is not None:
+            engine.save_measured_throughput = saved_throughput
+    return dict(zip(RESULT_FIELDS[tool], result))
+
+
+def run_scenario(engine, tool: str, scenario: str, pristine: Path, work: Path, target_base: Path,
+                 *, workers: int) -> dict:
+    src = work / "src" / pristine.name
+    dst = target_base / "dst" / pristine.name
+    for d in (src, dst):
+        if d.exists():
+            shutil.rmtree(d)
+    clone_tree(pristine, src)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    move_all = scenario in ("move", "cleanup")
+    if scenario == "rerun":
+        run_transfer(engine, tool, src, dst, move_all=False, workers=workers)
+    elif scenario == "cleanup":
+        shutil.copytree(pristine, dst)   # real copies, so verification reads both sides
+
+    files, size = tree_totals(pristine)
+    with MetadataCounter() as meta:
+        t0 = time.perf_counter()
+        counts = run_transfer(engine, tool, src, dst, move_all=move_all, workers=workers)
+        seconds = time.perf_counter() - t0
+    return {
+        "tree": pristine.name,
+        "scenario": scenario,
+        "files": files,
+        "bytes": size,
+        "seconds": round(seconds, 3),
+        "files_s": round(files / seconds, 1),
+        "mb_s": round(size / 1024**2 / seconds, 1),
+        "metadata_calls": meta.metadata_calls,
+        "metadata_per_file": round(meta.metadata_calls / max(files, 1), 2),
+        "opens_per_file": round(meta.calls["open"] / max(files, 1), 2),
+        "metadata_by_call": dict(sorted(meta.calls.items())),
+        "counts": counts,
+    }
+
+
+def compare_to_baseline(results: list, baseline_path: Path) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["tree"], r["scenario"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared to baseline {baseline_path}:")
+    print(f"{'tree':<6} {'scenario':<8} {'seconds':<26} {'files/s':>9} {'MB/s':>9}  {'meta/file':<16}")
+    for r in results:
+        b = baseline.get((r["tree"], r["scenario"]))
+        if b is None:
+            print(f"{r['tree']:<6} {r['scenario']:<8} (not in baseline)")
+            continue
+
+        def pct(new, old):
+            return f"{100.0 * (new - old) / old:+.1f}%" if old else "n/a"
+        print(f"{r['tree']:<6} {r['scenario']:<8} "
+              f"{b['seconds']:>7.2f} -> {r['seconds']:<7.2f} {pct(r['seconds'], b['seconds']):>7} "
+              f"{pct(r['files_s'], b['files_s']):>9} {pct(r['mb_s'], b['mb_s']):>9}  "
+              f"{b['metadata_per_file']:.2f} -> {r['metadata_per_file']:.2f}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark serverTransfer.py/tapeTransfer.py transfer_tree() "
+                                             "on reproducible synthetic trees.")
+    ap.add_argument("--tool", choices=sorted(TOOLS), default="server",
+                    help="Which engine to benchmark. Default: server")
+    ap.add_argument("--trees", nargs="+", choices=TREES, default=list(TREES),
+                    help=f"Synthetic trees to generate. Default: {' '.join(TREES)}")
+    ap.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS),
+                    help=f"Scenarios to run on each tree. Default: {' '.join(SCENARIOS)}")
+    ap.add_argument("--scale", choices=sorted(SCALES), default=DEFAULT_SCALE,
+                    help="Tree sizes: " + "; ".join(
+                        f"{name}: {s['bpod_files']} bpod files, {s['phy_recordings']} phy recordings, "
+                        f"{s['bin_files']} x {s['bin_gb']} GB .bin" for name, s in SCALES.items())
+                    + f". Default: {DEFAULT_SCALE}")
+    ap.add_argument("--seed", type=int, default=0, help="Seed for names, sizes and contents. Default: 0")
+    ap.add_argument("--workers", type=int, default=1, help="--workers passed to the engine. Default: 1")
+    ap.add_argument("--work-dir", default=None,
+                    help="Where trees are generated and sources are placed. Default: a new temp directory")
+    ap.add_argument("--target-dir", default=None,
+                    help="Where destinations go, e.g. a share or another volume (for cross-volume moves). "
+                         "Default: inside --work-dir")
+    ap.add_argument("--out", default=None,
+                    help="Results JSON. Default: transferBenchmark_<tool>_<timestamp>.json in the current folder")
+    ap.add_argument("--baseline", default=None, help="Earlier results JSON to compare against.")
+    ap.add_argument("--keep", action="store_true", help="Keep the generated trees and transfer results.")
+    args = ap.parse_args()
+
+    engine = importlib.import_module(TOOLS[args.tool])
+    scale = SCALES[args.scale]
+    work = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="transferBenchmark_"))
+    generated = []   # pristine trees made by this run (a given --work-dir may hold kept ones)
+    target_base = Path(args.target_dir) if args.target_dir else work
+    out_path = Path(args.out) if args.out else Path(
+        f"transferBenchmark_{args.tool}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+    print(f"Engine: {TOOLS[args.tool]}.py {engine.__version__} | scale: {args.scale} | seed: {args.seed} | "
+          f"workers: {args.workers}")
+    print(f"Work dir: {work}")
+    print(f"Target dir: {target_base}")
+    print("-" * 100)
+
+    results = []
+    try:
+        for kind in args.trees:
+            pristine = work / "pristine" / kind
+            if not pristine.exists():
+                t0 = time.perf_counter()
+                generated.append(pristine)
+                generate_tree(kind, pristine, scale=scale, seed=args.seed)
+                files, size = tree_totals(pristine)
+                print(f"[GEN] {kind}: {files} files, {size / 1024**3:.2f} GB in {time.perf_counter() - t0:.1f}s")
+            for scenario in args.scenarios:
+                r = run_scenario(engine, args.tool, scenario, pristine, work, target_base, workers=args.workers)
+                results.append(r)
+                print(f"[RUN] {kind:<5} {scenario:<8} {r['seconds']:>8.2f}s {r['files_s']:>10.1f} files/s "
+                      f"{r['mb_s']:>9.1f} MB/s {r['metadata_per_file']:>6.2f} meta/file "
+                      f"{r['opens_per_file']:>5.2f} opens/file | {r['counts']}")
+    finally:
+        if not args.keep:
+            if args.work_dir:
+                # Only what this run created; the rest of a user-given --work-dir is left alone.
+                for d in (*generated, work / "src", target_base / "dst"):
+                    shutil.rmtree(d, ignore_errors=True)
+                for d in (work / "pristine", work / "src", target_base / "dst"):
+                    try:
+                        d.rmdir()
+                    except OSError:
+                        pass   # not empty (kept trees of an earlier run) or already gone
+            else:
+                shutil.rmtree(work, ignore_errors=True)
+                if args.target_dir:
+                    shutil.rmtree(target_base / "dst", ignore_errors=True)
+
+    doc = {
+        "tool": f"transferBenchmark.py {__version__}",
+        "engine": f"{TOOLS[args.tool]}.py {engine.__version__}",
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "settings": {"scale": args.scale, **scale, "seed": args.seed, "workers": args.workers,
+                     "target_dir": args.target_dir},
+        "results": results,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=1)
+    print("-" * 100)
+    print(f"Results: {out_path}")
+
+    if args.baseline:
+        compare_to_baseline(results, Path(args.baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -15,7 +15,9 @@ shutil.move for anything not yet copied).
 
 Reuses serverTransfer.py's own partial_hash_match(), so the verification is
 identical to the "MOVE-category + dst exists" cleanup path already built into
-serverTransfer.py/tapeTransfer.py.
+serverTransfer.py/tapeTransfer.py. It also shares serverTransfer.py's
+partial-hash cache, so files already sampled by a serverTransfer.py run (and
+unchanged since) are not read again; --no-hash-cache turns that off.
 
 Default is DRY RUN. Pass --delete to actually remove verified-matching source
 files.
@@ -31,9 +33,16 @@ import os
 from pathlib import Path
 
 from serverTransfer import (
+    configure_hash_cache,
+    default_hash_cache_path,
+    make_sampler,
     partial_hash_match,
+    DEFAULT_HASH_CACHE_MAX_ENTRIES,
     DEFAULT_SAMPLE_BLOCKS,
     DEFAULT_SAMPLE_BLOCK_KB,
+    DEFAULT_SAMPLE_BUDGET_MB,
+    DEFAULT_SAMPLE_STRATEGY,
+    SAMPLE_STRATEGIES,
 )
 
 
@@ -46,11 +55,19 @@ def main() -> None:
     ap.add_argument("--delete", action="store_true", help="Actually delete verified source files (default: dry-run).")
     ap.add_argument("--sample-blocks", type=int, default=DEFAULT_SAMPLE_BLOCKS)
     ap.add_argument("--sample-block-kb", type=int, default=DEFAULT_SAMPLE_BLOCK_KB)
+    ap.add_argument("--sample-strategy", choices=SAMPLE_STRATEGIES, default=DEFAULT_SAMPLE_STRATEGY,
+                    help="Partial-hash sampling, as in serverTransfer.py --sample-strategy.")
+    ap.add_argument("--sample-budget-mb", type=int, default=DEFAULT_SAMPLE_BUDGET_MB)
+    ap.add_argument("--hash-cache", default=None,
+                    help=f"Partial-hash cache shared with serverTransfer.py. Default: {default_hash_cache_path()}")
+    ap.add_argument("--no-hash-cache", action="store_true", help="Re-sample every file; don't use the cache.")
+    ap.add_argument("--hash-cache-max-entries", type=int, default=DEFAULT_HASH_CACHE_MAX_ENTRIES)
     args = ap.parse_args()
 
     source_root = Path(args.source_root)
     dest_root = Path(args.dest_root)
     block_size = args.sample_block_kb * 1024
+    sampler = make_sampler(args.sample_strategy, args.sample_budget_mb)
 
     deleted = mismatched = missing_source = errors = 0
     freed_bytes = 0
@@ -58,6 +75,12 @@ def main() -> None:
     print(f"Mode: {'LIVE' if args.delete else 'DRY RUN'}")
     print(f"Source root: {source_root}")
     print(f"Dest root:   {dest_root}")
+    hash_cache = configure_hash_cache(
+        Path(args.hash_cache) if args.hash_cache else None,
+        enable=not args.no_hash_cache,
+        max_entries=args.hash_cache_max_entries,
+    )
+    print(f"Hash cache:  {hash_cache.db_path if hash_cache is not None else '<off>'}")
     print("-" * 100)
 
     for root, _dirs, files in os.walk(dest_root):
@@ -76,7 +99,7 @@ def main() -> None:
             try:
                 ok = partial_hash_match(
                     src_file, dst_file, rel_path_posix,
-                    blocks=args.sample_blocks, block_size=block_size,
+                    blocks=args.sample_blocks, block_size=block_size, sampler=sampler,
                 )
             except Exception as e:
                 print(f"[ERROR] Hash compare failed: {src_file} vs {dst_file} ({e})")
@@ -109,6 +132,8 @@ def main() -> None:
         f"Done. {verb}: {deleted} files ({freed_bytes / 1024**3:.2f} GB) | "
         f"Mismatched(kept): {mismatched} | Missing source: {missing_source} | Errors: {errors}"
     )
+    if hash_cache is not None:
+        print(f"Hash cache: {hash_cache.hits} hit(s), {hash_cache.misses} file(s) sampled")
 
 
 if __name__ == "__main__":